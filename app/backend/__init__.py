@@ -1,7 +1,44 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from typing import TYPE_CHECKING
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.backend.accessors import close_clients
+from app.backend.concurrency import shutdown_executors
+from app.backend.config import get_config_variables
+from app.backend.document_store import flush_document_stores
 from app.backend.endpoints import routes
+from app.backend.llm import close_llm_clients
+from app.backend.metrics import MetricsMiddleware
+from app.backend.utils import UploadLimitMiddleware
+from app.backend.warmup import run_warmup
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+CONFIG = get_config_variables()
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> "AsyncIterator[None]":
+    """Warm shared resources in the background and release them on shutdown.
+
+    The app serves /healthz as soon as it starts; /readyz reports ready once
+    warmup has finished.
+    """
+    warmup_task = asyncio.create_task(run_warmup())
+    yield
+    if not warmup_task.done():
+        warmup_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await warmup_task
+    shutdown_executors()
+    flush_document_stores()
+    await close_clients()
+    await close_llm_clients()
+
 
 chat_app = FastAPI(
     title="🧠 Semantic Document Chat API",
@@ -11,6 +48,7 @@ chat_app = FastAPI(
         "Powered by LLMs, vector embeddings, and retrieval-augmented generation (RAG)."
     ),
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 
@@ -21,5 +59,7 @@ chat_app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+chat_app.add_middleware(UploadLimitMiddleware)
+chat_app.add_middleware(MetricsMiddleware)
 
 chat_app.include_router(routes)
@@ -9,6 +9,8 @@ LOG = logging.getLogger(__name__)
 CONFIG = get_config_variables()
 
 MONGO_CLIENT_CACHE: dict[str, pymongo.MongoClient[dict[str, Any]]] = {}
+ASYNC_MONGO_CLIENT_CACHE: dict[str, pymongo.AsyncMongoClient[dict[str, Any]]] = {}
+COLLECTION_CACHE: dict[str, Any] = {}
 COLLECTION_NAME = "chat_with_doc"
 
 
@@ -46,11 +48,30 @@ def get_client() -> pymongo.MongoClient[dict[str, Any]]:
     return client
 
 
+def get_async_client() -> pymongo.AsyncMongoClient[dict[str, Any]]:
+    """Get the asynchronous MongoDB client.
+
+    Like get_client, the client is cached (in ASYNC_MONGO_CLIENT_CACHE) so its
+    connection pool is shared by every request.
+
+    Args:
+        None
+    Returns:
+        pymongo.AsyncMongoClient: The asynchronous MongoDB client.
+
+    """
+    cache_key = "default"
+    if cache_key not in ASYNC_MONGO_CLIENT_CACHE:
+        ASYNC_MONGO_CLIENT_CACHE[cache_key] = pymongo.AsyncMongoClient(CONFIG.MONGO_URL, uuidRepresentation="standard")
+    return ASYNC_MONGO_CLIENT_CACHE[cache_key]
+
+
 def get_collection() -> Any:
     """Get the MongoDB collection.
 
     This function retrieves the MongoDB collection for storing chat history.
-    It creates the collection if it does not exist.
+    The handle is cached in COLLECTION_CACHE; MongoDB creates the collection on
+    the first write, so no round trip is needed per call.
 
     Args:
         None
@@ -58,11 +79,52 @@ def get_collection() -> Any:
         pymongo.collection.Collection: The MongoDB collection for chat history.
 
     """
-    client = get_client()
-    db_name = CONFIG.MONGO_DB_NAME or "default_db"  # Ensure db_name is a string
-    db = client[db_name]
+    cache_key = "default"
+    if cache_key not in COLLECTION_CACHE:
+        client = get_client()
+        db_name = CONFIG.MONGO_DB_NAME or "default_db"  # Ensure db_name is a string
+        COLLECTION_CACHE[cache_key] = client[db_name][COLLECTION_NAME]
+
+    return COLLECTION_CACHE[cache_key]
+
+
+def get_async_collection() -> Any:
+    """Get the MongoDB collection for chat history on the asynchronous client.
+
+    Args:
+        None
+    Returns:
+        pymongo.asynchronous.collection.AsyncCollection: The collection.
+
+    """
+    cache_key = "async"
+    if cache_key not in COLLECTION_CACHE:
+        db_name = CONFIG.MONGO_DB_NAME or "default_db"
+        COLLECTION_CACHE[cache_key] = get_async_client()[db_name][COLLECTION_NAME]
 
-    if COLLECTION_NAME not in db.list_collection_names():
-        db.create_collection(COLLECTION_NAME)
+    return COLLECTION_CACHE[cache_key]
 
-    return db[COLLECTION_NAME]
+
+def ensure_indexes() -> None:
+    """Create the indexes of the chat history collection.
+
+    Called once at startup. The unique index on session_id makes history
+    lookups and upserting appends index-backed.
+
+    Raises:
+        pymongo.errors.PyMongoError: If the index cannot be created.
+
+    """
+    get_collection().create_index("session_id", unique=True)
+    LOG.info(f"Ensured unique session_id index on {COLLECTION_NAME}")
+
+
+async def close_clients() -> None:
+    """Close every cached MongoDB client."""
+    for async_client in ASYNC_MONGO_CLIENT_CACHE.values():
+        await async_client.close()
+    for client in MONGO_CLIENT_CACHE.values():
+        client.close()
+    ASYNC_MONGO_CLIENT_CACHE.clear()
+    MONGO_CLIENT_CACHE.clear()
+    COLLECTION_CACHE.clear()
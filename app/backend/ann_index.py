@@ -0,0 +1,148 @@
+import logging
+import math
+import time
+
+import faiss
+import numpy as np
+
+from app.backend.config import get_config_variables
+
+LOG = logging.getLogger(__name__)
+CONFIG = get_config_variables()
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq", "ivfsq8")
+PQ_CODEBOOK_SIZE = 256
+MIN_POINTS_PER_CENTROID = 39
+
+
+def get_nlist(count: int) -> int:
+    """Get the number of IVF cells for an index of count vectors.
+
+    Args:
+        count (int): The number of vectors.
+
+    Returns:
+        int: CONFIG.FAISS_IVF_NLIST, or about 4 * sqrt(count) when it is 0.
+
+    """
+    return CONFIG.FAISS_IVF_NLIST or max(1, int(4 * math.sqrt(count)))
+
+
+def get_min_vectors(index_type: str, count: int) -> int:
+    """Get the number of vectors an index type needs before it beats a flat index.
+
+    Args:
+        index_type (str): One of INDEX_TYPES.
+        count (int): The number of vectors to index.
+
+    Returns:
+        int: CONFIG.FAISS_FLAT_MAX_VECTORS, raised to the training set size
+        the IVF quantizers need.
+
+    """
+    if index_type == "ivfpq":
+        return max(CONFIG.FAISS_FLAT_MAX_VECTORS, max(get_nlist(count), PQ_CODEBOOK_SIZE) * MIN_POINTS_PER_CENTROID)
+    if index_type == "ivfsq8":
+        return max(CONFIG.FAISS_FLAT_MAX_VECTORS, get_nlist(count) * MIN_POINTS_PER_CENTROID)
+    return CONFIG.FAISS_FLAT_MAX_VECTORS
+
+
+def build_index(vectors: np.ndarray, ids: np.ndarray, index_type: str | None = None) -> faiss.Index:
+    """Build a FAISS index of the configured type over some vectors.
+
+    Below the size where an approximate index pays off, an exact flat index is
+    built instead. IVF indices are trained on a random sample of at most
+    CONFIG.FAISS_TRAIN_SAMPLE vectors.
+
+    Args:
+        vectors (np.ndarray): The float32 vectors, one per row.
+        ids (np.ndarray): The int64 ID of each vector.
+        index_type (str | None): One of INDEX_TYPES. Defaults to
+            CONFIG.FAISS_INDEX_TYPE.
+
+    Returns:
+        faiss.Index: An index that supports add_with_ids and ID selectors.
+
+    Raises:
+        ValueError: If the index type is unknown.
+
+    """
+    index_type = index_type or CONFIG.FAISS_INDEX_TYPE
+    if index_type not in INDEX_TYPES:
+        msg = f"Unknown FAISS index type: {index_type}"
+        raise ValueError(msg)
+
+    count, dim = vectors.shape
+    if index_type == "flat" or count < get_min_vectors(index_type, count):
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+        index.add_with_ids(vectors, ids)
+        return index
+
+    if index_type == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dim, CONFIG.FAISS_HNSW_M)
+        hnsw.hnsw.efConstruction = CONFIG.FAISS_HNSW_EF_CONSTRUCTION
+        index = faiss.IndexIDMap2(hnsw)
+    else:
+        nlist = get_nlist(count)
+        if index_type == "ivfpq":
+            index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, CONFIG.FAISS_PQ_M, 8)
+        else:
+            index = faiss.IndexIVFScalarQuantizer(faiss.IndexFlatL2(dim), dim, nlist, faiss.ScalarQuantizer.QT_8bit)
+
+        started = time.perf_counter()
+        sample_size = min(count, CONFIG.FAISS_TRAIN_SAMPLE)
+        sample = vectors[np.random.default_rng(0).choice(count, size=sample_size, replace=False)]
+        index.train(sample)
+        LOG.info(f"Trained {index_type} index on {sample_size} vectors in {time.perf_counter() - started:.2f}s")
+
+    index.add_with_ids(vectors, ids)
+    return index
+
+
+def get_index_type(index: faiss.Index) -> str:
+    """Get the type of an index built by build_index, e.g. after loading it."""
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivfsq8"
+    return "flat"
+
+
+def get_ids(index: faiss.Index) -> np.ndarray:
+    """Get the sorted IDs of the vectors in an index built by build_index."""
+    if isinstance(index, faiss.IndexIDMap2):
+        return np.sort(faiss.vector_to_array(index.id_map))
+    lists = faiss.extract_index_ivf(index).invlists
+    ids = [
+        faiss.rev_swig_ptr(lists.get_ids(cell), lists.list_size(cell)).copy()
+        for cell in range(lists.nlist)
+        if lists.list_size(cell)
+    ]
+    return np.sort(np.concatenate(ids)) if ids else np.empty(0, dtype=np.int64)
+
+
+def supports_removal(index: faiss.Index) -> bool:
+    """Whether vectors can be removed from an index built by build_index."""
+    return get_index_type(index) != "hnsw"
+
+
+def get_search_parameters(index: faiss.Index, selector: faiss.IDSelector | None = None) -> faiss.SearchParameters:
+    """Get the search parameters of an index, with the configured nprobe or efSearch.
+
+    Args:
+        index (faiss.Index): An index built by build_index.
+        selector (faiss.IDSelector | None): Restricts the search to some IDs.
+
+    Returns:
+        faiss.SearchParameters: The parameters to pass to index.search.
+
+    """
+    index_type = get_index_type(index)
+    if index_type == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=CONFIG.FAISS_HNSW_EF_SEARCH)
+    if index_type in {"ivfpq", "ivfsq8"}:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=CONFIG.FAISS_IVF_NPROBE)
+    return faiss.SearchParameters(sel=selector)
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from app.backend.config import get_config_variables
+
+LOG = logging.getLogger(__name__)
+CONFIG = get_config_variables()
+
+ANSWER_CACHE: dict[str, "AnswerCache"] = {}
+
+
+@dataclass
+class CachedAnswer:
+    scope: str
+    question: str
+    embedding: np.ndarray[Any, np.dtype[np.float32]]
+    answer: str
+    total_tokens: int
+    expires_at: float
+
+
+@dataclass
+class CacheLookup:
+    answer: str
+    total_tokens: int
+    match: str
+    similarity: float
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+def make_cache_scope(
+    content_hash: str,
+    model: str,
+    temperature: float,
+    chat_history: list[tuple[str, str]],
+    history_turns: int,
+    *,
+    chat_mode: str,
+) -> str:
+    """Build the scope a cached answer is valid in.
+
+    Answers are only reused for the same document, model, temperature, chat
+    mode and the same most recent turns, so follow-ups such as "tell me more" never match
+    an answer given in another conversation.
+
+    Args:
+        content_hash (str): The SHA-256 hash of the document content.
+        model (str): The LLM name.
+        temperature (float): The LLM temperature.
+        chat_history (list): The (question, answer) turns of the session.
+        history_turns (int): How many recent turns are part of the scope.
+        chat_mode (str): The chat mode, which shapes the prompt of the answer.
+
+    Returns:
+        str: The scope digest.
+
+    """
+    recent = chat_history[-history_turns:] if history_turns > 0 else []
+    payload = json.dumps([content_hash, model, temperature, chat_mode, recent])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class AnswerCache:
+    """LRU cache of LLM answers with TTL, exact and semantic lookup.
+
+    A lookup first tries the normalised question text within its scope, then
+    the cached question whose embedding has the highest cosine similarity
+    above the threshold.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, similarity_threshold: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.lookups = 0
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.saved_tokens = 0
+        self._entries: OrderedDict[str, CachedAnswer] = OrderedDict()
+        self._scopes: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, scope: str, question: str, embedding: list[float] | None = None) -> CacheLookup | None:
+        """Look up a cached answer for a question.
+
+        Args:
+            scope (str): The scope returned by make_cache_scope.
+            question (str): The user's question.
+            embedding (list[float] | None): The question embedding, for the
+                semantic lookup. Without it only exact matches are returned.
+
+        Returns:
+            CacheLookup | None: The cached answer, or None on a miss.
+
+        """
+        with self._lock:
+            self.lookups += 1
+            self._expire(time.monotonic())
+
+            entry = self._entries.get(self._key(scope, question))
+            match, similarity = "exact", 1.0
+            if entry is None and embedding is not None:
+                entry, similarity = self._most_similar(scope, np.asarray(embedding, dtype=np.float32))
+                match = "semantic"
+            if entry is None:
+                return None
+
+            self._entries.move_to_end(self._key(entry.scope, entry.question))
+            if match == "exact":
+                self.exact_hits += 1
+            else:
+                self.semantic_hits += 1
+            self.saved_tokens += entry.total_tokens
+            return CacheLookup(entry.answer, entry.total_tokens, match, similarity)
+
+    def put(self, scope: str, question: str, embedding: list[float], answer: str, total_tokens: int) -> None:
+        """Store an answer, evicting the least recently used one when full."""
+        key = self._key(scope, question)
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        entry = CachedAnswer(
+            scope=scope,
+            question=normalize_question(question),
+            embedding=vector / norm if norm else vector,
+            answer=answer,
+            total_tokens=total_tokens,
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._scopes.setdefault(scope, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            return {
+                "entries": len(self._entries),
+                "lookups": self.lookups,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "hit_rate": round(hits / self.lookups, 4) if self.lookups else 0.0,
+                "saved_tokens": self.saved_tokens,
+            }
+
+    def _key(self, scope: str, question: str) -> str:
+        return f"{scope}:{normalize_question(question)}"
+
+    def _most_similar(
+        self, scope: str, embedding: np.ndarray[Any, np.dtype[np.float32]]
+    ) -> tuple[CachedAnswer | None, float]:
+        keys = list(self._scopes.get(scope, ()))
+        if not keys:
+            return None, 0.0
+
+        norm = float(np.linalg.norm(embedding))
+        if not norm:
+            return None, 0.0
+
+        matrix = np.stack([self._entries[key].embedding for key in keys])
+        similarities = matrix @ (embedding / norm)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None, float(similarities[best])
+        return self._entries[keys[best]], float(similarities[best])
+
+    def _expire(self, now: float) -> None:
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        scope_keys = self._scopes.get(entry.scope)
+        if scope_keys is not None:
+            scope_keys.discard(key)
+            if not scope_keys:
+                del self._scopes[entry.scope]
+
+
+def get_answer_cache() -> AnswerCache:
+    """Get the process-wide answer cache configured from CONFIG.
+
+    Returns:
+        AnswerCache: The cached AnswerCache instance.
+
+    """
+    cache_key = "default"
+    if cache_key not in ANSWER_CACHE:
+        ANSWER_CACHE[cache_key] = AnswerCache(
+            max_entries=CONFIG.ANSWER_CACHE_MAX_ENTRIES,
+            ttl_seconds=CONFIG.ANSWER_CACHE_TTL_SECONDS,
+            similarity_threshold=CONFIG.ANSWER_CACHE_SIMILARITY,
+        )
+    return ANSWER_CACHE[cache_key]
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any
+
+from langchain_core.embeddings import Embeddings
+
+from app.backend.config import get_config_variables
+from app.backend.embeddings import get_embeddings
+
+LOG = logging.getLogger(__name__)
+CONFIG = get_config_variables()
+
+BATCHED_EMBEDDINGS_CACHE: dict[str, "BatchedEmbeddings"] = {}
+_BATCHED_EMBEDDINGS_LOCK = threading.Lock()
+
+
+class EmbeddingBatcher:
+    """Collect query embeddings from concurrent callers into batched encodes.
+
+    Callers enqueue their text and block on a future. A single worker thread
+    waits for the first text, keeps collecting until the batch is full or the
+    window has elapsed, then encodes the whole batch in one forward pass.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_batch_size: int, max_wait_ms: float) -> None:
+        self.embeddings = embeddings
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max_wait_ms / 1000
+        self.batch_sizes: Counter[int] = Counter()
+        self._queue: queue.Queue[tuple[str, Future[list[float]]]] = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: threading.Thread | None = None
+
+    def submit(self, text: str) -> Future[list[float]]:
+        """Queue a text for the next batch and return the future of its vector."""
+        self._ensure_worker()
+        future: Future[list[float]] = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, text: str) -> list[float]:
+        return self.submit(text).result()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            histogram = dict(sorted(self.batch_sizes.items()))
+        batches = sum(histogram.values())
+        items = sum(size * count for size, count in histogram.items())
+        return {
+            "batches": batches,
+            "items": items,
+            "mean_batch_size": round(items / batches, 2) if batches else 0.0,
+            "batch_size_histogram": {str(size): count for size, count in histogram.items()},
+        }
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> list[tuple[str, Future[list[float]]]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_seconds
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            with self._lock:
+                self.batch_sizes[len(batch)] += 1
+
+            try:
+                vectors = self.embeddings.embed_documents([text for text, _ in batch])
+            except Exception as e:  # noqa: BLE001 - handed to every waiting caller
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), vector in zip(batch, vectors, strict=True):
+                    future.set_result(vector)
+
+
+class BatchedEmbeddings(Embeddings):
+    """Embeddings whose queries go through a shared EmbeddingBatcher.
+
+    Document embedding is already batched by the caller and is passed through
+    to the wrapped model unchanged.
+    """
+
+    def __init__(self, embeddings: Embeddings, batcher: EmbeddingBatcher) -> None:
+        self.embeddings = embeddings
+        self.batcher = batcher
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.batcher.embed(text)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await asyncio.wrap_future(self.batcher.submit(text))
+
+
+def get_batched_embeddings(model_name: str | None = None) -> Embeddings:
+    """Get the shared embedding model with micro-batched query embedding.
+
+    The batching window and size come from CONFIG.EMBEDDING_BATCH_WINDOW_MS and
+    CONFIG.EMBEDDING_BATCH_MAX_SIZE. When CONFIG.EMBEDDING_BATCHING is off the
+    plain model is returned.
+
+    Args:
+        model_name (str | None): The model to load. Defaults to
+            CONFIG.EMBEDDING_MODEL_NAME.
+
+    Returns:
+        Embeddings: The embedding model for building and querying indices.
+
+    """
+    embeddings = get_embeddings(model_name)
+    if not CONFIG.EMBEDDING_BATCHING:
+        return embeddings
+
+    model_name = model_name or CONFIG.EMBEDDING_MODEL_NAME
+    with _BATCHED_EMBEDDINGS_LOCK:
+        batched = BATCHED_EMBEDDINGS_CACHE.get(model_name)
+        if batched is None or batched.embeddings is not embeddings:
+            batcher = EmbeddingBatcher(
+                embeddings,
+                max_batch_size=CONFIG.EMBEDDING_BATCH_MAX_SIZE,
+                max_wait_ms=CONFIG.EMBEDDING_BATCH_WINDOW_MS,
+            )
+            batched = BatchedEmbeddings(embeddings, batcher)
+            BATCHED_EMBEDDINGS_CACHE[model_name] = batched
+        return batched
+
+
+def get_batching_stats() -> dict[str, Any]:
+    """Report the batch-size histogram of every query batcher.
+
+    Returns:
+        dict: The batching statistics per model.
+
+    """
+    return {name: batched.batcher.stats() for name, batched in BATCHED_EMBEDDINGS_CACHE.items()}
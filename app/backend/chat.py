@@ -1,88 +1,971 @@
-import gc
+import asyncio
 import logging
-from typing import Any
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, TypeVar
 
-from langchain.chains import ConversationalRetrievalChain
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.callbacks.manager import get_openai_callback
-from langchain_community.document_loaders import Docx2txtLoader, PyPDFLoader
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.vectorstores import VectorStoreRetriever
 
+from app.backend.answer_cache import get_answer_cache, make_cache_scope
+from app.backend.batching import get_batched_embeddings
+from app.backend.concurrency import run_in_stage, stage_limit
 from app.backend.config import get_config_variables
-from app.backend.utils import get_temp_file_path, load_memory_to_pass
+from app.backend.corpus import CorpusIndex, CorpusRetriever, get_corpus_index
+from app.backend.document_store import DocumentRecord, count_pages, get_document_store
+from app.backend.embedding_store import embed_documents_cached
+from app.backend.history import HistoryWindow, aload_history_window, load_history_window
+from app.backend.index_store import compute_file_hash, get_index_store, make_index_key
+from app.backend.llm import get_llm
+from app.backend.metrics import StageTimingHandler, observe_stage, record_llm_usage, span
+from app.backend.parsing import iter_pdf_pages_parallel
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Callable, Iterable, Iterator
+    from contextlib import AbstractContextManager
+
+    from langchain.chains import ConversationalRetrievalChain
+    from langchain_community.callbacks.openai_info import OpenAICallbackHandler
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.language_models import BaseLanguageModel
+    from langchain_core.retrievers import BaseRetriever
 
 LOG = logging.getLogger(__name__)
 CONFIG = get_config_variables()
 
+T = TypeVar("T")
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 0
+RETRIEVER_K = 1
+DEFAULT_MODEL = "mistralai/Mistral-7B-Instruct-v0.1"
+ANSWER_STREAM_TAG = "answer_stream"
+CONDENSE_MODE = "condense"
+SINGLE_CALL_MODE = "single"
+CHAT_MODES = (CONDENSE_MODE, SINGLE_CALL_MODE)
+SINGLE_CALL_PROMPT = (
+    "Use the following pieces of context and the conversation so far to answer the user's last "
+    "question. If you don't know the answer, just say that you don't know, don't try to make up "
+    "an answer.\n\n{context}"
+)
+# The rag_stage_duration_seconds stage of each ingestion pipeline timing
+PIPELINE_STAGES = {"parse": "load", "split": "split", "embed": "embed", "index": "index_add"}
+
+
+@dataclass
+class IngestProgress:
+    """How far the incremental build of an index has got."""
+
+    pages: int
+    chunks: int
+    timings: dict[str, float] = field(default_factory=dict, compare=False)
+
+
+def timed(items: "Iterable[T]", timings: dict[str, float], stage: str) -> "Iterator[T]":
+    """Add the time spent producing each item of an iterable to a stage timing.
+
+    Args:
+        items (Iterable): The items, e.g. lazily loaded pages.
+        timings (dict[str, float]): The seconds spent per stage.
+        stage (str): The stage the time counts towards.
+
+    Yields:
+        The items, unchanged.
+
+    """
+    iterator = iter(items)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+        yield item
+
+
+def iter_pages(local_file: str, timings: dict[str, float] | None = None) -> "Iterator[Document]":
+    """Lazily load a PDF or DOCX file from local disk, one page at a time.
+
+    PDFs of at least CONFIG.PARSE_PARALLEL_MIN_PAGES pages are parsed in page
+    ranges on the parser process pool; smaller ones are parsed in-process.
+
+    Args:
+        local_file (str): The absolute path of the file.
+        timings (dict[str, float] | None): Receives the worker seconds of a
+            parallel parse.
+
+    Yields:
+        Document: One document per page (PDF) or per file (DOCX).
+
+    """
+    from langchain_community.document_loaders import Docx2txtLoader, PyPDFLoader  # noqa: PLC0415 - slow import
+
+    if local_file.endswith(".docx"):
+        yield from Docx2txtLoader(file_path=local_file).lazy_load()
+        return
+
+    page_count = count_pages(Path(local_file))
+    if page_count is not None and 0 < CONFIG.PARSE_PARALLEL_MIN_PAGES <= page_count:
+        LOG.info(f"Parsing {page_count} pages of {Path(local_file).name} in parallel")
+        yield from iter_pdf_pages_parallel(local_file, page_count, timings)
+        return
+
+    yield from PyPDFLoader(local_file).lazy_load()
+
+
+def load_documents(local_file: str) -> list["Document"]:
+    """Load a PDF or DOCX file from local disk into documents.
+
+    Args:
+        local_file (str): The absolute path of the file.
+
+    Returns:
+        list[Document]: One document per page (PDF) or per file (DOCX).
+
+    """
+    return list(iter_pages(local_file))
+
+
+def iter_chunk_batches(
+    pages: "Iterable[Document]",
+    batch_size: int,
+    timings: dict[str, float] | None = None,
+) -> "Iterator[tuple[list[Document], int]]":
+    """Split pages into chunks and group them into batches for embedding.
+
+    Only one page and one batch of chunks are held at a time.
+
+    Args:
+        pages (Iterable[Document]): The pages, e.g. from iter_pages.
+        batch_size (int): The maximum number of chunks per batch.
+        timings (dict[str, float] | None): Receives the seconds spent
+            splitting under "split".
+
+    Yields:
+        tuple[list[Document], int]: A batch of chunks and the number of pages
+        read so far.
+
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter  # noqa: PLC0415 - slow import
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, separators=["\n", " ", ""]
+    )
+    batch: list[Document] = []
+    page_count = 0
+    for page_count, page in enumerate(pages, start=1):
+        started = time.perf_counter()
+        chunks = text_splitter.split_documents([page])
+        if timings is not None:
+            timings["split"] = timings.get("split", 0.0) + time.perf_counter() - started
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                yield batch, page_count
+                batch = []
+    if batch:
+        yield batch, page_count
+
+
+def iter_vectorstore_build(local_file: str, embeddings: "Embeddings") -> "Iterator[tuple[FAISS, IngestProgress]]":
+    """Build the FAISS vector store of a file page by page.
+
+    Chunks are embedded in batches of CONFIG.INGEST_BATCH_SIZE and added to
+    the index as soon as they are embedded, so memory stays bounded by one
+    batch plus the index itself. The seconds spent in each stage (parse,
+    split, embed, index) are reported with the progress.
+
+    Args:
+        local_file (str): The absolute path of the file.
+        embeddings (Embeddings): The embedding model for the chunks.
+
+    Yields:
+        tuple[FAISS, IngestProgress]: The growing vector store after each batch.
+
+    """
+    vectorstore: FAISS | None = None
+    chunks = 0
+    timings: dict[str, float] = {}
+    pages_iter = timed(iter_pages(local_file, timings), timings, "parse")
+    for batch, pages in iter_chunk_batches(pages_iter, CONFIG.INGEST_BATCH_SIZE, timings):
+        texts = [chunk.page_content for chunk in batch]
+        started = time.perf_counter()
+        text_embeddings = list(zip(texts, embed_documents_cached(embeddings, texts), strict=True))
+        timings["embed"] = timings.get("embed", 0.0) + time.perf_counter() - started
+
+        metadatas = [chunk.metadata for chunk in batch]
+        started = time.perf_counter()
+        if vectorstore is None:
+            vectorstore = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas)
+        else:
+            vectorstore.add_embeddings(text_embeddings, metadatas=metadatas)
+        timings["index"] = timings.get("index", 0.0) + time.perf_counter() - started
+
+        chunks += len(batch)
+        yield vectorstore, IngestProgress(pages=pages, chunks=chunks, timings=dict(timings))
+
+
+def build_vectorstore(
+    local_file: str,
+    embeddings: "Embeddings",
+    on_progress: "Callable[[FAISS, IngestProgress], None] | None" = None,
+) -> FAISS:
+    """Load, split and embed a file into a new FAISS vector store.
+
+    Args:
+        local_file (str): The absolute path of the file.
+        embeddings (Embeddings): The embedding model for the chunks.
+        on_progress (Callable | None): Called with the growing vector store
+            after each embedded batch.
+
+    Returns:
+        FAISS: The vector store holding every chunk of the file.
+
+    Raises:
+        ValueError: If no text could be extracted from the file.
+
+    """
+    vectorstore: FAISS | None = None
+    progress: IngestProgress | None = None
+    for vectorstore, progress in iter_vectorstore_build(local_file, embeddings):
+        if on_progress is not None:
+            on_progress(vectorstore, progress)
+
+    if vectorstore is None or progress is None:
+        msg = f"No text could be extracted from {Path(local_file).name}"
+        raise ValueError(msg)
+
+    for stage, seconds in progress.timings.items():
+        observe_stage(PIPELINE_STAGES.get(stage, stage), seconds)
+    stage_seconds = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in progress.timings.items())
+    LOG.info(f"Indexed {progress.pages} pages of {Path(local_file).name} in {progress.chunks} chunks: {stage_seconds}")
+    return vectorstore
+
+
+def get_index_key(content_hash: str) -> str:
+    """Get the index store key of a document with the current pipeline settings.
+
+    Args:
+        content_hash (str): The SHA-256 hash of the document content.
+
+    Returns:
+        str: The index key.
+
+    """
+    return make_index_key(content_hash, CONFIG.EMBEDDING_MODEL_NAME, CHUNK_SIZE, CHUNK_OVERLAP)
+
+
+def get_vectorstore(
+    local_file: Path,
+    embeddings: "Embeddings",
+    content_hash: str | None = None,
+    *,
+    on_progress: "Callable[[IngestProgress], None] | None" = None,
+    allow_partial: bool = False,
+) -> FAISS:
+    """Get the vector store of a file, reusing the stored index when possible.
+
+    The index is keyed by the hash of the file content, so it is rebuilt only
+    when the file bytes change. While it is built, a snapshot is saved once
+    CONFIG.INGEST_PARTIAL_PAGES pages are indexed and again whenever the page
+    count doubles, so the first pages can be queried before the rest are done.
+
+    Args:
+        local_file (Path): The path of the file.
+        embeddings (Embeddings): The embedding model for the chunks.
+        content_hash (str | None): The hash of the file, if already known.
+        on_progress (Callable | None): Called after each embedded batch of a build.
+        allow_partial (bool): Return the latest snapshot of an index that is
+            still being built instead of waiting for it.
+
+    Returns:
+        FAISS: The vector store of the file.
+
+    """
+    store = get_index_store()
+    index_key = get_index_key(content_hash or compute_file_hash(local_file))
+    next_snapshot = CONFIG.INGEST_PARTIAL_PAGES
+
+    def report(vectorstore: FAISS, progress: IngestProgress) -> None:
+        nonlocal next_snapshot
+        if 0 < next_snapshot <= progress.pages:
+            store.save_partial(index_key, vectorstore)
+            LOG.info(f"Index {index_key} is queryable on its first {progress.pages} pages")
+            next_snapshot = progress.pages * 2
+        if on_progress is not None:
+            on_progress(progress)
+
+    return store.get_or_build(
+        index_key,
+        embeddings,
+        lambda: build_vectorstore(str(local_file.absolute()), embeddings, report),
+        allow_partial=allow_partial,
+    )
+
+
+def get_openai_callback() -> "AbstractContextManager[OpenAICallbackHandler]":
+    """Count the tokens and cost of the LLM calls made inside a with block.
+
+    Wraps the LangChain callback of the same name. Its module is imported
+    with the first chat, as it loads every tracer integration of
+    langchain_community and is the slowest import of the backend.
+    """
+    from langchain_community.callbacks.manager import get_openai_callback as track_usage  # noqa: PLC0415 - slow import
+
+    return track_usage()
+
+
+def get_corpus() -> CorpusIndex:
+    """Get the corpus index of every document, for the current pipeline settings."""
+    return get_corpus_index(get_index_key("corpus"))
+
+
+def resolve_documents(
+    data_source: str | None = None,
+    document_ids: list[str] | None = None,
+    tag: str | None = None,
+) -> list[DocumentRecord]:
+    """Resolve the targets of a chat message to stored documents.
+
+    Args:
+        data_source (str | None): The document ID or the name of the uploaded file.
+        document_ids (list[str] | None): Several document IDs or file names.
+        tag (str | None): A tag given on upload, selecting every document with it.
+
+    Returns:
+        list[DocumentRecord]: The stored documents, without duplicates.
+
+    Raises:
+        FileNotFoundError: If a document is not stored or no document has the tag.
+        ValueError: If no target is given.
+
+    """
+    LOG.info(f"data source is {data_source}, documents {document_ids}, tag {tag}")
+    store = get_document_store()
+    documents = [store.resolve(source) for source in [*([data_source] if data_source else []), *(document_ids or [])]]
+    if tag:
+        documents.extend(store.find_by_tag(tag))
+    if not documents:
+        msg = "A data source, document IDs or a tag is required"
+        raise ValueError(msg)
+    return list({document.document_id: document for document in documents}.values())
+
+
+def get_scope_id(documents: list[DocumentRecord]) -> str:
+    """Get the answer cache scope of a set of documents."""
+    return ",".join(sorted(document.document_id for document in documents))
+
+
+def get_document_vectorstore(document: DocumentRecord) -> FAISS:
+    """Get the vector store of a stored document.
+
+    Args:
+        document (DocumentRecord): The document returned by resolve_documents.
+
+    Returns:
+        FAISS: The vector store of the document.
+
+    """
+    # Concurrent questions share one batched encode of their query embeddings
+    embeddings = get_batched_embeddings()
+
+    # Load the stored FAISS vectorstore, building it on first use. While it is
+    # still being ingested, the snapshot of its first pages answers instead.
+    return get_vectorstore(Path(document.path), embeddings, content_hash=document.document_id, allow_partial=True)
+
+
+def get_retriever(documents: list[DocumentRecord]) -> "BaseRetriever":
+    """Get a retriever over the chunks of some documents.
+
+    Retrieval runs on the corpus index, filtered to the documents' IDs.
+    Documents missing from the corpus, e.g. indexed by an older version, are
+    added to it first. A single document that is still being ingested is
+    searched in its own, possibly partial, index instead.
+
+    Args:
+        documents (list[DocumentRecord]): The documents returned by resolve_documents.
+
+    Returns:
+        BaseRetriever: The retriever.
+
+    """
+    embeddings = get_batched_embeddings()
+    corpus = get_corpus()
+    for document in documents:
+        if corpus.contains(document.document_id):
+            continue
+        if len(documents) == 1 and not get_index_store().exists(get_index_key(document.document_id)):
+            return get_document_vectorstore(document).as_retriever(search_kwargs={"k": RETRIEVER_K})
+        vectorstore = get_vectorstore(Path(document.path), embeddings, content_hash=document.document_id)
+        corpus.add_document(document.document_id, vectorstore)
+
+    return corpus.as_retriever(embeddings, [document.document_id for document in documents], k=RETRIEVER_K)
+
+
+async def alookup_answer(
+    content_hash: str,
+    query: str,
+    chat_history: list[tuple[str, str]],
+    model: str,
+    temperature: float,
+    *,
+    chat_mode: str,
+    bypass_cache: bool = False,
+    query_embedding: list[float] | None = None,
+) -> tuple[dict[str, Any] | None, "Callable[[str, int], None]"]:
+    """Look up a cached answer and prepare storing a fresh one.
+
+    Args:
+        content_hash (str): The scope ID of the documents, from get_scope_id.
+        query (str): The user's query.
+        chat_history (list): The (question, answer) turns of the session.
+        model (str): The LLM name.
+        temperature (float): The LLM temperature.
+        chat_mode (str): The chat mode the answer is generated in.
+        bypass_cache (bool): Skip the lookup but still store the new answer.
+        query_embedding (list[float] | None): The embedding of the query, if
+            it is already known.
+
+    Returns:
+        tuple: The cached response (or None on a miss), and a callback that
+        stores an answer and its token count under this question.
+
+    """
+    if not CONFIG.ANSWER_CACHE_ENABLED:
+        return None, lambda _answer, _tokens: None
+
+    cache = get_answer_cache()
+    scope = make_cache_scope(
+        content_hash, model, temperature, chat_history, CONFIG.ANSWER_CACHE_HISTORY_TURNS, chat_mode=chat_mode
+    )
+    if query_embedding is None:
+        query_embedding = await get_batched_embeddings().aembed_query(query)
+
+    def store(answer: str, total_tokens: int) -> None:
+        cache.put(scope, query, query_embedding, answer, total_tokens)
+
+    lookup = None if bypass_cache else cache.get(scope, query, query_embedding)
+    if lookup is None:
+        return None, store
+
+    LOG.info(f"Answer cache {lookup.match} hit (similarity {lookup.similarity:.3f})")
+    response = {
+        "question": query,
+        "chat_history": chat_history,
+        "answer": lookup.answer,
+        "total_tokens_used": 0,
+        "cache": {
+            "hit": True,
+            "match": lookup.match,
+            "similarity": round(lookup.similarity, 4),
+            "saved_tokens": lookup.total_tokens,
+            **cache.stats(),
+        },
+    }
+    return response, store
+
+
+def get_answer_cache_report() -> dict[str, Any]:
+    """Report a cache miss together with the answer cache statistics."""
+    if not CONFIG.ANSWER_CACHE_ENABLED:
+        return {"hit": False}
+    return {"hit": False, **get_answer_cache().stats()}
+
+
+def resolve_chat_mode(chat_mode: str | None) -> str:
+    """Get the chat mode of a request, defaulting to CONFIG.CHAT_MODE.
+
+    Args:
+        chat_mode (str | None): "condense" or "single", or None for the default.
+
+    Returns:
+        str: The chat mode.
+
+    Raises:
+        ValueError: If the chat mode is unknown.
+
+    """
+    chat_mode = chat_mode or CONFIG.CHAT_MODE
+    if chat_mode not in CHAT_MODES:
+        msg = f"Unknown chat mode {chat_mode!r}, expected one of {', '.join(CHAT_MODES)}"
+        raise ValueError(msg)
+    return chat_mode
+
+
+def make_retrieval_query(query: str, history: HistoryWindow) -> str:
+    """Rewrite a follow-up question for retrieval without calling the LLM.
+
+    The last CONFIG.SINGLE_CALL_CONTEXT_TURNS questions of the session are
+    put before the query, so a follow-up such as "and the second one?" still
+    retrieves the chunks about the topic it refers to.
+
+    Args:
+        query (str): The user's query.
+        history (HistoryWindow): The history window of the session.
+
+    Returns:
+        str: The text to retrieve chunks with.
+
+    """
+    turns = history.turns[-CONFIG.SINGLE_CALL_CONTEXT_TURNS :] if CONFIG.SINGLE_CALL_CONTEXT_TURNS > 0 else []
+    return "\n".join([*(question for question, _ in turns), query])
+
+
+def make_single_call_messages(query: str, history: HistoryWindow, documents: "list[Document]") -> list[BaseMessage]:
+    """Build the prompt answering a question and its history in one LLM call.
+
+    Args:
+        query (str): The user's query.
+        history (HistoryWindow): The history window of the session.
+        documents (list[Document]): The retrieved chunks.
+
+    Returns:
+        list[BaseMessage]: The context, the history and the question.
+
+    """
+    context = "\n\n".join(document.page_content for document in documents)
+    return [
+        SystemMessage(content=SINGLE_CALL_PROMPT.format(context=context)),
+        *history.messages,
+        HumanMessage(content=query),
+    ]
+
+
+def make_condense_chain(
+    llm: "BaseLanguageModel", retriever: "BaseRetriever", condense_question_llm: "BaseLanguageModel | None" = None
+) -> "ConversationalRetrievalChain":
+    """Build the chain of the condense mode.
+
+    langchain's chains are only imported when the condense mode is first used,
+    as they are slow to import.
+
+    Args:
+        llm (BaseLanguageModel): The LLM answering the question.
+        retriever (BaseRetriever): The retriever of the documents.
+        condense_question_llm (BaseLanguageModel | None): The LLM rewriting
+            follow-up questions. Defaults to llm.
+
+    Returns:
+        ConversationalRetrievalChain: The chain.
+
+    """
+    from langchain.chains import ConversationalRetrievalChain  # noqa: PLC0415 - slow import
+
+    return ConversationalRetrievalChain.from_llm(
+        llm=llm, retriever=retriever, condense_question_llm=condense_question_llm
+    )
+
 
 def get_response(
-    file_name: str,
+    file_name: str | None,
     session_id: str,
     query: str,
-    model: str = "mistralai/Mistral-7B-Instruct-v0.1",
+    model: str = DEFAULT_MODEL,
     temperature: float = 0.0,
+    *,
+    document_ids: list[str] | None = None,
+    tag: str | None = None,
+    chat_mode: str | None = None,
 ) -> Any:
     """Get a response from the model using the provided file and query.
 
     Args:
-        file_name (str): The name of the file to process.
+        file_name (str | None): The document ID or the name of the uploaded file.
         session_id (str): The session ID for chat history.
         query (str): The user's query.
         model (str): The model to use for generating responses.
         temperature (float): The temperature setting for the model.
+        document_ids (list[str] | None): Further documents to answer from.
+        tag (str | None): Answer from every document with this tag.
+        chat_mode (str | None): "condense" to rewrite follow-ups with an extra
+            LLM call before retrieval, "single" to answer in one LLM call.
+            Defaults to CONFIG.CHAT_MODE.
 
     Returns:
         Any: The response from the model.
 
     """
-    LOG.info(f"file name is {file_name}")
+    chat_mode = resolve_chat_mode(chat_mode)
+    retriever = get_retriever(resolve_documents(file_name, document_ids, tag))
+    history = load_history_window(session_id=session_id)
+    callbacks = [StageTimingHandler()]
 
-    # Ensure local path to file
-    file_name = file_name.split("/")[-1]
-    local_file = str(get_temp_file_path(file_name).absolute())
+    # Reuse the pooled LLM client
+    llm = get_llm(model, temperature)
 
-    # Load document from local disk
-    loader = Docx2txtLoader(file_path=local_file) if file_name.endswith(".docx") else PyPDFLoader(local_file)
-    data = loader.load()
+    # Generate the answer
+    with get_openai_callback() as cb:
+        if chat_mode == SINGLE_CALL_MODE:
+            documents = retriever.invoke(make_retrieval_query(query, history), config={"callbacks": callbacks})
+            message = llm.invoke(make_single_call_messages(query, history, documents), config={"callbacks": callbacks})
+            answer = {"question": query, "answer": message.content}
+        else:
+            qa_chain = make_condense_chain(llm, retriever)
+            answer = qa_chain(
+                {
+                    "question": query,
+                    "chat_history": history.chat_history,
+                },
+                callbacks=callbacks,
+            )
+        LOG.info(f"Total Tokens: {cb.total_tokens}")
+        LOG.info(f"Prompt Tokens: {cb.prompt_tokens}")
+        LOG.info(f"Completion Tokens: {cb.completion_tokens}")
+        LOG.info(f"Total Cost (in $): {cb.total_cost}")
+        record_llm_usage(model, cb.prompt_tokens, cb.completion_tokens, cb.total_cost)
 
-    # Split into chunks
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=0, separators=["\n", " ", ""])
-    all_splits = text_splitter.split_documents(data)
+        answer["total_tokens_used"] = cb.total_tokens
+        answer["llm_requests"] = cb.successful_requests
 
-    # Use open-source embedding model (no API key required)
-    embeddings = HuggingFaceEmbeddings(model_name="intfloat/e5-small-v2")
+    answer["chat_history"] = history.turns
+    answer["chat_mode"] = chat_mode
+    return answer
 
-    # Build FAISS vectorstore
-    vectorstore = FAISS.from_documents(all_splits, embeddings)
 
-    # Initialize the LLM
-    llm = ChatOpenAI(
-        model=model,
-        temperature=temperature,
-    )
+async def aget_response(
+    file_name: str | None,
+    session_id: str,
+    query: str,
+    model: str = DEFAULT_MODEL,
+    temperature: float = 0.0,
+    *,
+    document_ids: list[str] | None = None,
+    tag: str | None = None,
+    bypass_cache: bool = False,
+    chat_mode: str | None = None,
+) -> Any:
+    """Get a response from the model without blocking the event loop.
+
+    Index loading runs on the CPU executor and the history read on the I/O
+    executor (or the async Mongo client), each within its stage's concurrency
+    limit. The chain itself runs
+    on the native async OpenAI client, with the token-budgeted history window.
+    Repeated questions are answered from the answer cache without calling the
+    LLM.
 
-    # Setup the QA chain
-    qa_chain = ConversationalRetrievalChain.from_llm(
-        llm=llm,
-        retriever=vectorstore.as_retriever(search_kwargs={"k": 1}),
+    Args:
+        file_name (str | None): The document ID or the name of the uploaded file.
+        session_id (str): The session ID for chat history.
+        query (str): The user's query.
+        model (str): The model to use for generating responses.
+        temperature (float): The temperature setting for the model.
+        document_ids (list[str] | None): Further documents to answer from.
+        tag (str | None): Answer from every document with this tag.
+        bypass_cache (bool): Always call the LLM, refreshing the cached answer.
+        chat_mode (str | None): "condense" or "single", see get_response.
+
+    Returns:
+        Any: The response from the model.
+
+    """
+    chat_mode = resolve_chat_mode(chat_mode)
+    documents = await run_in_stage("documents", resolve_documents, file_name, document_ids, tag)
+    history = await aload_history_window(session_id=session_id)
+
+    cached, store_answer = await alookup_answer(
+        get_scope_id(documents),
+        query,
+        history.turns,
+        model,
+        temperature,
+        chat_mode=chat_mode,
+        bypass_cache=bypass_cache,
     )
+    if cached is not None:
+        return cached
+
+    retriever = await run_in_stage("index", get_retriever, documents)
+    callbacks = [StageTimingHandler()]
+
+    # Reuse the pooled LLM client
+    llm = get_llm(model, temperature)
 
     # Generate the answer
-    with get_openai_callback() as cb:
-        answer = qa_chain(
-            {
+    async with stage_limit("llm"):
+        with get_openai_callback() as cb:
+            if chat_mode == SINGLE_CALL_MODE:
+                chunks = await retriever.ainvoke(make_retrieval_query(query, history), config={"callbacks": callbacks})
+                message = await llm.ainvoke(
+                    make_single_call_messages(query, history, chunks), config={"callbacks": callbacks}
+                )
+                answer = {"question": query, "answer": message.content}
+            else:
+                qa_chain = make_condense_chain(llm, retriever)
+                answer = await qa_chain.ainvoke(
+                    {"question": query, "chat_history": history.chat_history},
+                    config={"callbacks": callbacks},
+                )
+            LOG.info(f"Total Tokens: {cb.total_tokens}")
+            LOG.info(f"Prompt Tokens: {cb.prompt_tokens}")
+            LOG.info(f"Completion Tokens: {cb.completion_tokens}")
+            LOG.info(f"Total Cost (in $): {cb.total_cost}")
+            record_llm_usage(model, cb.prompt_tokens, cb.completion_tokens, cb.total_cost)
+
+            answer["total_tokens_used"] = cb.total_tokens
+            answer["llm_requests"] = cb.successful_requests
+
+    # The summary message is prompt input only; the response lists the turns
+    answer["chat_history"] = history.turns
+    answer["chat_mode"] = chat_mode
+
+    store_answer(answer["answer"], answer["total_tokens_used"])
+    answer["cache"] = get_answer_cache_report()
+    return answer
+
+
+async def astream_response(
+    file_name: str | None,
+    session_id: str,
+    query: str,
+    model: str = DEFAULT_MODEL,
+    temperature: float = 0.0,
+    *,
+    document_ids: list[str] | None = None,
+    tag: str | None = None,
+    bypass_cache: bool = False,
+    chat_mode: str | None = None,
+) -> "AsyncIterator[dict[str, Any]]":
+    """Stream a response from the model token by token.
+
+    In the condense mode the question-condensing step runs on a non-streaming
+    LLM, so only the tokens of the final answer are yielded, as soon as the
+    LLM produces them. A cached answer is yielded as a single token.
+
+    Args:
+        file_name (str | None): The document ID or the name of the uploaded file.
+        session_id (str): The session ID for chat history.
+        query (str): The user's query.
+        model (str): The model to use for generating responses.
+        temperature (float): The temperature setting for the model.
+        document_ids (list[str] | None): Further documents to answer from.
+        tag (str | None): Answer from every document with this tag.
+        bypass_cache (bool): Always call the LLM, refreshing the cached answer.
+        chat_mode (str | None): "condense" or "single", see get_response.
+
+    Yields:
+        dict: {"token": str} for every answer token, then one final
+        {"answer": str, "total_tokens_used": int, ...} with the full answer.
+
+    """
+    chat_mode = resolve_chat_mode(chat_mode)
+    documents = await run_in_stage("documents", resolve_documents, file_name, document_ids, tag)
+    history = await aload_history_window(session_id=session_id)
+
+    cached, store_answer = await alookup_answer(
+        get_scope_id(documents),
+        query,
+        history.turns,
+        model,
+        temperature,
+        chat_mode=chat_mode,
+        bypass_cache=bypass_cache,
+    )
+    if cached is not None:
+        yield {"token": cached["answer"]}
+        yield {key: value for key, value in cached.items() if key not in {"question", "chat_history"}}
+        return
+
+    retriever = await run_in_stage("index", get_retriever, documents)
+    callbacks = [StageTimingHandler()]
+
+    # Only the answering LLM streams; its tag tells its tokens apart
+    llm = get_llm(
+        model,
+        temperature,
+        streaming=True,
+        stream_usage=True,
+        tags=[ANSWER_STREAM_TAG],
+    )
+
+    # Generation runs in its own task and queues the tokens, so the LLM slot is
+    # released once the LLM is done rather than once a slow client has read them
+    queue: asyncio.Queue[str | None] = asyncio.Queue()
+
+    async def generate() -> "OpenAICallbackHandler":
+        async with stage_limit("llm"):
+            with get_openai_callback() as cb:
+                if chat_mode == SINGLE_CALL_MODE:
+                    chunks = await retriever.ainvoke(
+                        make_retrieval_query(query, history), config={"callbacks": callbacks}
+                    )
+                    async for chunk in llm.astream(
+                        make_single_call_messages(query, history, chunks), config={"callbacks": callbacks}
+                    ):
+                        if chunk.content:
+                            queue.put_nowait(chunk.content)
+                else:
+                    qa_chain = make_condense_chain(llm, retriever, condense_question_llm=get_llm(model, temperature))
+                    async for event in qa_chain.astream_events(
+                        {"question": query, "chat_history": history.chat_history},
+                        version="v2",
+                        config={"callbacks": callbacks},
+                    ):
+                        if event["event"] != "on_chat_model_stream" or ANSWER_STREAM_TAG not in event.get("tags", []):
+                            continue
+                        token = event["data"]["chunk"].content
+                        if token:
+                            queue.put_nowait(token)
+        return cb
+
+    tokens: list[str] = []
+    generation = asyncio.create_task(generate())
+    generation.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        while (token := await queue.get()) is not None:
+            tokens.append(token)
+            yield {"token": token}
+        cb = await generation
+    finally:
+        # Stop generating when the client goes away
+        generation.cancel()
+
+    LOG.info(f"Total Tokens: {cb.total_tokens}")
+    LOG.info(f"Prompt Tokens: {cb.prompt_tokens}")
+    LOG.info(f"Completion Tokens: {cb.completion_tokens}")
+    LOG.info(f"Total Cost (in $): {cb.total_cost}")
+    record_llm_usage(model, cb.prompt_tokens, cb.completion_tokens, cb.total_cost)
+
+    store_answer("".join(tokens), cb.total_tokens)
+    yield {
+        "answer": "".join(tokens),
+        "total_tokens_used": cb.total_tokens,
+        "llm_requests": cb.successful_requests,
+        "chat_mode": chat_mode,
+        "cache": get_answer_cache_report(),
+    }
+
+
+def retrieve_many(retriever: "BaseRetriever", query_embeddings: list[list[float]]) -> "list[list[Document]]":
+    """Retrieve the chunks of many queries at once.
+
+    On the corpus index all the queries are searched in one vectorised FAISS
+    search. A partial index of a document that is still being ingested is
+    searched query by query.
+
+    Args:
+        retriever (BaseRetriever): The retriever returned by get_retriever.
+        query_embeddings (list[list[float]]): The embedding of each query.
+
+    Returns:
+        list[list[Document]]: The chunks of each query.
+
+    Raises:
+        TypeError: If the retriever is neither a corpus nor a vector store retriever.
+
+    """
+    if isinstance(retriever, CorpusRetriever):
+        return retriever.corpus.search_many(query_embeddings, retriever.document_ids, retriever.k)
+    if isinstance(retriever, VectorStoreRetriever):
+        return [
+            retriever.vectorstore.similarity_search_by_vector(embedding, k=RETRIEVER_K)
+            for embedding in query_embeddings
+        ]
+    msg = f"Unsupported retriever {type(retriever).__name__}"
+    raise TypeError(msg)
+
+
+async def aget_batch_responses(
+    file_name: str | None,
+    queries: list[str],
+    model: str = DEFAULT_MODEL,
+    temperature: float = 0.0,
+    *,
+    document_ids: list[str] | None = None,
+    tag: str | None = None,
+    bypass_cache: bool = False,
+) -> dict[str, Any]:
+    """Answer many independent questions about the same documents.
+
+    The documents are resolved and their index loaded once, every query is
+    embedded in one batch and retrieved in one vectorised search, and each
+    question is answered with a single LLM call. At most
+    CONFIG.BATCH_LLM_CONCURRENCY of those calls run at the same time. A
+    question whose LLM call fails gets an error instead of an answer; the
+    other answers are still returned.
+
+    Args:
+        file_name (str | None): The document ID or the name of the uploaded file.
+        queries (list[str]): The questions.
+        model (str): The model to use for generating responses.
+        temperature (float): The temperature setting for the model.
+        document_ids (list[str] | None): Further documents to answer from.
+        tag (str | None): Answer from every document with this tag.
+        bypass_cache (bool): Always call the LLM, refreshing the cached answers.
+
+    Returns:
+        dict[str, Any]: One {"question", "answer", "total_tokens_used",
+        "prompt_tokens", "completion_tokens", "cache"} entry per question,
+        in order, and the total tokens used.
+
+    """
+    documents = await run_in_stage("documents", resolve_documents, file_name, document_ids, tag)
+    retriever = await run_in_stage("index", get_retriever, documents)
+    embeddings = get_batched_embeddings()
+    scope_id = get_scope_id(documents)
+    no_history = HistoryWindow()
+
+    with span("retrieve"):
+        query_embeddings = await run_in_stage("index", embeddings.embed_documents, queries)
+        chunks = await run_in_stage("index", retrieve_many, retriever, query_embeddings)
+
+    llm = get_llm(model, temperature)
+    parallelism = asyncio.Semaphore(max(CONFIG.BATCH_LLM_CONCURRENCY, 1))
+
+    async def answer(query: str, query_embedding: list[float], context: "list[Document]") -> dict[str, Any]:
+        cached, store_answer = await alookup_answer(
+            scope_id,
+            query,
+            [],
+            model,
+            temperature,
+            chat_mode=SINGLE_CALL_MODE,
+            bypass_cache=bypass_cache,
+            query_embedding=query_embedding,
+        )
+        if cached is not None:
+            return {
                 "question": query,
-                "chat_history": load_memory_to_pass(session_id=session_id),
+                "answer": cached["answer"],
+                "total_tokens_used": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cache": cached["cache"],
             }
-        )
-        LOG.info(f"Total Tokens: {cb.total_tokens}")
-        LOG.info(f"Prompt Tokens: {cb.prompt_tokens}")
-        LOG.info(f"Completion Tokens: {cb.completion_tokens}")
-        LOG.info(f"Total Cost (in $): {cb.total_cost}")
 
-        answer["total_tokens_used"] = cb.total_tokens
+        try:
+            async with parallelism, stage_limit("llm"):
+                with get_openai_callback() as cb:
+                    message = await llm.ainvoke(
+                        make_single_call_messages(query, no_history, context),
+                        config={"callbacks": [StageTimingHandler()]},
+                    )
+        except Exception as e:
+            error = str(e)
+            LOG.exception(f"Error answering batch question {query!r}: {error}")
+            return {"question": query, "error": "Internal Server Error"}
 
-    gc.collect()
-    return answer
+        record_llm_usage(model, cb.prompt_tokens, cb.completion_tokens, cb.total_cost)
+        store_answer(str(message.content), cb.total_tokens)
+        return {
+            "question": query,
+            "answer": message.content,
+            "total_tokens_used": cb.total_tokens,
+            "prompt_tokens": cb.prompt_tokens,
+            "completion_tokens": cb.completion_tokens,
+            "cache": get_answer_cache_report(),
+        }
+
+    answers = await asyncio.gather(
+        *(
+            answer(query, query_embedding, context)
+            for query, query_embedding, context in zip(queries, query_embeddings, chunks, strict=True)
+        )
+    )
+    total_tokens = sum(item.get("total_tokens_used", 0) for item in answers)
+    LOG.info(f"Answered {len(queries)} batch questions with {total_tokens} tokens")
+    return {"answers": answers, "total_tokens_used": total_tokens}
@@ -0,0 +1,180 @@
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import os
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from app.backend.config import get_config_variables
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Callable
+
+LOG = logging.getLogger(__name__)
+CONFIG = get_config_variables()
+
+T = TypeVar("T")
+
+# Each stage runs its blocking work on the executor named here. Ingestion has
+# its own executor and limit, so whole-document builds never hold the slots
+# that query-time index loads and searches wait for.
+STAGE_EXECUTORS = {
+    "index": "cpu",
+    "ingest": "ingest",
+    "history": "io",
+    "documents": "io",
+}
+EXECUTOR_CACHE: dict[str, ThreadPoolExecutor] = {}
+PROCESS_POOL_CACHE: dict[str, ProcessPoolExecutor] = {}
+# Executors are also first requested from worker threads, e.g. a corpus
+# compaction scheduled from the ingest executor.
+_EXECUTOR_LOCK = threading.Lock()
+_STAGE_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_stage_limit(stage: str) -> int:
+    """Get the maximum number of in-flight calls of a stage.
+
+    Args:
+        stage (str): The stage name, e.g. "index", "ingest", "history", "documents" or "llm".
+
+    Returns:
+        int: The configured concurrency limit.
+
+    """
+    limits = {
+        "index": CONFIG.INDEX_CONCURRENCY,
+        "ingest": CONFIG.INGEST_CONCURRENCY,
+        "history": CONFIG.HISTORY_CONCURRENCY,
+        "documents": CONFIG.IO_EXECUTOR_WORKERS,
+        "llm": CONFIG.LLM_CONCURRENCY,
+    }
+    return limits[stage]
+
+
+def get_worker_count(name: str) -> int:
+    """Get the configured size of a named executor or process pool.
+
+    Args:
+        name (str): "cpu", "io", "ingest" or "parse". A setting of 0 means
+            one worker per core.
+
+    Returns:
+        int: The number of workers.
+
+    """
+    workers = {
+        "cpu": CONFIG.CPU_EXECUTOR_WORKERS,
+        "io": CONFIG.IO_EXECUTOR_WORKERS,
+        "ingest": CONFIG.INGEST_CONCURRENCY,
+        "parse": CONFIG.PARSE_WORKERS,
+    }
+    return workers[name] or os.cpu_count() or 1
+
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    """Get a named, sized executor for blocking work.
+
+    "cpu" runs parsing, embedding and index builds and is sized to the cores;
+    "io" runs blocking database and file calls; "ingest" runs background
+    document ingestion.
+
+    Args:
+        name (str): "cpu", "io" or "ingest".
+
+    Returns:
+        ThreadPoolExecutor: The cached executor.
+
+    """
+    with _EXECUTOR_LOCK:
+        if name not in EXECUTOR_CACHE:
+            EXECUTOR_CACHE[name] = ThreadPoolExecutor(max_workers=get_worker_count(name), thread_name_prefix=name)
+        return EXECUTOR_CACHE[name]
+
+
+def get_process_pool(name: str) -> ProcessPoolExecutor:
+    """Get a named process pool for CPU-bound work that holds the GIL.
+
+    Workers are spawned rather than forked, so they never inherit the locks
+    or threads of the server process.
+
+    Args:
+        name (str): The pool name, e.g. "parse".
+
+    Returns:
+        ProcessPoolExecutor: The cached process pool.
+
+    """
+    with _EXECUTOR_LOCK:
+        if name not in PROCESS_POOL_CACHE:
+            PROCESS_POOL_CACHE[name] = ProcessPoolExecutor(
+                max_workers=get_worker_count(name),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return PROCESS_POOL_CACHE[name]
+
+
+@asynccontextmanager
+async def stage_limit(stage: str) -> "AsyncIterator[None]":
+    """Hold one of the concurrency slots of a stage.
+
+    Semaphores are kept per event loop because asyncio primitives must not be
+    shared between loops.
+
+    Args:
+        stage (str): The stage name.
+
+    """
+    loop = asyncio.get_running_loop()
+    semaphores = _STAGE_SEMAPHORES.setdefault(loop, {})
+    if stage not in semaphores:
+        semaphores[stage] = asyncio.Semaphore(get_stage_limit(stage))
+
+    async with semaphores[stage]:
+        yield
+
+
+async def run_in_stage(stage: str, func: "Callable[..., T]", *args: Any, **kwargs: Any) -> T:
+    """Run a blocking function off the event loop within a stage's limit.
+
+    The function runs in a copy of the caller's context, so context variables
+    such as the request trace of app.backend.metrics reach it.
+
+    Args:
+        stage (str): The stage name, which selects the executor and the limit.
+        func (Callable): The blocking function.
+        *args: Positional arguments for func.
+        **kwargs: Keyword arguments for func.
+
+    Returns:
+        The return value of func.
+
+    """
+    async with stage_limit(stage):
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            get_executor(STAGE_EXECUTORS[stage]), partial(context.run, func, *args, **kwargs)
+        )
+
+
+def shutdown_executors() -> None:
+    """Shut down every executor and process pool, waiting for running work to finish."""
+    with _EXECUTOR_LOCK:
+        executors = list(EXECUTOR_CACHE.items())
+        pools = list(PROCESS_POOL_CACHE.items())
+        EXECUTOR_CACHE.clear()
+        PROCESS_POOL_CACHE.clear()
+    for name, executor in executors:
+        LOG.info(f"Shutting down {name} executor")
+        executor.shutdown(wait=True)
+    for name, pool in pools:
+        LOG.info(f"Shutting down {name} process pool")
+        pool.shutdown(wait=True, cancel_futures=True)
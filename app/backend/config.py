@@ -1,5 +1,7 @@
 import logging
 import os
+import tempfile
+from pathlib import Path
 
 from dotenv import load_dotenv
 
@@ -7,13 +9,85 @@ LOG = logging.getLogger(__name__)
 
 
 class Config:
-    def __init__(self) -> "None":
+    def __init__(self) -> "None":  # noqa: PLR0915 - one statement per setting
         load_dotenv()
         self.OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
         self.OPENAI_API_BASE = os.getenv("OPENAI_API_BASE")
         self.S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
         self.MONGO_URL = os.getenv("MONGO_URL")
         self.MONGO_DB_NAME = os.getenv("MONGO_DB_NAME")
+        self.INDEX_CACHE_DIR = os.getenv(
+            "INDEX_CACHE_DIR",
+            str(Path(tempfile.gettempdir()) / "ml-nlp-index"),
+        )
+        self.INDEX_HOT_CACHE_MAX_BYTES = int(os.getenv("INDEX_HOT_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+        self.EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "intfloat/e5-small-v2")
+        self.EMBEDDING_NUM_THREADS = int(os.getenv("EMBEDDING_NUM_THREADS", "0"))
+        self.EMBEDDING_MAX_SEQ_LENGTH = int(os.getenv("EMBEDDING_MAX_SEQ_LENGTH", "0"))
+        self.EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+        self.EMBEDDING_CACHE_DIR = os.getenv(
+            "EMBEDDING_CACHE_DIR",
+            str(Path(tempfile.gettempdir()) / "ml-nlp-embeddings"),
+        )
+        self.EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+        self.EMBEDDING_CACHE_SEGMENT_BYTES = int(os.getenv("EMBEDDING_CACHE_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+        self.EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")
+        self.EMBEDDING_BATCHING = os.getenv("EMBEDDING_BATCHING", "true").lower() == "true"
+        self.EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+        self.EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+        self.CPU_EXECUTOR_WORKERS = int(os.getenv("CPU_EXECUTOR_WORKERS", "0"))
+        self.IO_EXECUTOR_WORKERS = int(os.getenv("IO_EXECUTOR_WORKERS", "16"))
+        self.INDEX_CONCURRENCY = int(os.getenv("INDEX_CONCURRENCY", "4"))
+        self.HISTORY_CONCURRENCY = int(os.getenv("HISTORY_CONCURRENCY", "16"))
+        self.LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "32"))
+        self.INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "2"))
+        self.LLM_POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100"))
+        self.LLM_POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "32"))
+        self.LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "60"))
+        self.LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+        self.LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+        self.LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"
+        self.ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+        self.ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+        self.ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+        self.ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+        self.ANSWER_CACHE_HISTORY_TURNS = int(os.getenv("ANSWER_CACHE_HISTORY_TURNS", "1"))
+        self.MONGO_ASYNC = os.getenv("MONGO_ASYNC", "false").lower() == "true"
+        self.HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "20"))
+        self.HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+        self.HISTORY_TOKENIZER = os.getenv("HISTORY_TOKENIZER", "cl100k_base")
+        self.HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "256"))
+        self.HISTORY_SUMMARY_MODEL = os.getenv("HISTORY_SUMMARY_MODEL", "mistralai/Mistral-7B-Instruct-v0.1")
+        self.CHAT_MODE = os.getenv("CHAT_MODE", "condense").lower()
+        self.SINGLE_CALL_CONTEXT_TURNS = int(os.getenv("SINGLE_CALL_CONTEXT_TURNS", "1"))
+        self.BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "100"))
+        self.BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+        self.MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+        self.UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+        self.DOCUMENT_STORE_DIR = os.getenv(
+            "DOCUMENT_STORE_DIR",
+            str(Path(tempfile.gettempdir()) / "ml-nlp-documents"),
+        )
+        self.DOCUMENT_STORE_MAX_BYTES = int(os.getenv("DOCUMENT_STORE_MAX_BYTES", str(10 * 1024 * 1024 * 1024)))
+        self.INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+        self.INGEST_PARTIAL_PAGES = int(os.getenv("INGEST_PARTIAL_PAGES", "20"))
+        self.PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "0"))
+        self.PARSE_PARALLEL_MIN_PAGES = int(os.getenv("PARSE_PARALLEL_MIN_PAGES", "64"))
+        self.PARSE_PAGES_PER_TASK = int(os.getenv("PARSE_PAGES_PER_TASK", "16"))
+        self.FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat").lower()
+        self.FAISS_FLAT_MAX_VECTORS = int(os.getenv("FAISS_FLAT_MAX_VECTORS", "50000"))
+        self.FAISS_TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", "100000"))
+        self.FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+        self.FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "40"))
+        self.FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+        self.FAISS_IVF_NLIST = int(os.getenv("FAISS_IVF_NLIST", "0"))
+        self.FAISS_IVF_NPROBE = int(os.getenv("FAISS_IVF_NPROBE", "16"))
+        self.FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "48"))
+        self.FAISS_EXACT_SEARCH_RATIO = float(os.getenv("FAISS_EXACT_SEARCH_RATIO", "0.05"))
+        self.CORPUS_MAX_SEGMENTS = int(os.getenv("CORPUS_MAX_SEGMENTS", "8"))
+        self.CORPUS_MAX_TOMBSTONES = int(os.getenv("CORPUS_MAX_TOMBSTONES", "10000"))
+        self.EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "true").lower() == "true"
+        self.LLM_WARMUP = os.getenv("LLM_WARMUP", "true").lower() == "true"
 
         for var in [
             self.OPENAI_API_KEY,
@@ -31,9 +105,15 @@ class Config:
         os.environ["OPENAI_API_BASE"] = self.OPENAI_API_BASE or ""
 
 
+CONFIG_CACHE: dict[str, Config] = {}
+
+
 def get_config_variables() -> Config:
     """Get configuration variables.
 
+    The .env file and the environment are read once per process; the Config
+    is cached in CONFIG_CACHE and shared by every module.
+
     Returns:
         Config: The configuration object containing all variables.
 
@@ -41,6 +121,8 @@ def get_config_variables() -> Config:
         ValueError: if any environment variable is not set.
 
     """
-    config = Config()
-    LOG.info("Configuration variables loaded successfully.")
-    return config
+    cache_key = "default"
+    if cache_key not in CONFIG_CACHE:
+        CONFIG_CACHE[cache_key] = Config()
+        LOG.info("Configuration variables loaded successfully.")
+    return CONFIG_CACHE[cache_key]
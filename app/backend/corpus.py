@@ -0,0 +1,576 @@
+import fcntl
+import heapq
+import json
+import logging
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from itertools import chain
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from app.backend.ann_index import build_index, get_ids, get_index_type, get_search_parameters, supports_removal
+from app.backend.concurrency import get_executor, run_in_stage
+from app.backend.config import get_config_variables
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from concurrent.futures import Future
+
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+    from langchain_core.embeddings import Embeddings
+
+LOG = logging.getLogger(__name__)
+CONFIG = get_config_variables()
+
+CORPUS_INDEX_CACHE: dict[str, "CorpusIndex"] = {}
+DATABASE_FILE = "corpus.sqlite"
+WRITE_LOCK_FILE = "write.lock"
+COMPACT_LOCK_FILE = "compact.lock"
+GENERATION_PREFIX = "gen-"
+SEGMENT_PREFIX = "seg-"
+INDEX_FILE = "index.faiss"
+VECTORS_FILE = "vectors.npy"
+IDS_FILE = "ids.npy"
+SQL_BATCH_SIZE = 500
+_CORPUS_LOCK = threading.Lock()
+
+
+class CorpusView:
+    """One published directory of corpus vectors, opened read-only.
+
+    A directory is either a generation of the base index or a delta segment.
+    Flat directories are memory-mapped vector and ID arrays, searched with
+    faiss.knn over the rows of the selected IDs. IVF generations are
+    memory-mapped by FAISS itself. HNSW graphs cannot be searched mapped, so
+    they are read into the heap. Approximate generations also keep their
+    sorted IDs in memory, to search a few selected IDs exactly.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.index: faiss.Index | None = None
+        self.vectors: np.ndarray | None = None
+        self.ids: np.ndarray | None = None
+        if (directory / INDEX_FILE).exists():
+            self.index = faiss.read_index(str(directory / INDEX_FILE), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            if get_index_type(self.index) == "hnsw":
+                self.index = faiss.read_index(str(directory / INDEX_FILE))
+            else:
+                # Lets the exact fallback of search reconstruct vectors by ID
+                self.index.set_direct_map_type(faiss.DirectMap.Hashtable)
+            self.ids = get_ids(self.index)
+        else:
+            self.vectors = np.load(directory / VECTORS_FILE, mmap_mode="r")
+            self.ids = np.load(directory / IDS_FILE, mmap_mode="r")
+
+    @property
+    def index_type(self) -> str:
+        return get_index_type(self.index) if self.index is not None else "flat"
+
+    def search(self, queries: np.ndarray, ids: np.ndarray, k: int) -> list[list[tuple[float, int]]]:
+        """Find the vectors closest to each query among some IDs.
+
+        An approximate index restricted to a few IDs can miss them: IVF only
+        probes the cells nearest the query and HNSW stops its walk once
+        efSearch candidates failed the selector. So a selection that is at
+        most CONFIG.FAISS_EXACT_SEARCH_RATIO of the index, or one that
+        returned fewer than k hits, is searched exactly over its
+        reconstructed vectors instead.
+
+        Args:
+            queries (np.ndarray): The float32 query vectors, one per row.
+            ids (np.ndarray): The sorted IDs to search among; IDs this
+                directory does not hold are ignored.
+            k (int): The number of vectors to return per query.
+
+        Returns:
+            list[list[tuple[float, int]]]: Up to k (distance, ID) pairs per
+            query, closest first.
+
+        """
+        if self.index is None:
+            # IDs are assigned in increasing order, so the ID array stays sorted
+            rows = _select_rows(self.ids, ids)
+            return _knn(queries, np.ascontiguousarray(self.vectors[rows]), self.ids[rows], k)
+
+        selected = self.ids[_select_rows(self.ids, ids)]
+        k = min(k, len(selected))
+        if not k:
+            return [[] for _ in range(len(queries))]
+        if len(selected) > CONFIG.FAISS_EXACT_SEARCH_RATIO * self.index.ntotal:
+            params = get_search_parameters(self.index, faiss.IDSelectorBatch(selected))
+            distances, found = self.index.search(queries, k, params=params)
+            hits = [
+                [(distance, chunk_id) for distance, chunk_id in zip(row_distances, row, strict=True) if chunk_id != -1]
+                for row_distances, row in zip(distances.tolist(), found.tolist(), strict=True)
+            ]
+            if all(len(row) == k for row in hits):
+                return hits
+        return _knn(queries, self.index.reconstruct_batch(selected), selected, k)
+
+    def load_arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        """Read the vectors and IDs of a flat directory into memory."""
+        return np.array(self.vectors), np.array(self.ids)
+
+    def load_writable(self) -> faiss.Index:
+        """Read this generation into a new in-memory index that can be changed."""
+        if self.index is not None:
+            return faiss.read_index(str(self.directory / INDEX_FILE))
+        return build_index(*self.load_arrays(), "flat")
+
+
+def _select_rows(sorted_ids: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Find the rows of a sorted ID array that hold some sorted IDs."""
+    rows = np.searchsorted(sorted_ids, ids)
+    in_range = rows < len(sorted_ids)
+    return rows[in_range][sorted_ids[rows[in_range]] == ids[in_range]]
+
+
+def _knn(queries: np.ndarray, vectors: np.ndarray, ids: np.ndarray, k: int) -> list[list[tuple[float, int]]]:
+    """Search some vectors exactly and return (distance, ID) pairs."""
+    if not len(ids):
+        return [[] for _ in range(len(queries))]
+    distances, found = faiss.knn(queries, vectors, min(k, len(ids)))
+    return [
+        [
+            (distance, int(ids[position]))
+            for distance, position in zip(row_distances, row, strict=True)
+            if position != -1
+        ]
+        for row_distances, row in zip(distances.tolist(), found.tolist(), strict=True)
+    ]
+
+
+class CorpusIndex:
+    """One long-lived FAISS index holding the chunks of many documents.
+
+    Every chunk gets a stable 64-bit ID, so documents are added and removed
+    incrementally without rebuilding the index. Searches are restricted to a
+    set of documents inside FAISS with an ID selector, so a document's chunks
+    are found however large the rest of the corpus is.
+
+    Chunks and document membership live in a SQLite file and the vectors in
+    directories that are opened read-only and memory-mapped, so every worker
+    process of a server shares them. The vectors are a base generation plus
+    append-only delta segments: adding a document publishes one small flat
+    segment holding only its vectors, and removing one records its chunk IDs
+    as tombstones, so neither copies the rest of the corpus. Searches run on
+    the base and every segment and merge the results by distance.
+
+    Once there are CONFIG.CORPUS_MAX_SEGMENTS segments or
+    CONFIG.CORPUS_MAX_TOMBSTONES tombstones, a background compaction folds the
+    segments into a new base generation and drops the tombstoned vectors.
+    The base starts as an exact flat index; once it reaches the size where
+    the approximate CONFIG.FAISS_INDEX_TYPE pays off, a compaction rebuilds
+    it once as that type and later ones add to it incrementally.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(root / DATABASE_FILE, check_same_thread=False, timeout=30)
+        self._db_lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._views: dict[str, CorpusView] = {}
+        self._compaction: Future[bool] | None = None
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS documents (document_id TEXT PRIMARY KEY, chunks INTEGER)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS chunks "
+                "(id INTEGER PRIMARY KEY, document_id TEXT NOT NULL, page_content TEXT, metadata TEXT)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS chunks_document_id ON chunks (document_id)")
+            db.execute("CREATE TABLE IF NOT EXISTS segments (number INTEGER PRIMARY KEY, vectors INTEGER)")
+            db.execute("CREATE TABLE IF NOT EXISTS tombstones (id INTEGER PRIMARY KEY)")
+            db.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER)")
+            db.executemany(
+                "INSERT OR IGNORE INTO state VALUES (?, 0)",
+                [("next_id",), ("orphaned",), ("generation",), ("next_segment",), ("merged_segment",)],
+            )
+
+    def contains(self, document_id: str) -> bool:
+        with self._db() as db:
+            return db.execute("SELECT 1 FROM documents WHERE document_id = ?", (document_id,)).fetchone() is not None
+
+    def add_document(self, document_id: str, vectorstore: "FAISS") -> None:
+        """Publish the vectors and chunks of a document index as a delta segment.
+
+        Args:
+            document_id (str): The content hash of the document.
+            vectorstore (FAISS): The index of the document alone.
+
+        """
+        count = vectorstore.index.ntotal
+        vectors = vectorstore.index.reconstruct_n(0, count).astype(np.float32, copy=False)
+        chunks = [vectorstore.docstore.search(vectorstore.index_to_docstore_id[position]) for position in range(count)]
+
+        with self._writing():
+            if self.contains(document_id):
+                return
+            state = self._state()
+            ids = np.arange(state["next_id"], state["next_id"] + count, dtype=np.int64)
+            segment = state["next_segment"] + 1
+            if count:
+                self._publish_arrays(f"{SEGMENT_PREFIX}{segment}", vectors, ids)
+
+            with self._db() as db:
+                db.executemany(
+                    "INSERT INTO chunks VALUES (?, ?, ?, ?)",
+                    (
+                        (
+                            chunk_id,
+                            document_id,
+                            chunk.page_content,
+                            json.dumps({**chunk.metadata, "document_id": document_id}),
+                        )
+                        for chunk_id, chunk in zip(ids.tolist(), chunks, strict=True)
+                    ),
+                )
+                db.execute("INSERT INTO documents VALUES (?, ?)", (document_id, count))
+                db.execute(
+                    "UPDATE state SET value = ? WHERE key = 'next_id'",
+                    (int(ids[-1]) + 1 if count else state["next_id"],),
+                )
+                if count:
+                    db.execute("INSERT INTO segments VALUES (?, ?)", (segment, count))
+                    db.execute("UPDATE state SET value = ? WHERE key = 'next_segment'", (segment,))
+        LOG.info(f"Added document {document_id} to the corpus ({count} chunks)")
+        self._schedule_compaction()
+
+    def remove_document(self, document_id: str) -> None:
+        """Remove the chunks of a document from the corpus, if it holds them.
+
+        The chunks are deleted at once, so searches never select them again;
+        their vectors are recorded as tombstones and dropped by the next
+        compaction.
+        """
+        with self._writing():
+            if not self.contains(document_id):
+                return
+            with self._db() as db:
+                db.execute(
+                    "INSERT OR IGNORE INTO tombstones SELECT id FROM chunks WHERE document_id = ?", (document_id,)
+                )
+                db.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+                db.execute("DELETE FROM documents WHERE document_id = ?", (document_id,))
+        LOG.info(f"Removed document {document_id} from the corpus")
+        self._schedule_compaction()
+
+    def compact(self) -> bool:
+        """Fold the delta segments into a new base generation and drop tombstoned vectors.
+
+        The new base is built outside the write lock, so documents keep being
+        added and removed meanwhile; segments and tombstones recorded after
+        the compaction started are left for the next one. Only one process
+        compacts a corpus at a time.
+
+        Returns:
+            bool: True if a new generation was published, False if there was
+            nothing to compact or another compaction is running.
+
+        """
+        with self._compacting() as acquired:
+            if not acquired:
+                return False
+            with self._db() as db:
+                state = dict(db.execute("SELECT key, value FROM state").fetchall())
+                segments = [row[0] for row in db.execute("SELECT number FROM segments ORDER BY number")]
+                tombstones = np.array([row[0] for row in db.execute("SELECT id FROM tombstones")], dtype=np.int64)
+            if not segments and not len(tombstones):
+                return False
+
+            started = time.perf_counter()
+            generation, orphaned = state["generation"], state["orphaned"]
+            index = self._open_view(f"{GENERATION_PREFIX}{generation}").load_writable() if generation else None
+            if index is not None and len(tombstones):
+                if supports_removal(index):
+                    index.remove_ids(tombstones)
+                else:
+                    # HNSW graphs cannot drop vectors; searches never select them again
+                    orphaned += int(np.isin(faiss.vector_to_array(index.id_map), tombstones).sum())
+
+            for segment in segments:
+                vectors, ids = self._open_view(f"{SEGMENT_PREFIX}{segment}").load_arrays()
+                kept = ~np.isin(ids, tombstones)
+                if index is None:
+                    index = build_index(vectors[kept], ids[kept], "flat")
+                else:
+                    index.add_with_ids(vectors[kept], ids[kept])
+
+            if index is not None:
+                generation = self._publish_index(self._upgrade_index(index), generation + 1)
+            merged_segment = segments[-1] if segments else state["merged_segment"]
+            with self._db() as db:
+                db.executemany("DELETE FROM segments WHERE number = ?", ((segment,) for segment in segments))
+                db.executemany("DELETE FROM tombstones WHERE id = ?", ((chunk_id,) for chunk_id in tombstones.tolist()))
+                db.execute("UPDATE state SET value = ? WHERE key = 'orphaned'", (orphaned,))
+                db.execute("UPDATE state SET value = ? WHERE key = 'generation'", (generation,))
+                db.execute("UPDATE state SET value = ? WHERE key = 'merged_segment'", (merged_segment,))
+            self._remove_old_files(generation, state["merged_segment"])
+        LOG.info(
+            f"Compacted {len(segments)} corpus segments and {len(tombstones)} tombstones "
+            f"into generation {generation} in {time.perf_counter() - started:.2f}s"
+        )
+        return True
+
+    def search(self, embedding: list[float], document_ids: list[str], k: int) -> list[Document]:
+        """Find the chunks closest to a query embedding within some documents.
+
+        Args:
+            embedding (list[float]): The query embedding.
+            document_ids (list[str]): The documents to search.
+            k (int): The number of chunks to return.
+
+        Returns:
+            list[Document]: Up to k chunks, closest first.
+
+        """
+        return self.search_many([embedding], document_ids, k)[0]
+
+    def search_many(self, embeddings: list[list[float]], document_ids: list[str], k: int) -> list[list[Document]]:
+        """Find the chunks closest to each of several query embeddings in one search.
+
+        Args:
+            embeddings (list[list[float]]): The query embeddings.
+            document_ids (list[str]): The documents to search.
+            k (int): The number of chunks to return per query.
+
+        Returns:
+            list[list[Document]]: Up to k chunks per query, closest first.
+
+        """
+        ids = self._chunk_ids(document_ids)
+        views = self._current_views()
+        if not len(ids) or not views:
+            return [[] for _ in embeddings]
+        queries = np.array(embeddings, dtype=np.float32)
+        hits = [view.search(queries, ids, k) for view in views]
+        found = [[chunk_id for _, chunk_id in heapq.nsmallest(k, chain(*rows))] for rows in zip(*hits, strict=True)]
+        chunks = self._chunk_map(sorted({chunk_id for row in found for chunk_id in row}))
+        return [[chunks[chunk_id] for chunk_id in row if chunk_id in chunks] for row in found]
+
+    def as_retriever(self, embeddings: "Embeddings", document_ids: list[str], k: int = 1) -> "CorpusRetriever":
+        return CorpusRetriever(corpus=self, embeddings=embeddings, document_ids=document_ids, k=k)
+
+    def stats(self) -> dict[str, int | str]:
+        with self._db() as db:
+            documents = db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            chunks = db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            segments = db.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+            tombstones = db.execute("SELECT COUNT(*) FROM tombstones").fetchone()[0]
+        generation = self._state()["generation"]
+        return {
+            "documents": documents,
+            "chunks": chunks,
+            "index_type": self._open_view(f"{GENERATION_PREFIX}{generation}").index_type if generation else "flat",
+            "orphaned_vectors": self._state()["orphaned"],
+            "segments": segments,
+            "tombstones": tombstones,
+        }
+
+    def _schedule_compaction(self) -> None:
+        """Start a background compaction once there are enough segments or tombstones."""
+        with self._db() as db:
+            segments = db.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+            tombstones = db.execute("SELECT COUNT(*) FROM tombstones").fetchone()[0]
+        if segments < CONFIG.CORPUS_MAX_SEGMENTS and tombstones < CONFIG.CORPUS_MAX_TOMBSTONES:
+            return
+        with self._write_lock:
+            if self._compaction is None or self._compaction.done():
+                self._compaction = get_executor("ingest").submit(self.compact)
+
+    def _upgrade_index(self, index: faiss.Index) -> faiss.Index:
+        """Rebuild a flat index as the configured type once it is large enough for it."""
+        if get_index_type(index) != "flat" or CONFIG.FAISS_INDEX_TYPE == "flat":
+            return index
+        if index.ntotal < CONFIG.FAISS_FLAT_MAX_VECTORS:
+            return index
+        flat = faiss.downcast_index(index.index)
+        vectors = flat.reconstruct_n(0, flat.ntotal)
+        ids = faiss.vector_to_array(index.id_map)
+        started = time.perf_counter()
+        upgraded = build_index(vectors, ids, CONFIG.FAISS_INDEX_TYPE)
+        if get_index_type(upgraded) == "flat":
+            return index
+        LOG.info(
+            f"Rebuilt corpus index of {len(ids)} vectors as {CONFIG.FAISS_INDEX_TYPE} "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        return upgraded
+
+    def _publish_index(self, index: faiss.Index, generation: int) -> int:
+        """Write an index as a new generation directory and return its number."""
+        name = f"{GENERATION_PREFIX}{generation}"
+        if get_index_type(index) == "flat":
+            flat = faiss.downcast_index(index.index)
+            self._publish_arrays(name, flat.reconstruct_n(0, flat.ntotal), faiss.vector_to_array(index.id_map))
+            return generation
+        scratch = Path(tempfile.mkdtemp(dir=self.root, prefix=f".{name}-"))
+        faiss.write_index(index, str(scratch / INDEX_FILE))
+        scratch.rename(self.root / name)
+        return generation
+
+    def _publish_arrays(self, name: str, vectors: np.ndarray, ids: np.ndarray) -> None:
+        """Write flat vectors and their sorted IDs as a new directory."""
+        scratch = Path(tempfile.mkdtemp(dir=self.root, prefix=f".{name}-"))
+        np.save(scratch / VECTORS_FILE, vectors.astype(np.float32, copy=False))
+        np.save(scratch / IDS_FILE, ids.astype(np.int64, copy=False))
+        scratch.rename(self.root / name)
+
+    def _remove_old_files(self, generation: int, merged_segment: int) -> None:
+        # The previous generation, and the segments folded into it last, are
+        # kept for workers that are about to open them; workers that already
+        # mapped older ones keep reading their open files.
+        for path in self.root.glob(f"{GENERATION_PREFIX}*"):
+            if int(path.name.removeprefix(GENERATION_PREFIX)) < generation - 1:
+                shutil.rmtree(path, ignore_errors=True)
+        for path in self.root.glob(f"{SEGMENT_PREFIX}*"):
+            if int(path.name.removeprefix(SEGMENT_PREFIX)) <= merged_segment:
+                shutil.rmtree(path, ignore_errors=True)
+        with self._db_lock:
+            for name in [name for name in self._views if not (self.root / name).exists()]:
+                del self._views[name]
+
+    def _open_view(self, name: str) -> CorpusView:
+        """Get a published directory, opening it on first use."""
+        with self._db_lock:
+            if name not in self._views:
+                self._views[name] = CorpusView(self.root / name)
+            return self._views[name]
+
+    def _current_views(self) -> list[CorpusView]:
+        """Get the latest base generation and delta segments, opening new ones."""
+        with self._db() as db:
+            generation = db.execute("SELECT value FROM state WHERE key = 'generation'").fetchone()[0]
+            segments = [row[0] for row in db.execute("SELECT number FROM segments ORDER BY number")]
+        names = [f"{GENERATION_PREFIX}{generation}"] if generation else []
+        names.extend(f"{SEGMENT_PREFIX}{segment}" for segment in segments)
+        return [self._open_view(name) for name in names]
+
+    def _chunk_ids(self, document_ids: list[str]) -> np.ndarray:
+        ids: list[int] = []
+        with self._db() as db:
+            for start in range(0, len(document_ids), SQL_BATCH_SIZE):
+                batch = document_ids[start : start + SQL_BATCH_SIZE]
+                placeholders = ", ".join("?" * len(batch))
+                rows = db.execute(f"SELECT id FROM chunks WHERE document_id IN ({placeholders})", batch)  # noqa: S608
+                ids.extend(row[0] for row in rows)
+        return np.array(sorted(ids), dtype=np.int64)
+
+    def _chunk_map(self, ids: list[int]) -> dict[int, Document]:
+        if not ids:
+            return {}
+        placeholders = ", ".join("?" * len(ids))
+        with self._db() as db:
+            rows = db.execute(f"SELECT id, page_content, metadata FROM chunks WHERE id IN ({placeholders})", ids)  # noqa: S608
+            return {row[0]: Document(page_content=row[1], metadata=json.loads(row[2])) for row in rows}
+
+    def _state(self) -> dict[str, int]:
+        with self._db() as db:
+            return dict(db.execute("SELECT key, value FROM state").fetchall())
+
+    @contextmanager
+    def _db(self) -> "Iterator[sqlite3.Connection]":
+        """Use the SQLite connection in one transaction, committed on success."""
+        with self._db_lock, self._connection:
+            yield self._connection
+
+    @contextmanager
+    def _writing(self) -> "Iterator[None]":
+        """Serialise changes across the threads and processes sharing the corpus."""
+        with self._write_lock, (self.root / WRITE_LOCK_FILE).open("w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _compacting(self) -> "Iterator[bool]":
+        """Try to become the one compaction of the corpus, without waiting."""
+        with (self.root / COMPACT_LOCK_FILE).open("w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class CorpusRetriever(BaseRetriever):
+    """Retriever over the chunks of some documents of a corpus index."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    corpus: Any
+    embeddings: Any
+    document_ids: list[str]
+    k: int = 1
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: "CallbackManagerForRetrieverRun",  # noqa: ARG002 - part of the BaseRetriever interface
+    ) -> list[Document]:
+        return self.corpus.search(self.embeddings.embed_query(query), self.document_ids, self.k)
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: "AsyncCallbackManagerForRetrieverRun",  # noqa: ARG002 - part of the BaseRetriever interface
+    ) -> list[Document]:
+        embedding = await self.embeddings.aembed_query(query)
+        return await run_in_stage("index", self.corpus.search, embedding, self.document_ids, self.k)
+
+
+def get_corpus_index(index_key: str) -> CorpusIndex:
+    """Get the process-wide corpus index for an embedding fingerprint.
+
+    Args:
+        index_key (str): The key of the corpus, from make_index_key, so a new
+            embedding model or splitter setting starts a new corpus.
+
+    Returns:
+        CorpusIndex: The corpus stored under CONFIG.INDEX_CACHE_DIR.
+
+    """
+    with _CORPUS_LOCK:
+        if index_key not in CORPUS_INDEX_CACHE:
+            CORPUS_INDEX_CACHE[index_key] = CorpusIndex(Path(CONFIG.INDEX_CACHE_DIR) / "corpus" / index_key)
+        return CORPUS_INDEX_CACHE[index_key]
+
+
+def remove_from_corpora(document_id: str) -> None:
+    """Remove a document from every corpus index on disk.
+
+    Every corpus under CONFIG.INDEX_CACHE_DIR is opened, not only the ones
+    this process has loaded, so the document is also gone from corpora that
+    only other workers, or earlier pipeline settings, search.
+
+    Args:
+        document_id (str): The content hash of the document.
+
+    """
+    root = Path(CONFIG.INDEX_CACHE_DIR) / "corpus"
+    index_keys = {path.parent.name for path in root.glob(f"*/{DATABASE_FILE}")}
+    with _CORPUS_LOCK:
+        index_keys.update(CORPUS_INDEX_CACHE)
+    for index_key in sorted(index_keys):
+        get_corpus_index(index_key).remove_document(document_id)
@@ -0,0 +1,456 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from pypdf import PdfReader
+
+from app.backend.config import get_config_variables
+from app.backend.corpus import remove_from_corpora
+from app.backend.index_store import HASH_CHUNK_SIZE, IndexStore, get_index_store
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+LOG = logging.getLogger(__name__)
+CONFIG = get_config_variables()
+
+DOCUMENT_STORE_CACHE: dict[str, "DocumentStore"] = {}
+DOCUMENT_ID = re.compile(r"[0-9a-f]{64}")
+META_LOCK_FILE = "meta.lock"
+# Access times only order evictions, so they are written lazily
+ACCESS_FLUSH_SECONDS = 60.0
+
+
+@dataclass
+class DocumentRecord:
+    """Metadata of one stored document."""
+
+    document_id: str
+    original_name: str
+    suffix: str
+    size: int
+    page_count: int | None
+    created_at: float
+    last_access: float
+    path: str
+    tags: list[str] = field(default_factory=list)
+    index_bytes: int = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def count_pages(file_path: Path) -> int | None:
+    """Count the pages of a PDF, or return None for other or unreadable files."""
+    if file_path.suffix.lower() != ".pdf":
+        return None
+    try:
+        return len(PdfReader(str(file_path)).pages)
+    except Exception as e:  # noqa: BLE001 - page count is informational only
+        message = str(e)
+        LOG.warning(f"Could not count pages of {file_path.name}: {message}")
+        return None
+
+
+class DocumentStore:
+    """Content-addressed store of uploaded documents with a disk quota.
+
+    Each document is stored once under its content hash in blobs/, with a JSON
+    metadata file in meta/. The metadata files are shared by every worker
+    using the same directory: records are cached in memory but re-read on a
+    miss, and the quota is checked against the metadata on disk under a file
+    lock. When the blobs and their derived indices exceed the quota, the least
+    recently accessed documents are evicted together with their indices. The
+    bytes of a document's indices are kept on its record, updated by the index
+    store whenever one is saved or deleted, so checking the quota never walks
+    the index directories. Accesses are kept in memory and written to the
+    metadata at most every ACCESS_FLUSH_SECONDS, and before every eviction.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, index_store: IndexStore) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_store = index_store
+        self.evictions = 0
+        self.blob_dir = root / "blobs"
+        self.meta_dir = root / "meta"
+        self.incoming_dir = root / "incoming"
+        for directory in (self.blob_dir, self.meta_dir, self.incoming_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.RLock()
+        # Taken alone, never around index store or corpus calls: those report
+        # index sizes back through _on_index_size, which takes it again.
+        self._meta_lock = threading.Lock()
+        self._records: dict[str, DocumentRecord] = {}
+        self._accessed: set[str] = set()
+        self._flushed_at = time.monotonic()
+        for meta_file in self.meta_dir.glob("*.json"):
+            record = self._read_meta(meta_file)
+            if record is not None:
+                self._records[record.document_id] = record
+        index_store.add_size_listener(self._on_index_size)
+
+    def incoming_path(self, filename: str | None) -> Path:
+        """Get the staging path of an upload that is still being received.
+
+        Args:
+            filename (str | None): The original file name of the upload.
+
+        Returns:
+            Path: A path in the incoming directory.
+
+        Raises:
+            FileNotFoundError: If the filename is None.
+
+        """
+        if filename is None:
+            msg = "Uploaded file must have a filename."
+            raise FileNotFoundError(msg)
+        return self.incoming_dir / Path(filename).name
+
+    def get(self, document_id: str) -> DocumentRecord | None:
+        """Get a document, also if another worker stored it, unless any worker removed it."""
+        with self._lock:
+            return self._lookup(document_id)
+
+    def add(
+        self,
+        staged_file: Path,
+        document_id: str,
+        original_name: str,
+        size: int,
+        tags: list[str] | None = None,
+    ) -> tuple[DocumentRecord, bool]:
+        """Move a staged upload into the store.
+
+        Content that is already stored is not stored again: the staged file is
+        removed and the existing record is returned, with the new tags added.
+
+        Args:
+            staged_file (Path): The fully written upload.
+            document_id (str): The SHA-256 hash of its content.
+            original_name (str): The file name given by the uploader.
+            size (int): The size in bytes.
+            tags (list[str] | None): Tags to select the document by in chat.
+
+        Returns:
+            tuple[DocumentRecord, bool]: The record, and whether it was newly added.
+
+        """
+        # Parsing the PDF is slow, so it is done before other uploads are held up
+        page_count = None if self.get(document_id) else count_pages(staged_file)
+        with self._lock:
+            existing = self._lookup(document_id)
+            if existing is not None:
+                staged_file.unlink(missing_ok=True)
+                existing.tags = sorted({*existing.tags, *(tags or [])})
+                self._update_meta(document_id, lambda record: setattr(record, "tags", existing.tags))
+                self._touch(existing)
+                return existing, False
+
+            suffix = Path(original_name).suffix.lower()
+            blob = self.blob_dir / f"{document_id}{suffix}"
+            os.replace(staged_file, blob)  # noqa: PTH105 - os.replace is the atomic rename
+
+            now = time.time()
+            record = DocumentRecord(
+                document_id=document_id,
+                original_name=Path(original_name).name,
+                suffix=suffix,
+                size=size,
+                page_count=page_count,
+                created_at=now,
+                last_access=now,
+                path=str(blob),
+                tags=sorted(set(tags or [])),
+                # Indices of the same content may survive from an earlier store
+                index_bytes=self.index_store.document_bytes(document_id),
+            )
+            self._records[document_id] = record
+            with self._locked_meta():
+                self._write_meta(record)
+            LOG.info(f"Stored document {document_id} ({record.original_name}, {size} bytes)")
+
+            self.enforce_quota(keep=document_id)
+            return record, True
+
+    def import_file(self, source: Path, original_name: str | None = None) -> DocumentRecord:
+        """Copy a local file into the store.
+
+        Args:
+            source (Path): The file to copy.
+            original_name (str | None): The name to record. Defaults to the file name.
+
+        Returns:
+            DocumentRecord: The stored document.
+
+        """
+        digest = hashlib.sha256()
+        staged_file = self.incoming_dir / f"{uuid.uuid4().hex}{source.suffix}"
+        with source.open("rb") as src, staged_file.open("wb") as dst:
+            while chunk := src.read(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+                dst.write(chunk)
+        record, _ = self.add(staged_file, digest.hexdigest(), original_name or source.name, source.stat().st_size)
+        return record
+
+    def resolve(self, data_source: str) -> DocumentRecord:
+        """Resolve a chat data source to a stored document.
+
+        The data source may be a document ID, a stored blob name or path, or the
+        original file name (the most recently used document of that name wins).
+
+        Args:
+            data_source (str): The data source sent by the client.
+
+        Returns:
+            DocumentRecord: The document, marked as accessed.
+
+        Raises:
+            FileNotFoundError: If no stored document matches.
+
+        """
+        name = Path(data_source).name
+        with self._lock:
+            record = self._lookup(Path(name).stem)
+            if record is None:
+                named = [r for r in self._refresh() if r.original_name == name]
+                record = max(named, key=lambda r: r.last_access) if named else None
+            if record is None:
+                msg = f"Document not found: {data_source}"
+                raise FileNotFoundError(msg)
+
+            self._touch(record)
+            return record
+
+    def find_by_tag(self, tag: str) -> list[DocumentRecord]:
+        """Get every document with a tag, marked as accessed.
+
+        Args:
+            tag (str): The tag given on upload.
+
+        Returns:
+            list[DocumentRecord]: The documents, oldest first.
+
+        Raises:
+            FileNotFoundError: If no stored document has the tag.
+
+        """
+        with self._lock:
+            tagged = sorted((r for r in self._refresh() if tag in r.tags), key=lambda r: r.created_at)
+            if not tagged:
+                msg = f"No document tagged: {tag}"
+                raise FileNotFoundError(msg)
+            for record in tagged:
+                self._touch(record)
+            return tagged
+
+    def delete(self, document_id: str) -> None:
+        """Remove a document, its metadata, its derived indices and its corpus chunks."""
+        with self._locked_meta():
+            meta_file = self.meta_dir / f"{document_id}.json"
+            record = self._read_meta(meta_file)
+            meta_file.unlink(missing_ok=True)
+        with self._lock:
+            cached = self._records.pop(document_id, None)
+            self._accessed.discard(document_id)
+        if record or cached:
+            self._remove_files(record or cached)
+
+    def total_bytes(self) -> int:
+        """Get the bytes used by the documents of every worker and their indices."""
+        with self._locked_meta():
+            return sum(record.size + record.index_bytes for record in self._read_all_meta())
+
+    def enforce_quota(self, keep: str | None = None) -> list[str]:
+        """Evict least recently accessed documents until the store fits its quota.
+
+        The usage and the access times are read from the metadata on disk, so
+        the documents of every worker count against the quota. The evicted
+        documents' metadata is removed under the file lock; their blobs and
+        indices are removed after it is released.
+
+        Args:
+            keep (str | None): A document that must not be evicted, e.g. the one
+                just added.
+
+        Returns:
+            list[str]: The IDs of the evicted documents.
+
+        """
+        self.flush_accesses()
+        evicted: list[DocumentRecord] = []
+        with self._locked_meta():
+            records = self._read_all_meta()
+            total = sum(record.size + record.index_bytes for record in records)
+            for record in sorted(records, key=lambda r: r.last_access):
+                if total <= self.max_bytes:
+                    break
+                if record.document_id == keep:
+                    continue
+                (self.meta_dir / f"{record.document_id}.json").unlink(missing_ok=True)
+                total -= record.size + record.index_bytes
+                evicted.append(record)
+
+        with self._lock:
+            for record in evicted:
+                self._records.pop(record.document_id, None)
+                self._accessed.discard(record.document_id)
+            self.evictions += len(evicted)
+        for record in evicted:
+            self._remove_files(record)
+
+        if evicted:
+            LOG.info(f"Evicted {len(evicted)} documents to stay within {self.max_bytes} bytes")
+        return [record.document_id for record in evicted]
+
+    def flush_accesses(self) -> None:
+        """Write the access times kept in memory to the metadata of their documents."""
+        with self._lock:
+            accessed = {document_id: self._records[document_id].last_access for document_id in self._accessed}
+            self._accessed.clear()
+            self._flushed_at = time.monotonic()
+        for document_id, last_access in accessed.items():
+            self._update_meta(
+                document_id, lambda record, at=last_access: setattr(record, "last_access", max(record.last_access, at))
+            )
+
+    def stats(self) -> dict[str, Any]:
+        with self._locked_meta():
+            records = self._read_all_meta()
+        return {
+            "documents": len(records),
+            "total_bytes": sum(record.size + record.index_bytes for record in records),
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+    def _lookup(self, document_id: str) -> DocumentRecord | None:
+        # The metadata file is the record of truth; another worker may have
+        # added or evicted the document since it was cached.
+        if not DOCUMENT_ID.fullmatch(document_id):
+            return None
+        meta_file = self.meta_dir / f"{document_id}.json"
+        if not meta_file.exists():
+            self._records.pop(document_id, None)
+            self._accessed.discard(document_id)
+            return None
+        if document_id not in self._records:
+            record = self._read_meta(meta_file)
+            if record is None:
+                return None
+            self._records[document_id] = record
+        return self._records[document_id]
+
+    def _refresh(self) -> list[DocumentRecord]:
+        stored = {meta_file.stem for meta_file in self.meta_dir.glob("*.json")}
+        for document_id in set(self._records) - stored:
+            del self._records[document_id]
+            self._accessed.discard(document_id)
+        for document_id in stored - set(self._records):
+            self._lookup(document_id)
+        return list(self._records.values())
+
+    def _touch(self, record: DocumentRecord) -> None:
+        record.last_access = time.time()
+        self._accessed.add(record.document_id)
+        if time.monotonic() - self._flushed_at >= ACCESS_FLUSH_SECONDS:
+            self.flush_accesses()
+
+    def _on_index_size(self, document_id: str, change: int) -> None:
+        def apply(record: DocumentRecord) -> None:
+            record.index_bytes = max(0, record.index_bytes + change)
+
+        updated = self._update_meta(document_id, apply)
+        cached = self._records.get(document_id)
+        if updated is not None and cached is not None:
+            cached.index_bytes = updated.index_bytes
+
+    def _remove_files(self, record: DocumentRecord) -> None:
+        Path(record.path).unlink(missing_ok=True)
+        self.index_store.delete_document(record.document_id)
+        remove_from_corpora(record.document_id)
+
+    @contextmanager
+    def _locked_meta(self) -> "Iterator[None]":
+        """Serialise metadata changes across the threads and processes sharing the store."""
+        with self._meta_lock, (self.root / META_LOCK_FILE).open("w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _update_meta(self, document_id: str, change: "Callable[[DocumentRecord], None]") -> DocumentRecord | None:
+        """Change the stored metadata of a document, unless it was removed."""
+        with self._locked_meta():
+            record = self._read_meta(self.meta_dir / f"{document_id}.json")
+            if record is None:
+                return None
+            change(record)
+            self._write_meta(record)
+            return record
+
+    def _read_all_meta(self) -> list[DocumentRecord]:
+        records = (self._read_meta(meta_file) for meta_file in self.meta_dir.glob("*.json"))
+        return [record for record in records if record is not None]
+
+    def _read_meta(self, meta_file: Path) -> DocumentRecord | None:
+        try:
+            meta = json.loads(meta_file.read_text())
+        except FileNotFoundError:
+            return None
+        record = DocumentRecord(**meta)
+        if not Path(record.path).exists():
+            return None
+        if "index_bytes" not in meta:
+            # Written before index sizes were tracked
+            record.index_bytes = self.index_store.document_bytes(record.document_id)
+            self._write_meta(record)
+        return record
+
+    def _write_meta(self, record: DocumentRecord) -> None:
+        # Write then rename so a crash never leaves truncated metadata behind.
+        with tempfile.NamedTemporaryFile("w", dir=self.meta_dir, suffix=".tmp", delete=False) as tmp:
+            json.dump(record.to_dict(), tmp)
+        os.replace(tmp.name, self.meta_dir / f"{record.document_id}.json")  # noqa: PTH105
+
+
+def clear_incoming(store: DocumentStore) -> None:
+    """Remove uploads left half-written by a previous process."""
+    shutil.rmtree(store.incoming_dir, ignore_errors=True)
+    store.incoming_dir.mkdir(parents=True, exist_ok=True)
+
+
+def get_document_store() -> DocumentStore:
+    """Get the process-wide document store.
+
+    Returns:
+        DocumentStore: The store rooted at CONFIG.DOCUMENT_STORE_DIR.
+
+    """
+    cache_key = "default"
+    if cache_key not in DOCUMENT_STORE_CACHE:
+        store = DocumentStore(Path(CONFIG.DOCUMENT_STORE_DIR), CONFIG.DOCUMENT_STORE_MAX_BYTES, get_index_store())
+        clear_incoming(store)
+        DOCUMENT_STORE_CACHE[cache_key] = store
+    return DOCUMENT_STORE_CACHE[cache_key]
+
+
+def flush_document_stores() -> None:
+    """Write the access times kept in memory by every document store, e.g. on shutdown."""
+    for store in DOCUMENT_STORE_CACHE.values():
+        store.flush_accesses()
@@ -0,0 +1,246 @@
+import fcntl
+import hashlib
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from app.backend.config import get_config_variables
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from langchain_core.embeddings import Embeddings
+
+LOG = logging.getLogger(__name__)
+CONFIG = get_config_variables()
+
+EMBEDDING_STORE_CACHE: dict[str, "EmbeddingStore"] = {}
+_STORE_LOCK = threading.Lock()
+SQL_BATCH_SIZE = 500
+
+
+def hash_chunk(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class EmbeddingStore:
+    """Content-addressed on-disk store of chunk embeddings for one model.
+
+    Vectors are appended as raw float16 or float32 rows to segment files of
+    about segment_bytes each, and a SQLite table maps each chunk hash to its
+    segment and row. When the segments exceed max_bytes the oldest one is
+    dropped; vectors read from an older segment are copied into the newest
+    one first, so the chunks still in use survive eviction. The row counts
+    in SQLite are authoritative: bytes past them, left by a writer that
+    crashed before committing, are overwritten by the next append.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, segment_bytes: int, dtype: str) -> None:
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.dtype = np.dtype(dtype)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._connection = sqlite3.connect(root / "index.sqlite", check_same_thread=False, timeout=30)
+        self._db_lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS segments (segment INTEGER PRIMARY KEY, dim INTEGER, rows INTEGER)")
+            db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, segment INTEGER, row INTEGER)")
+            db.execute("CREATE INDEX IF NOT EXISTS entries_segment ON entries (segment)")
+
+    def segment_path(self, segment: int) -> Path:
+        return self.root / f"segment-{segment:08d}.{self.dtype.name}"
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        """Read the stored vectors of some chunk hashes.
+
+        Args:
+            keys (list[str]): The chunk hashes.
+
+        Returns:
+            dict[str, np.ndarray]: The float32 vector of every hash that is stored.
+
+        """
+        locations: list[tuple[str, int, int]] = []
+        with self._db() as db:
+            for start in range(0, len(keys), SQL_BATCH_SIZE):
+                batch = keys[start : start + SQL_BATCH_SIZE]
+                placeholders = ", ".join("?" * len(batch))
+                locations.extend(
+                    db.execute(f"SELECT key, segment, row FROM entries WHERE key IN ({placeholders})", batch)  # noqa: S608
+                )
+            segments = dict(db.execute("SELECT segment, dim FROM segments").fetchall())
+
+        found: dict[str, np.ndarray] = {}
+        by_segment: dict[int, list[tuple[str, int]]] = {}
+        for key, segment, row in locations:
+            by_segment.setdefault(segment, []).append((key, row))
+        for segment, rows in by_segment.items():
+            try:
+                matrix = np.memmap(self.segment_path(segment), dtype=self.dtype, mode="r").reshape(
+                    -1, segments[segment]
+                )
+            except (FileNotFoundError, KeyError, ValueError):
+                continue  # evicted by another process since the lookup
+            for key, row in rows:
+                found[key] = np.asarray(matrix[row], dtype=np.float32)
+
+        with self._db_lock:
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+
+        newest = max(segments, default=0)
+        stale = {key: found[key] for key, segment, _ in locations if segment != newest and key in found}
+        if stale:
+            self.put_many(stale)
+        return found
+
+    def put_many(self, vectors: dict[str, np.ndarray]) -> None:
+        """Append vectors to the newest segment, then evict over the quota.
+
+        Args:
+            vectors (dict[str, np.ndarray]): The vector of each chunk hash.
+
+        """
+        if not vectors:
+            return
+        keys = list(vectors)
+        matrix = np.asarray([vectors[key] for key in keys], dtype=self.dtype)
+        with self._writing():
+            with self._db() as db:
+                row = db.execute("SELECT segment, dim, rows FROM segments ORDER BY segment DESC LIMIT 1").fetchone()
+            segment, dim, rows = row if row is not None else (0, matrix.shape[1], 0)
+            if row is None or dim != matrix.shape[1] or (rows + len(keys)) * matrix[0].nbytes > self.segment_bytes:
+                segment, rows = segment + 1, 0
+
+            with self.segment_path(segment).open("ab") as file:
+                # Drops rows a crashed writer appended but never recorded, so
+                # the new rows start exactly where the table says they do.
+                file.truncate(rows * matrix[0].nbytes)
+                file.write(matrix.tobytes())
+            with self._db() as db:
+                db.execute(
+                    "INSERT OR REPLACE INTO segments VALUES (?, ?, ?)", (segment, matrix.shape[1], rows + len(keys))
+                )
+                db.executemany(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                    ((key, segment, rows + offset) for offset, key in enumerate(keys)),
+                )
+            self._enforce_quota()
+
+    def total_bytes(self) -> int:
+        return sum(path.stat().st_size for path in self.root.glob("segment-*"))
+
+    def stats(self) -> dict[str, Any]:
+        with self._db() as db:
+            entries = db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        with self._db_lock:
+            return {
+                "entries": entries,
+                "bytes": self.total_bytes(),
+                "max_bytes": self.max_bytes,
+                "dtype": self.dtype.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _enforce_quota(self) -> None:
+        with self._db() as db:
+            segments = [row[0] for row in db.execute("SELECT segment FROM segments ORDER BY segment")]
+        total = self.total_bytes()
+        for segment in segments[:-1]:
+            if total <= self.max_bytes:
+                break
+            path = self.segment_path(segment)
+            size = path.stat().st_size if path.exists() else 0
+            with self._db() as db:
+                db.execute("DELETE FROM entries WHERE segment = ?", (segment,))
+                db.execute("DELETE FROM segments WHERE segment = ?", (segment,))
+            path.unlink(missing_ok=True)
+            total -= size
+            self.evictions += 1
+            LOG.info(f"Evicted embedding segment {segment} ({size} bytes)")
+
+    @contextmanager
+    def _db(self) -> "Iterator[sqlite3.Connection]":
+        """Use the SQLite connection in one transaction, committed on success."""
+        with self._db_lock, self._connection:
+            yield self._connection
+
+    @contextmanager
+    def _writing(self) -> "Iterator[None]":
+        """Serialise appends across the threads and processes sharing the store."""
+        with self._write_lock, (self.root / "write.lock").open("w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def get_embedding_store() -> EmbeddingStore:
+    """Get the process-wide embedding store of the configured model.
+
+    Anything that changes the produced vectors is part of the store's
+    directory name, so a new model or sequence length never reuses them.
+
+    Returns:
+        EmbeddingStore: The store under CONFIG.EMBEDDING_CACHE_DIR.
+
+    """
+    fingerprint = hashlib.sha256(
+        f"{CONFIG.EMBEDDING_MODEL_NAME}|{CONFIG.EMBEDDING_MAX_SEQ_LENGTH}".encode()
+    ).hexdigest()[:16]
+    with _STORE_LOCK:
+        if fingerprint not in EMBEDDING_STORE_CACHE:
+            EMBEDDING_STORE_CACHE[fingerprint] = EmbeddingStore(
+                Path(CONFIG.EMBEDDING_CACHE_DIR) / fingerprint,
+                CONFIG.EMBEDDING_CACHE_MAX_BYTES,
+                CONFIG.EMBEDDING_CACHE_SEGMENT_BYTES,
+                CONFIG.EMBEDDING_CACHE_DTYPE,
+            )
+        return EMBEDDING_STORE_CACHE[fingerprint]
+
+
+def embed_documents_cached(embeddings: "Embeddings", texts: list[str]) -> list[list[float]]:
+    """Embed chunks, reusing the stored vectors of chunks seen before.
+
+    Only chunks whose text is not in the embedding store go through the model,
+    so re-ingesting an edited document embeds just its changed chunks.
+
+    Args:
+        embeddings (Embeddings): The embedding model of CONFIG.EMBEDDING_MODEL_NAME.
+        texts (list[str]): The chunk texts.
+
+    Returns:
+        list[list[float]]: One vector per text.
+
+    """
+    if not CONFIG.EMBEDDING_CACHE_ENABLED:
+        return embeddings.embed_documents(texts)
+
+    store = get_embedding_store()
+    keys = [hash_chunk(text) for text in texts]
+    found = store.get_many(keys)
+    missing = {key: text for key, text in zip(keys, texts, strict=True) if key not in found}
+    if missing:
+        vectors = embeddings.embed_documents(list(missing.values()))
+        # Round through the stored dtype so a chunk gets the same vector on a hit and a miss.
+        computed = {
+            key: np.asarray(vector, dtype=store.dtype).astype(np.float32)
+            for key, vector in zip(missing, vectors, strict=True)
+        }
+        store.put_many(computed)
+        found.update(computed)
+    return [found[key].tolist() for key in keys]
@@ -0,0 +1,109 @@
+import logging
+import resource
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from app.backend.config import get_config_variables
+
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+
+LOG = logging.getLogger(__name__)
+CONFIG = get_config_variables()
+
+EMBEDDINGS_CACHE: dict[str, "Embeddings"] = {}
+EMBEDDINGS_LOAD_STATS: dict[str, dict[str, Any]] = {}
+_EMBEDDINGS_LOCK = threading.Lock()
+
+
+def get_rss_bytes() -> int:
+    """Get the resident memory of the current process.
+
+    Returns:
+        int: The current resident set size in bytes, or the peak resident set
+        size where /proc is not available.
+
+    """
+    statm = Path("/proc/self/statm")
+    if statm.exists():
+        resident_pages = int(statm.read_text().split()[1])
+        return resident_pages * resource.getpagesize()
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _load_embeddings(model_name: str) -> "Embeddings":
+    """Load a sentence-transformers model with the configured runtime settings."""
+    if CONFIG.EMBEDDING_NUM_THREADS:
+        import torch  # noqa: PLC0415 - only needed when the thread count is pinned
+
+        torch.set_num_threads(CONFIG.EMBEDDING_NUM_THREADS)
+
+    from langchain_huggingface import HuggingFaceEmbeddings  # noqa: PLC0415 - slow import, only needed to load a model
+
+    embeddings = HuggingFaceEmbeddings(model_name=model_name)
+    if CONFIG.EMBEDDING_MAX_SEQ_LENGTH and hasattr(embeddings, "_client"):
+        embeddings._client.max_seq_length = CONFIG.EMBEDDING_MAX_SEQ_LENGTH  # noqa: SLF001
+
+    return embeddings
+
+
+def get_embeddings(model_name: str | None = None) -> "Embeddings":
+    """Get the shared embedding model, loading it once per process.
+
+    Models are cached in EMBEDDINGS_CACHE by name. Loading is serialised by a
+    lock so concurrent first requests do not load the same weights twice.
+
+    Args:
+        model_name (str | None): The model to load. Defaults to
+            CONFIG.EMBEDDING_MODEL_NAME.
+
+    Returns:
+        Embeddings: The embedding model.
+
+    """
+    model_name = model_name or CONFIG.EMBEDDING_MODEL_NAME
+    if model_name in EMBEDDINGS_CACHE:
+        return EMBEDDINGS_CACHE[model_name]
+
+    with _EMBEDDINGS_LOCK:
+        if model_name in EMBEDDINGS_CACHE:
+            return EMBEDDINGS_CACHE[model_name]
+
+        rss_before = get_rss_bytes()
+        start = time.perf_counter()
+        embeddings = _load_embeddings(model_name)
+        load_seconds = time.perf_counter() - start
+        rss_after = get_rss_bytes()
+
+        EMBEDDINGS_LOAD_STATS[model_name] = {
+            "load_seconds": round(load_seconds, 3),
+            "rss_bytes": rss_after,
+            "rss_delta_bytes": rss_after - rss_before,
+        }
+        LOG.info(f"Loaded embedding model {model_name} in {load_seconds:.2f}s ({EMBEDDINGS_LOAD_STATS[model_name]})")
+
+        EMBEDDINGS_CACHE[model_name] = embeddings
+        return embeddings
+
+
+def warmup_embeddings() -> None:
+    """Load the configured embedding model and run one query through it.
+
+    Called at startup so the first request does not pay for loading weights.
+    """
+    get_embeddings().embed_query("warmup")
+
+
+def get_embedding_stats() -> dict[str, Any]:
+    """Report the load time and memory of every loaded embedding model.
+
+    Returns:
+        dict: The load statistics per model and the current process RSS.
+
+    """
+    return {
+        "models": dict(EMBEDDINGS_LOAD_STATS),
+        "process_rss_bytes": get_rss_bytes(),
+    }
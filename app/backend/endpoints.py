@@ -1,13 +1,34 @@
 import logging
+from typing import TYPE_CHECKING, Annotated, Any
 
-import aiofiles
-from fastapi import APIRouter, HTTPException, UploadFile, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, BackgroundTasks, Form, HTTPException, UploadFile, status
+from fastapi import Path as PathParam
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 
-from app.backend.chat import get_response
+from app.backend.batching import get_batching_stats
+from app.backend.chat import aget_batch_responses, aget_response, astream_response, get_corpus
+from app.backend.concurrency import run_in_stage
 from app.backend.config import get_config_variables
-from app.backend.models import ChatMessageSent
-from app.backend.utils import add_session_history, get_session, get_temp_file_path
+from app.backend.document_store import get_document_store
+from app.backend.embedding_store import get_embedding_store
+from app.backend.embeddings import get_embedding_stats
+from app.backend.history import acompact_history
+from app.backend.index_store import get_index_store
+from app.backend.ingest import create_job, get_job_status, run_ingestion
+from app.backend.metrics import CONTENT_TYPE, render_metrics
+from app.backend.models import ChatBatchSent, ChatMessageSent  # noqa: TC001 - FastAPI resolves them at runtime
+from app.backend.utils import (
+    UploadTooLargeError,
+    aadd_session_history,
+    format_sse_event,
+    get_session,
+    save_upload,
+)
+from app.backend.warmup import get_warmup_state
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
 
 LOG = logging.getLogger(__name__)
 
@@ -20,17 +41,21 @@ routes = APIRouter()
 @routes.post("/chat")
 async def create_chat_message(
     chats: ChatMessageSent,
+    background_tasks: BackgroundTasks,
 ) -> JSONResponse:
     """Create a chat message and obtain a response based on user input and session.
 
     This route allows users to send chat messages, and it returns responses based on
     the provided input and the associated session. If a session ID is not provided
     in the request, a new session is created. The conversation history is updated, and
-    the response, along with the session ID, is returned.
+    the response, along with the session ID, is returned. Blocking work runs on sized
+    executors so a slow chat never stalls other requests on the worker. Turns that no
+    longer fit in the history token budget are summarised after the response is sent.
 
     Args:
         chats (ChatMessageSent): A Pydantic model representing the chat message, including
-        session ID, user input, and data source.
+        session ID, user input, and the documents (data source, document IDs or tag).
+        background_tasks (BackgroundTasks): Compacts the session history after the response.
 
     Returns:
         JSONResponse: A JSON response containing the response message and the session ID.
@@ -41,67 +66,138 @@ async def create_chat_message(
 
     """
     try:
-        if chats.session_id is None:
-            session_id = get_session()
+        session_id = chats.session_id or get_session()
+
+        response = await aget_response(
+            file_name=chats.data_source,
+            session_id=session_id,
+            query=chats.user_input,
+            document_ids=chats.document_ids,
+            tag=chats.tag,
+            bypass_cache=chats.bypass_cache,
+            chat_mode=chats.chat_mode,
+        )
 
-            payload = ChatMessageSent(
-                session_id=session_id,
-                user_input=chats.user_input,
-                data_source=chats.data_source,
-            )
-            payload_dict: dict[str, str] = payload.model_dump()
+        await aadd_session_history(
+            session_id=session_id,
+            new_values=[chats.user_input, response.get("answer", "")],
+        )
+        background_tasks.add_task(acompact_history, session_id)
 
-            response = get_response(
-                file_name=payload_dict.get("data_source") or "",
-                session_id=payload_dict.get("session_id") or "",
-                query=payload_dict.get("user_input") or "",
-            )
+        return JSONResponse(
+            content={
+                "response": response,
+                "session_id": session_id,
+            }
+        )
+    except Exception as e:
+        message = str(e)
+        LOG.exception(f"Error in create_chat_message: {message}")
+        raise HTTPException(  # noqa: B904
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal Server Error",
+        )
+
+
+@routes.post("/chat/stream")
+async def stream_chat_message(
+    chats: ChatMessageSent,
+) -> StreamingResponse:
+    """Stream the answer to a chat message as Server-Sent Events.
+
+    Each answer token is sent as a "token" event as soon as the LLM produces it.
+    When the answer is complete it is saved to the session history and an "end"
+    event carries the full response and the session ID. If a session ID is not
+    provided in the request, a new session is created. The session history is
+    compacted once the stream has ended.
+
+    Args:
+        chats (ChatMessageSent): A Pydantic model representing the chat message, including
+        session ID, user input, and the documents (data source, document IDs or tag).
+
+    Returns:
+        StreamingResponse: A text/event-stream response of "token" events followed
+        by one "end" event, or an "error" event if processing fails.
 
-            add_session_history(
+    """
+    session_id = chats.session_id or get_session()
+
+    async def event_stream() -> "AsyncIterator[str]":
+        try:
+            response: dict[str, Any] = {}
+            async for item in astream_response(
+                file_name=chats.data_source,
+                session_id=session_id,
+                query=chats.user_input,
+                document_ids=chats.document_ids,
+                tag=chats.tag,
+                bypass_cache=chats.bypass_cache,
+                chat_mode=chats.chat_mode,
+            ):
+                if "token" in item:
+                    yield format_sse_event("token", item)
+                else:
+                    response = item
+
+            await aadd_session_history(
                 session_id=session_id,
-                new_values=[
-                    payload_dict.get("user_input", "") or "",
-                    response["answer"],
-                ],
+                new_values=[chats.user_input, response.get("answer", "")],
             )
+            yield format_sse_event("end", {"response": response, "session_id": session_id})
+        except Exception as e:
+            message = str(e)
+            LOG.exception(f"Error in stream_chat_message: {message}")
+            yield format_sse_event("error", {"detail": "Internal Server Error"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(acompact_history, session_id),
+    )
+
+
+@routes.post("/chat/batch")
+async def create_chat_batch(
+    batch: ChatBatchSent,
+) -> JSONResponse:
+    """Answer many independent questions about the same documents in one call.
 
-            return JSONResponse(
-                content={
-                    "response": response,
-                    "session_id": str(session_id),
-                }
-            )
+    The questions share one document resolution, one batch of query embeddings
+    and one vectorised search, and their LLM calls run concurrently. They are
+    not part of any session history.
 
-        payload = ChatMessageSent(
-            session_id=str(chats.session_id),
-            user_input=chats.user_input,
-            data_source=chats.data_source,
-        )
-        payload_dict = payload.model_dump()
+    Args:
+        batch (ChatBatchSent): A Pydantic model with the questions and the
+        documents (data source, document IDs or tag).
 
-        response = get_response(
-            file_name=payload_dict.get("data_source") or "",
-            session_id=payload_dict.get("session_id") or "",
-            query=payload_dict.get("user_input") or "",
-        )
+    Returns:
+        JSONResponse: A JSON response with the answer and token usage of each
+        question, in order, and the total tokens used.
+
+    Raises:
+        HTTPException: 422 if there are more than CONFIG.BATCH_MAX_QUESTIONS
+        questions, or 500 if the batch cannot be processed.
 
-        add_session_history(
-            session_id=payload_dict.get("session_id") or "",
-            new_values=[
-                payload_dict.get("user_input") or "",
-                response.get("answer", ""),
-            ],
+    """
+    if len(batch.questions) > CONFIG.BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"A batch has at most {CONFIG.BATCH_MAX_QUESTIONS} questions.",
         )
 
-        return JSONResponse(
-            content={
-                "response": response,
-                "session_id": str(chats.session_id),
-            }
+    try:
+        response = await aget_batch_responses(
+            file_name=batch.data_source,
+            queries=batch.questions,
+            document_ids=batch.document_ids,
+            tag=batch.tag,
+            bypass_cache=batch.bypass_cache,
         )
+        return JSONResponse(content=response)
     except Exception as e:
         message = str(e)
-        LOG.exception(f"Error in create_chat_message: {message}")
+        LOG.exception(f"Error in create_chat_batch: {message}")
         raise HTTPException(  # noqa: B904
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal Server Error",
@@ -109,38 +205,79 @@ async def create_chat_message(
 
 
 @routes.post("/uploadFile")
-async def upload_file(data_file: UploadFile) -> JSONResponse:
-    """Upload a file locally.
+async def upload_file(
+    data_file: UploadFile,
+    background_tasks: BackgroundTasks,
+    tags: Annotated[str | None, Form()] = None,
+) -> JSONResponse:
+    """Upload a file locally and start indexing it in the background.
 
-    This function saves the uploaded file to a local temp directory and returns its path.
+    This function streams the uploaded file to the document store in chunks,
+    hashing it on the way. Documents are stored under their content hash, so
+    uploads of different files with the same name never collide, and content
+    that was already uploaded is not stored again. Unless it is indexed already,
+    it schedules its ingestion (load, split, embed, index), so the first chat about
+    it only pays for retrieval and the LLM call. Readiness can be polled on
+    /documents/{document_id}/status.
 
     Args:
         data_file (UploadFile): The file to be uploaded.
+        background_tasks (BackgroundTasks): Runs the ingestion after the response.
+        tags (str | None): Comma-separated tags to select the document by in chat.
 
     Returns:
-        JSONResponse: A JSON response with file metadata.
+        JSONResponse: A JSON response with file metadata, the document ID and
+        the ingestion status.
 
     Raises:
-        HTTPException: If file saving fails.
+        HTTPException: 413 if the file exceeds CONFIG.MAX_UPLOAD_BYTES, 500 if
+        file saving fails. Requests whose body is too large are already
+        refused by UploadLimitMiddleware before the form is parsed.
 
     """
     LOG.info(f"Received file: {data_file.filename}")
 
     try:
-        temp_file = get_temp_file_path(data_file.filename)
-
-        # Save uploaded file to the temporary file path
-        async with aiofiles.open(temp_file, "wb") as out_file:
-            content: bytes = await data_file.read()
-            await out_file.write(content)
-
-        LOG.info(f"File saved locally: {temp_file.name}")
-        response: dict[str, str] = {
-            "filename": temp_file.name,
-            "file_path": str(temp_file.absolute()),
+        store = get_document_store()
+        incoming_file = store.incoming_path(data_file.filename)
+
+        # Stream the upload to disk, hashing it on the way
+        partial_file, document_id, size = await save_upload(data_file, incoming_file)
+
+        # Known content is not stored again; the existing document is returned
+        document, created = await run_in_stage(
+            "documents",
+            store.add,
+            partial_file,
+            document_id,
+            incoming_file.name,
+            size,
+            [tag.strip() for tag in (tags or "").split(",") if tag.strip()],
+        )
+        if created:
+            LOG.info(f"Document {document_id} stored ({size} bytes)")
+        else:
+            LOG.info(f"Duplicate upload of document {document_id}")
+
+        job, needs_ingestion = create_job(document_id, document.path)
+        if needs_ingestion:
+            background_tasks.add_task(run_in_stage, "ingest", run_ingestion, document_id)
+
+        response: dict[str, str | bool | list[str]] = {
+            "filename": document.original_name,
+            "file_path": document.path,
+            "document_id": document_id,
+            "status": str(job.status),
+            "deduplicated": not created,
+            "tags": document.tags,
         }
         return JSONResponse(content=response)
 
+    except UploadTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e),
+        ) from e
     except Exception as e:
         message: str = str(e)
         LOG.exception(f"Error saving file locally: {message}")
@@ -148,3 +285,140 @@ async def upload_file(data_file: UploadFile) -> JSONResponse:
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Internal Server Error: {message}",
         ) from e
+
+
+@routes.get("/documents/{document_id}/status")
+async def get_document_status(
+    document_id: Annotated[str, PathParam(pattern="^[0-9a-f]{64}$")],
+) -> JSONResponse:
+    """Get the ingestion status of an uploaded document.
+
+    Args:
+        document_id (str): The document ID returned by /uploadFile.
+
+    Returns:
+        JSONResponse: A JSON response with the document ID, the status
+        ("pending", "running", "ready" or "failed"), the error, if any, whether
+        the document can be queried yet and the pages and chunks indexed so far.
+
+    Raises:
+        HTTPException: 404 NOT FOUND if the document is unknown.
+
+    """
+    job_status = await run_in_stage("documents", get_job_status, document_id)
+    if job_status is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+    return JSONResponse(content=job_status)
+
+
+@routes.delete("/documents/{document_id}")
+async def delete_document(
+    document_id: Annotated[str, PathParam(pattern="^[0-9a-f]{64}$")],
+) -> JSONResponse:
+    """Delete an uploaded document, its indices and its chunks in the corpus index.
+
+    Args:
+        document_id (str): The document ID returned by /uploadFile.
+
+    Returns:
+        JSONResponse: A JSON response with the deleted document ID.
+
+    Raises:
+        HTTPException: 404 NOT FOUND if the document is unknown.
+
+    """
+    store = get_document_store()
+    if await run_in_stage("documents", store.get, document_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+    await run_in_stage("documents", store.delete, document_id)
+    return JSONResponse(content={"document_id": document_id, "deleted": True})
+
+
+@routes.get("/indexStats")
+async def get_index_stats() -> JSONResponse:
+    """Report the hit and miss counters of the document index store.
+
+    Returns:
+        JSONResponse: A JSON response with the "hits" and "misses" counters, the
+        size, evictions and load latency of the hot cache and the documents and
+        chunks in the corpus index.
+
+    """
+    return JSONResponse(content=await run_in_stage("documents", _collect_index_stats))
+
+
+def _collect_index_stats() -> dict[str, Any]:
+    """Collect the index statistics, which read the index store and the corpus on disk."""
+    store = get_index_store()
+    return {**store.stats(), "hot_cache": store.cache_stats(), "corpus": get_corpus().stats()}
+
+
+@routes.get("/documentStats")
+async def get_document_stats() -> JSONResponse:
+    """Report the usage of the document store.
+
+    Returns:
+        JSONResponse: A JSON response with the number of documents, the bytes
+        used by documents and their indices, the quota and the evictions.
+
+    """
+    return JSONResponse(content=await run_in_stage("documents", get_document_store().stats))
+
+
+@routes.get("/embeddingStats")
+async def get_embedding_model_stats() -> JSONResponse:
+    """Report load and query batching statistics of the embedding models.
+
+    Returns:
+        JSONResponse: A JSON response with per-model load statistics, the
+        current process RSS in bytes, the query batch-size histograms and
+        the size and hit rate of the chunk embedding store.
+
+    """
+    return JSONResponse(content=await run_in_stage("documents", _collect_embedding_stats))
+
+
+def _collect_embedding_stats() -> dict[str, Any]:
+    """Collect the embedding statistics, which read the process RSS and the chunk embedding store."""
+    return {
+        **get_embedding_stats(),
+        "batching": get_batching_stats(),
+        "chunk_store": get_embedding_store().stats(),
+    }
+
+
+@routes.get("/metrics")
+async def get_metrics() -> Response:
+    """Expose per-stage latency, LLM token and request metrics to Prometheus.
+
+    Returns:
+        Response: The metrics in the Prometheus text exposition format.
+
+    """
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+
+
+@routes.get("/healthz")
+async def get_health() -> JSONResponse:
+    """Tell that the worker process is alive, whether or not it is warm.
+
+    Returns:
+        JSONResponse: A JSON response with the status "ok".
+
+    """
+    return JSONResponse(content={"status": "ok"})
+
+
+@routes.get("/readyz")
+async def get_readiness() -> JSONResponse:
+    """Tell whether the worker has finished warming up and can take traffic.
+
+    Returns:
+        JSONResponse: The warmup status and the seconds (or error) of each
+        warmup stage, with status 200 once the worker is ready and 503 while
+        it is warming up or if warmup failed.
+
+    """
+    state = get_warmup_state()
+    ready = state["status"] == "ready"
+    return JSONResponse(content=state, status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
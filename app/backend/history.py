@@ -0,0 +1,307 @@
+import logging
+import math
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+import tiktoken
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from app.backend.accessors import get_async_collection, get_collection
+from app.backend.concurrency import run_in_stage, stage_limit
+from app.backend.config import get_config_variables
+from app.backend.llm import get_llm
+from app.backend.metrics import span
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+LOG = logging.getLogger(__name__)
+CONFIG = get_config_variables()
+
+TOKEN_COUNTER_CACHE: dict[str, "Callable[[str], int]"] = {}
+
+CHARS_PER_TOKEN = 4
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a user and an assistant about some "
+    "documents. Keep the facts, names and open questions a follow-up question could refer to, "
+    "and answer with the new summary only, in at most {max_tokens} tokens.\n\n"
+    "Current summary:\n{summary}\n\nNew turns:\n{turns}"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text from its length."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def get_token_counter(encoding_name: str | None = None) -> "Callable[[str], int]":
+    """Get a function counting the tokens of a text with a tiktoken encoding.
+
+    tiktoken downloads an encoding the first time it is used. If that is not
+    possible, tokens are estimated from the text length instead.
+
+    Args:
+        encoding_name (str | None): The tiktoken encoding. Defaults to
+            CONFIG.HISTORY_TOKENIZER.
+
+    Returns:
+        Callable[[str], int]: The token counter.
+
+    """
+    encoding_name = encoding_name or CONFIG.HISTORY_TOKENIZER
+    if encoding_name not in TOKEN_COUNTER_CACHE:
+        try:
+            load_token_counter(encoding_name)
+        except Exception as e:  # noqa: BLE001 - any download or lookup failure falls back
+            message = str(e)
+            LOG.warning(f"Tokenizer {encoding_name} unavailable, estimating history tokens: {message}")
+            TOKEN_COUNTER_CACHE[encoding_name] = estimate_tokens
+    return TOKEN_COUNTER_CACHE[encoding_name]
+
+
+def load_token_counter(encoding_name: str | None = None) -> None:
+    """Load a tiktoken encoding into the token counter cache, e.g. during warmup.
+
+    Args:
+        encoding_name (str | None): The tiktoken encoding. Defaults to
+            CONFIG.HISTORY_TOKENIZER.
+
+    Raises:
+        Exception: If the encoding can neither be found in the tiktoken cache
+            nor downloaded.
+
+    """
+    encoding_name = encoding_name or CONFIG.HISTORY_TOKENIZER
+    encoding = tiktoken.get_encoding(encoding_name)
+    TOKEN_COUNTER_CACHE[encoding_name] = lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def count_turn_tokens(turn: tuple[str, str]) -> int:
+    """Count the tokens a question/answer turn adds to the prompt."""
+    count_tokens = get_token_counter()
+    return count_tokens(f"Human: {turn[0]}\nAssistant: {turn[1]}")
+
+
+@dataclass
+class HistoryWindow:
+    """The part of a session's history that fits in the prompt.
+
+    Attributes:
+        summary (str): The rolling summary of the turns before summarized_turns.
+        summarized_turns (int): How many turns, from the first, the summary covers.
+        turns (list[tuple[str, str]]): The most recent turns, kept verbatim.
+        pending (list[tuple[str, str]]): The older turns that no longer fit in
+            the budget and are not in the summary yet.
+        pending_start (int): The position of pending[0] in the whole session.
+        tokens (int): The tokens of the summary and the verbatim turns.
+
+    """
+
+    summary: str = ""
+    summarized_turns: int = 0
+    turns: list[tuple[str, str]] = field(default_factory=list)
+    pending: list[tuple[str, str]] = field(default_factory=list)
+    pending_start: int = 0
+    tokens: int = 0
+
+    @property
+    def chat_history(self) -> list[tuple[str, str] | BaseMessage]:
+        """Get the history in the format of ConversationalRetrievalChain."""
+        history: list[tuple[str, str] | BaseMessage] = []
+        if self.summary:
+            history.append(SystemMessage(content=f"{SUMMARY_PREFIX}{self.summary}"))
+        history.extend(self.turns)
+        return history
+
+    @property
+    def messages(self) -> list[BaseMessage]:
+        """Get the summary and the turns as chat messages."""
+        messages: list[BaseMessage] = []
+        if self.summary:
+            messages.append(SystemMessage(content=f"{SUMMARY_PREFIX}{self.summary}"))
+        for question, answer in self.turns:
+            messages.extend([HumanMessage(content=question), AIMessage(content=answer)])
+        return messages
+
+
+def select_window(
+    turns: list[tuple[str, str]],
+    first_turn: int,
+    summary: str = "",
+    summarized_turns: int = 0,
+    token_budget: int | None = None,
+) -> HistoryWindow:
+    """Keep the most recent turns that fit in a token budget next to the summary.
+
+    Args:
+        turns (list[tuple[str, str]]): The most recent turns of the session.
+        first_turn (int): The position of turns[0] in the whole session.
+        summary (str): The stored rolling summary.
+        summarized_turns (int): How many turns, from the first, the summary covers.
+        token_budget (int | None): The tokens the history may use in the
+            prompt. Defaults to CONFIG.HISTORY_TOKEN_BUDGET.
+
+    Returns:
+        HistoryWindow: The summary, the verbatim turns and the turns still to
+        be folded into the summary.
+
+    """
+    token_budget = CONFIG.HISTORY_TOKEN_BUDGET if token_budget is None else token_budget
+    start = max(summarized_turns, first_turn)
+    unsummarized = turns[start - first_turn :]
+    tokens = get_token_counter()(f"{SUMMARY_PREFIX}{summary}") if summary else 0
+
+    kept = 0
+    for turn in reversed(unsummarized):
+        turn_tokens = count_turn_tokens(turn)
+        if tokens + turn_tokens > token_budget:
+            break
+        tokens += turn_tokens
+        kept += 1
+
+    split = len(unsummarized) - kept
+    return HistoryWindow(
+        summary=summary,
+        summarized_turns=summarized_turns,
+        turns=unsummarized[split:],
+        pending=unsummarized[:split],
+        pending_start=start,
+        tokens=tokens,
+    )
+
+
+def _window_pipeline(session_id: str, max_turns: int | None) -> list[dict[str, Any]]:
+    max_turns = CONFIG.HISTORY_MAX_TURNS if max_turns is None else max_turns
+    return [
+        {"$match": {"session_id": session_id}},
+        {
+            "$project": {
+                "_id": 0,
+                "summary": 1,
+                "summarized_turns": 1,
+                "size": {"$size": "$conversion"},
+                "conversion": {"$slice": ["$conversion", -2 * max_turns]},
+            }
+        },
+    ]
+
+
+def _to_window(documents: list[dict[str, Any]], token_budget: int | None) -> HistoryWindow:
+    if not documents:
+        return HistoryWindow()
+    data = documents[0]
+    conversion = data.get("conversion", [])
+    turns = [(conversion[x], conversion[x + 1]) for x in range(0, len(conversion) - 1, 2)]
+    return select_window(
+        turns,
+        first_turn=data["size"] // 2 - len(turns),
+        summary=data.get("summary", ""),
+        summarized_turns=data.get("summarized_turns", 0),
+        token_budget=token_budget,
+    )
+
+
+def load_history_window(
+    session_id: str,
+    max_turns: int | None = None,
+    token_budget: int | None = None,
+) -> HistoryWindow:
+    """Load the summary and the recent turns of a session that fit in the prompt.
+
+    Only the last max_turns turns are read, with the stored summary, in one
+    query.
+
+    Args:
+        session_id (str): The session ID to load the history of.
+        max_turns (int | None): The number of recent turns to read. Defaults
+            to CONFIG.HISTORY_MAX_TURNS.
+        token_budget (int | None): The tokens the history may use in the
+            prompt. Defaults to CONFIG.HISTORY_TOKEN_BUDGET.
+
+    Returns:
+        HistoryWindow: The history window of the session.
+
+    """
+    with span("history_read"):
+        documents = list(get_collection().aggregate(_window_pipeline(session_id, max_turns)))
+    return _to_window(documents, token_budget)
+
+
+async def aload_history_window(
+    session_id: str,
+    max_turns: int | None = None,
+    token_budget: int | None = None,
+) -> HistoryWindow:
+    """Load the history window of a session without blocking the event loop.
+
+    Uses the asynchronous MongoDB client when CONFIG.MONGO_ASYNC is set, otherwise
+        runs load_history_window on the I/O executor.
+
+    Args:
+        session_id (str): The session ID to load the history of.
+        max_turns (int | None): The number of recent turns to read.
+        token_budget (int | None): The tokens the history may use in the prompt.
+
+    Returns:
+        HistoryWindow: The history window of the session.
+
+    """
+    if not CONFIG.MONGO_ASYNC:
+        return await run_in_stage("history", load_history_window, session_id, max_turns, token_budget)
+
+    async with stage_limit("history"):
+        with span("history_read"):
+            cursor = await get_async_collection().aggregate(_window_pipeline(session_id, max_turns))
+            documents = await cursor.to_list()
+    return _to_window(documents, token_budget)
+
+
+def _store_summary(session_id: str, window: HistoryWindow, summary: str) -> bool:
+    # Compare-and-set: a concurrent compaction of the same turns wins once. A
+    # session that was never summarised has no summarized_turns, which reads as 0.
+    summarized_turns = window.summarized_turns or {"$in": [0, None]}
+    query = {"session_id": session_id, "summarized_turns": summarized_turns}
+    update = {"$set": {"summary": summary, "summarized_turns": window.pending_start + len(window.pending)}}
+    with span("history_write"):
+        return get_collection().update_one(query, update).modified_count == 1
+
+
+async def acompact_history(session_id: str, model: str | None = None) -> bool:
+    """Fold the turns that left the token budget into the session's summary.
+
+    The stored summary is updated incrementally: only the turns that are not
+    in it yet are sent to the LLM, together with the current summary. Meant
+    to run after a turn is saved, off the request path.
+
+    Args:
+        session_id (str): The session ID to compact the history of.
+        model (str | None): The LLM writing the summary. Defaults to
+            CONFIG.HISTORY_SUMMARY_MODEL.
+
+    Returns:
+        bool: True if the summary was updated, False if there was nothing to
+        fold, another compaction got there first or the LLM call failed.
+
+    """
+    window = await aload_history_window(session_id)
+    if not window.pending:
+        return False
+
+    turns = "\n".join(f"Human: {question}\nAssistant: {answer}" for question, answer in window.pending)
+    prompt = SUMMARY_PROMPT.format(
+        max_tokens=CONFIG.HISTORY_SUMMARY_MAX_TOKENS, summary=window.summary or "(none)", turns=turns
+    )
+    llm = get_llm(model or CONFIG.HISTORY_SUMMARY_MODEL, max_tokens=CONFIG.HISTORY_SUMMARY_MAX_TOKENS)
+    try:
+        async with stage_limit("llm"):
+            with span("history_summary"):
+                message = await llm.ainvoke([HumanMessage(content=prompt)])
+    except Exception as e:
+        error = str(e)
+        LOG.exception(f"Error summarising the history of session {session_id}: {error}")
+        return False
+
+    stored = await run_in_stage("history", _store_summary, session_id, window, str(message.content).strip())
+    LOG.info(f"Folded {len(window.pending)} turns into the summary of session {session_id}: {stored}")
+    return stored
@@ -0,0 +1,171 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any
+
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from langchain_core.embeddings import Embeddings
+
+LOG = logging.getLogger(__name__)
+
+VECTOR_ITEM_BYTES = 4
+
+
+def estimate_bytes(vectorstore: FAISS) -> int:
+    """Estimate the memory a loaded vector store keeps resident.
+
+    Counts the float32 vectors, whether they are in the heap or mapped, and
+    the chunks of an in-memory docstore. Chunks of a mapped index stay on
+    disk until they are retrieved, so they are not counted.
+
+    Args:
+        vectorstore (FAISS): The vector store.
+
+    Returns:
+        int: The estimated size in bytes.
+
+    """
+    index = vectorstore.index
+    size = index.ntotal * index.d * VECTOR_ITEM_BYTES
+    if isinstance(vectorstore.docstore, InMemoryDocstore):
+        size += sum(
+            len(chunk.page_content.encode()) + len(json.dumps(chunk.metadata))
+            for chunk in vectorstore.docstore._dict.values()  # noqa: SLF001
+        )
+    return size
+
+
+def with_embeddings(vectorstore: FAISS, embeddings: "Embeddings") -> FAISS:
+    """Get a vector store sharing the index of another, queried with other embeddings."""
+    if vectorstore.embedding_function is embeddings:
+        return vectorstore
+    return FAISS(
+        embedding_function=embeddings,
+        index=vectorstore.index,
+        docstore=vectorstore.docstore,
+        index_to_docstore_id=vectorstore.index_to_docstore_id,
+    )
+
+
+class IndexCache:
+    """In-process LRU cache of loaded vector stores with a byte budget.
+
+    Entries are evicted least recently used first once their estimated size
+    exceeds max_bytes. Concurrent misses on the same key wait for a single
+    load instead of each reading it from disk.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.max_load_seconds = 0.0
+        self._entries: OrderedDict[str, tuple[FAISS, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks: dict[str, threading.Lock] = {}
+
+    def get(self, key: str) -> FAISS | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def get_or_load(self, key: str, load: "Callable[[], FAISS | None]") -> FAISS | None:
+        """Return a cached vector store, loading it once on a miss.
+
+        Args:
+            key (str): The index key.
+            load (Callable[[], FAISS | None]): Loads the vector store, or
+                returns None if it is not stored.
+
+        Returns:
+            FAISS | None: The vector store, or None if it is not stored.
+
+        """
+        vectorstore = self.get(key)
+        if vectorstore is not None:
+            self._count(hit=True)
+            return vectorstore
+
+        with self._key_lock(key):
+            vectorstore = self.get(key)
+            if vectorstore is not None:
+                self._count(hit=True)
+                return vectorstore
+
+            self._count(hit=False)
+            started = time.perf_counter()
+            vectorstore = load()
+            seconds = time.perf_counter() - started
+            if vectorstore is None:
+                return None
+
+            with self._lock:
+                self.loads += 1
+                self.load_seconds += seconds
+                self.max_load_seconds = max(self.max_load_seconds, seconds)
+            self.put(key, vectorstore)
+            return vectorstore
+
+    def put(self, key: str, vectorstore: FAISS) -> None:
+        """Cache a vector store, evicting the least recently used ones over budget."""
+        size = estimate_bytes(vectorstore)
+        if size > self.max_bytes:
+            LOG.info(f"Index {key} ({size} bytes) exceeds the hot cache budget")
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (vectorstore, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                evicted_key, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+                LOG.info(f"Evicted index {evicted_key} ({evicted_size} bytes) from the hot cache")
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "loads": self.loads,
+                "mean_load_ms": round(self.load_seconds * 1000 / self.loads, 3) if self.loads else 0.0,
+                "max_load_ms": round(self.max_load_seconds * 1000, 3),
+            }
+
+    def _count(self, *, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
@@ -0,0 +1,291 @@
+import hashlib
+import logging
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from langchain_community.vectorstores import FAISS
+
+from app.backend.config import get_config_variables
+from app.backend.index_cache import IndexCache, with_embeddings
+from app.backend.mapped_index import is_mapped, load_mapped, save_mapped
+from app.backend.metrics import span
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from langchain_core.embeddings import Embeddings
+
+LOG = logging.getLogger(__name__)
+CONFIG = get_config_variables()
+
+INDEX_STORE_CACHE: dict[str, "IndexStore"] = {}
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def compute_file_hash(file_path: Path) -> str:
+    """Compute the SHA-256 hash of a file's content.
+
+    The file is read in fixed-size chunks so large documents are never held
+    in memory as a whole.
+
+    Args:
+        file_path (Path): The file to hash.
+
+    Returns:
+        str: The hex digest of the file content.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+
+    """
+    digest = hashlib.sha256()
+    with file_path.open("rb") as file:
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_index_key(content_hash: str, embedding_model: str, chunk_size: int, chunk_overlap: int) -> str:
+    """Build the key under which the index of a document is stored.
+
+    Anything that changes the produced vectors is part of the key, so a new
+    embedding model or splitter setting never reuses a stale index.
+
+    Args:
+        content_hash (str): The SHA-256 hash of the document content.
+        embedding_model (str): The name of the embedding model.
+        chunk_size (int): The chunk size used by the text splitter.
+        chunk_overlap (int): The chunk overlap used by the text splitter.
+
+    Returns:
+        str: The index key.
+
+    """
+    fingerprint = hashlib.sha256(f"{embedding_model}|{chunk_size}|{chunk_overlap}".encode()).hexdigest()
+    return f"{content_hash}-{fingerprint[:16]}"
+
+
+def directory_bytes(directory: Path) -> int:
+    """Get the total size of the files under a directory."""
+    return sum(file.stat().st_size for file in directory.rglob("*") if file.is_file())
+
+
+class IndexStore:
+    """On-disk store of FAISS indices keyed by document content.
+
+    Each index is saved with its docstore (the chunk texts and metadata) in
+    its own directory. Writes go to a scratch directory first and are renamed
+    into place, so readers never observe a half-written index. Indices are
+    opened read-only and memory-mapped, so the worker processes of a server
+    share their pages instead of each copying them. Opened indices are kept
+    in a hot in-memory cache of CONFIG.INDEX_HOT_CACHE_MAX_BYTES.
+    """
+
+    def __init__(self, root: Path, cache_max_bytes: int | None = None) -> None:
+        self.root = root
+        self.cache = IndexCache(CONFIG.INDEX_HOT_CACHE_MAX_BYTES if cache_max_bytes is None else cache_max_bytes)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.partial_hits = 0
+        self._lock = threading.Lock()
+        self._key_locks: dict[str, threading.Lock] = {}
+        self._building: set[str] = set()
+        self._size_listeners: list[Callable[[str, int], None]] = []
+
+    def add_size_listener(self, listener: "Callable[[str, int], None]") -> None:
+        """Get told how the stored bytes of a document change.
+
+        Args:
+            listener (Callable[[str, int], None]): Called with the content hash
+                and the change in bytes whenever an index of that document is
+                saved or deleted.
+
+        """
+        self._size_listeners.append(listener)
+
+    def index_path(self, index_key: str) -> Path:
+        return self.root / index_key
+
+    def exists(self, index_key: str) -> bool:
+        path = self.index_path(index_key)
+        return is_mapped(path) or (path / "index.faiss").exists()
+
+    def load(self, index_key: str, embeddings: "Embeddings") -> FAISS | None:
+        """Open a stored index, or return None if it has not been built yet."""
+        path = self.index_path(index_key)
+        if is_mapped(path):
+            return load_mapped(path, embeddings)
+        if not (path / "index.faiss").exists():
+            return None
+        # Saved by an earlier version, before indices were memory-mapped
+        return FAISS.load_local(
+            str(path),
+            embeddings,
+            allow_dangerous_deserialization=True,  # written by this process family only
+        )
+
+    def save(self, index_key: str, vectorstore: FAISS) -> None:
+        """Persist an index atomically under the given key."""
+        scratch = Path(tempfile.mkdtemp(dir=self.root, prefix=f".{index_key}-"))
+        save_mapped(vectorstore, scratch)
+        try:
+            scratch.rename(self.index_path(index_key))
+        except OSError:
+            # Another writer stored the same content first.
+            shutil.rmtree(scratch, ignore_errors=True)
+            return
+        self._notify_size(index_key, directory_bytes(self.index_path(index_key)))
+
+    def partial_path(self, index_key: str) -> Path:
+        return self.root / f"{index_key}.partial"
+
+    def save_partial(self, index_key: str, vectorstore: FAISS) -> None:
+        """Persist a snapshot of an index that is still being built.
+
+        The snapshot replaces the previous one; readers see either of them
+        complete, never a mix.
+        """
+        scratch = Path(tempfile.mkdtemp(dir=self.root, prefix=f".{index_key}-"))
+        save_mapped(vectorstore, scratch)
+        previous = self.partial_path(index_key)
+        retired = previous.with_name(f".{previous.name}-{scratch.name}")
+        with self._lock:
+            if previous.exists():
+                previous.rename(retired)
+            scratch.rename(previous)
+        shutil.rmtree(retired, ignore_errors=True)
+
+    def load_partial(self, index_key: str, embeddings: "Embeddings") -> FAISS | None:
+        """Load the latest snapshot of an index that is still being built."""
+        path = self.partial_path(index_key)
+        with self._lock:
+            if index_key not in self._building or not is_mapped(path):
+                return None
+            # Opening under the lock keeps save_partial from retiring it mid-open
+            return load_mapped(path, embeddings)
+
+    def get_or_build(
+        self,
+        index_key: str,
+        embeddings: "Embeddings",
+        build: "Callable[[], FAISS]",
+        *,
+        allow_partial: bool = False,
+    ) -> FAISS:
+        """Return the stored index for a key, building and saving it on a miss.
+
+        The hot cache is checked before the disk. Concurrent requests for the
+        same key wait for a single load or build.
+
+        Args:
+            index_key (str): The key returned by make_index_key.
+            embeddings (Embeddings): The embedding model the index is queried with.
+            build (Callable[[], FAISS]): Builds the index when it is not stored yet.
+            allow_partial (bool): While the index is being built, return its
+                latest partial snapshot instead of waiting for the build.
+
+        Returns:
+            FAISS: The vector store for the document.
+
+        """
+        if allow_partial and not self.exists(index_key):
+            partial = self.load_partial(index_key, embeddings)
+            if partial is not None:
+                with self._lock:
+                    self.partial_hits += 1
+                LOG.info(f"Index partial hit: {index_key}")
+                return partial
+
+        def load() -> FAISS | None:
+            with span("index_load"):
+                return self.load(index_key, embeddings)
+
+        vectorstore = self.cache.get_or_load(index_key, load)
+        if vectorstore is not None:
+            self._count(hit=True)
+            LOG.info(f"Index cache hit: {index_key}")
+            return with_embeddings(vectorstore, embeddings)
+
+        with self._key_lock(index_key):
+            vectorstore = self.cache.get_or_load(index_key, load)
+            if vectorstore is not None:
+                self._count(hit=True)
+                LOG.info(f"Index cache hit: {index_key}")
+                return with_embeddings(vectorstore, embeddings)
+
+            self._count(hit=False)
+            LOG.info(f"Index cache miss: {index_key}")
+            with self._lock:
+                self._building.add(index_key)
+            try:
+                with span("index_build"):
+                    vectorstore = build()
+                    self.save(index_key, vectorstore)
+            finally:
+                with self._lock:
+                    self._building.discard(index_key)
+                shutil.rmtree(self.partial_path(index_key), ignore_errors=True)
+            return vectorstore
+
+    def document_paths(self, content_hash: str) -> list[Path]:
+        """List the stored indices of a document, one per embedding fingerprint."""
+        return [path for path in self.root.glob(f"{content_hash}-*") if path.is_dir()]
+
+    def document_bytes(self, content_hash: str) -> int:
+        """Get the disk size of every stored index of a document by walking them."""
+        return sum(directory_bytes(path) for path in self.document_paths(content_hash))
+
+    def delete_document(self, content_hash: str) -> None:
+        """Remove every stored index of a document."""
+        for path in self.document_paths(content_hash):
+            with self._key_lock(path.name):
+                self.cache.discard(path.name)
+                size = directory_bytes(path)
+                shutil.rmtree(path, ignore_errors=True)
+            self._notify_size(path.name, -size)
+            LOG.info(f"Deleted index {path.name}")
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "partial_hits": self.partial_hits}
+
+    def _notify_size(self, index_key: str, change: int) -> None:
+        # Index keys start with the content hash, see make_index_key
+        content_hash = index_key.split("-", 1)[0]
+        for listener in self._size_listeners:
+            listener(content_hash, change)
+
+    def cache_stats(self) -> dict[str, Any]:
+        """Report the size, evictions and load latency of the hot cache."""
+        return self.cache.stats()
+
+    def _count(self, *, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _key_lock(self, index_key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(index_key, threading.Lock())
+
+
+def get_index_store() -> IndexStore:
+    """Get the process-wide index store.
+
+    The store is cached in INDEX_STORE_CACHE so hit and miss counters are
+    shared by every request.
+
+    Returns:
+        IndexStore: The index store rooted at CONFIG.INDEX_CACHE_DIR.
+
+    """
+    cache_key = "default"
+    if cache_key not in INDEX_STORE_CACHE:
+        INDEX_STORE_CACHE[cache_key] = IndexStore(Path(CONFIG.INDEX_CACHE_DIR))
+    return INDEX_STORE_CACHE[cache_key]
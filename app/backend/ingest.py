@@ -0,0 +1,186 @@
+import logging
+import threading
+from dataclasses import dataclass, field
+from enum import StrEnum
+from pathlib import Path
+from typing import Any
+
+from app.backend.chat import IngestProgress, get_corpus, get_index_key, get_vectorstore
+from app.backend.config import get_config_variables
+from app.backend.corpus import remove_from_corpora
+from app.backend.document_store import get_document_store
+from app.backend.embeddings import get_embeddings
+from app.backend.index_store import get_index_store
+
+LOG = logging.getLogger(__name__)
+CONFIG = get_config_variables()
+
+INGEST_JOBS: dict[str, "IngestJob"] = {}
+_JOBS_LOCK = threading.Lock()
+
+
+class JobStatus(StrEnum):
+    PENDING = "pending"
+    RUNNING = "running"
+    READY = "ready"
+    FAILED = "failed"
+
+
+@dataclass
+class IngestJob:
+    """State of the background ingestion of one uploaded document."""
+
+    document_id: str
+    file_path: str
+    status: JobStatus = JobStatus.PENDING
+    error: str | None = None
+    page_count: int | None = None
+    pages_indexed: int = 0
+    chunks_indexed: int = 0
+    timings: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def queryable(self) -> bool:
+        """Whether chat can already use the document, fully or on its first pages."""
+        if self.status == JobStatus.READY:
+            return True
+        partial_pages = CONFIG.INGEST_PARTIAL_PAGES
+        return self.status == JobStatus.RUNNING and 0 < partial_pages <= self.pages_indexed
+
+    def update_progress(self, progress: IngestProgress) -> None:
+        self.pages_indexed = progress.pages
+        self.chunks_indexed = progress.chunks
+        self.timings = progress.timings
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "document_id": self.document_id,
+            "status": str(self.status),
+            "error": self.error,
+            "queryable": self.queryable,
+            "progress": {
+                "pages_indexed": self.pages_indexed,
+                "page_count": self.page_count,
+                "chunks_indexed": self.chunks_indexed,
+            },
+            "timings": {stage: round(seconds, 3) for stage, seconds in self.timings.items()},
+        }
+
+
+def create_job(document_id: str, file_path: str) -> tuple[IngestJob, bool]:
+    """Register the ingestion job of a document.
+
+    A document that is already indexed, or whose ingestion is still running,
+    keeps its existing job so the same content is never indexed twice.
+
+    Args:
+        document_id (str): The content hash of the document.
+        file_path (str): The local path of the uploaded file.
+
+    Returns:
+        tuple[IngestJob, bool]: The job, and whether it still has to be run.
+
+    """
+    with _JOBS_LOCK:
+        job = INGEST_JOBS.get(document_id)
+        if job is not None and job.status != JobStatus.FAILED:
+            return job, False
+
+        document = get_document_store().get(document_id)
+        job = IngestJob(
+            document_id=document_id,
+            file_path=file_path,
+            page_count=document.page_count if document is not None else None,
+        )
+        if get_index_store().exists(get_index_key(document_id)):
+            job.status = JobStatus.READY
+            INGEST_JOBS[document_id] = job
+            return job, False
+
+        INGEST_JOBS[document_id] = job
+        return job, True
+
+
+def _discard_if_removed(document_id: str, *, in_corpus: bool = False) -> bool:
+    if get_document_store().get(document_id) is not None:
+        return False
+    LOG.info(f"Document {document_id} was removed while it was being indexed, dropping its index")
+    get_index_store().delete_document(document_id)
+    if in_corpus:
+        remove_from_corpora(document_id)
+    return True
+
+
+def run_ingestion(document_id: str) -> None:
+    """Load, split, embed and index a document in the background.
+
+    The finished index is also added to the corpus index, so chats spanning
+    several documents can search it. A document evicted or deleted while it
+    is being indexed has its new index dropped again.
+
+    Failures are recorded on the job instead of being raised, because there
+    is no request left to report them to.
+
+    Args:
+        document_id (str): The content hash of the document.
+
+    """
+    job = INGEST_JOBS[document_id]
+    job.status = JobStatus.RUNNING
+    LOG.info(f"Ingesting document {document_id} from {job.file_path}")
+
+    try:
+        vectorstore = get_vectorstore(
+            Path(job.file_path),
+            get_embeddings(),
+            content_hash=document_id,
+            on_progress=job.update_progress,
+        )
+        removed = _discard_if_removed(document_id)
+        if not removed:
+            get_corpus().add_document(document_id, vectorstore)
+            # The document may also go while its chunks are being added
+            removed = _discard_if_removed(document_id, in_corpus=True)
+    except Exception as e:
+        message = str(e)
+        LOG.exception(f"Ingestion of document {document_id} failed: {message}")
+        job.status = JobStatus.FAILED
+        job.error = message
+    else:
+        if removed:
+            job.status = JobStatus.FAILED
+            job.error = "Document was removed while it was being indexed"
+            return
+        LOG.info(f"Document {document_id} is ready")
+        job.status = JobStatus.READY
+        # The new index counts towards the document store quota
+        get_document_store().enforce_quota(keep=document_id)
+
+
+def get_job_status(document_id: str) -> dict[str, Any] | None:
+    """Get the ingestion status of a document.
+
+    Documents indexed by an earlier process have no job but are reported as
+    ready when their index is stored. Documents evicted from the document
+    store are unknown.
+
+    Args:
+        document_id (str): The content hash of the document.
+
+    Returns:
+        dict | None: The job status, or None if the document is unknown.
+
+    """
+    if get_document_store().get(document_id) is None:
+        with _JOBS_LOCK:
+            INGEST_JOBS.pop(document_id, None)
+        return None
+
+    job = INGEST_JOBS.get(document_id)
+    if job is not None:
+        return job.to_dict()
+
+    if get_index_store().exists(get_index_key(document_id)):
+        return IngestJob(document_id=document_id, file_path="", status=JobStatus.READY).to_dict()
+
+    return None
@@ -0,0 +1,185 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import weakref
+from typing import TYPE_CHECKING, Any
+
+import httpx
+
+from app.backend.config import get_config_variables
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+LOG = logging.getLogger(__name__)
+CONFIG = get_config_variables()
+
+LLMKey = tuple[str, float, str | None, tuple[tuple[str, Any], ...]]
+
+HTTP_CLIENT_CACHE: dict[str, httpx.Client] = {}
+LLM_CLIENT_CACHE: dict[LLMKey, "ChatOpenAI"] = {}
+# Async connections belong to the event loop that opened them, so async
+# clients, and the LLM clients holding them, are kept per loop.
+ASYNC_HTTP_CLIENT_CACHE: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+ASYNC_LLM_CLIENT_CACHE: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[LLMKey, ChatOpenAI]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_http2_enabled() -> bool:
+    """Tell whether LLM connections negotiate HTTP/2.
+
+    HTTP/2 needs the h2 package (httpx[http2]). Without it the pool falls
+    back to HTTP/1.1 keep-alive connections.
+
+    Returns:
+        bool: True if CONFIG.LLM_HTTP2 is set and h2 is installed.
+
+    """
+    if not CONFIG.LLM_HTTP2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        LOG.warning("LLM_HTTP2 is set but the h2 package is not installed, using HTTP/1.1")
+        return False
+    return True
+
+
+def get_timeout() -> httpx.Timeout:
+    """Get the timeouts of LLM requests from CONFIG."""
+    return httpx.Timeout(CONFIG.LLM_TIMEOUT_SECONDS, connect=CONFIG.LLM_CONNECT_TIMEOUT_SECONDS)
+
+
+def get_pool_limits() -> httpx.Limits:
+    """Get the connection pool limits of the LLM clients from CONFIG."""
+    return httpx.Limits(
+        max_connections=CONFIG.LLM_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=CONFIG.LLM_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=CONFIG.LLM_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def get_http_client() -> httpx.Client:
+    """Get the HTTP client shared by every synchronous LLM call.
+
+    Returns:
+        httpx.Client: The cached client with its keep-alive connection pool.
+
+    """
+    cache_key = "default"
+    if cache_key not in HTTP_CLIENT_CACHE:
+        HTTP_CLIENT_CACHE[cache_key] = httpx.Client(
+            http2=get_http2_enabled(), limits=get_pool_limits(), timeout=get_timeout()
+        )
+    return HTTP_CLIENT_CACHE[cache_key]
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Get the HTTP client shared by every asynchronous LLM call of the running loop.
+
+    Returns:
+        httpx.AsyncClient: The cached client with its keep-alive connection pool.
+
+    Raises:
+        RuntimeError: If no event loop is running.
+
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in ASYNC_HTTP_CLIENT_CACHE:
+        ASYNC_HTTP_CLIENT_CACHE[loop] = httpx.AsyncClient(
+            http2=get_http2_enabled(), limits=get_pool_limits(), timeout=get_timeout()
+        )
+    return ASYNC_HTTP_CLIENT_CACHE[loop]
+
+
+def _make_key(model: str, temperature: float, base_url: str | None, options: dict[str, Any]) -> LLMKey:
+    frozen = tuple(
+        sorted((name, tuple(value) if isinstance(value, list) else value) for name, value in options.items())
+    )
+    return model, temperature, base_url, frozen
+
+
+def get_llm(model: str, temperature: float = 0.0, base_url: str | None = None, **options: Any) -> "ChatOpenAI":
+    """Get a reusable LLM client.
+
+    Clients are cached by model, temperature, base URL and options, and all
+    of them share the connection pools of get_http_client and
+    get_async_http_client, so a chat turn reuses open keep-alive connections
+    instead of paying a new TCP and TLS handshake. langchain_openai is only
+    imported with the first client, as it is slow to import.
+
+    Args:
+        model (str): The model name.
+        temperature (float): The sampling temperature.
+        base_url (str | None): The OpenAI-compatible API. Defaults to the
+            OPENAI_API_BASE environment variable, as ChatOpenAI does.
+        **options: Other ChatOpenAI arguments, e.g. streaming, tags or max_tokens.
+
+    Returns:
+        ChatOpenAI: The cached client.
+
+    """
+    base_url = base_url or os.getenv("OPENAI_API_BASE")
+    key = _make_key(model, temperature, base_url, options)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    cache = LLM_CLIENT_CACHE if loop is None else ASYNC_LLM_CLIENT_CACHE.setdefault(loop, {})
+
+    if key not in cache:
+        from langchain_openai import ChatOpenAI  # noqa: PLC0415 - imports openai, slow at startup
+
+        LOG.info(f"Creating LLM client for {model} (temperature {temperature}) at {base_url}")
+        cache[key] = ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            base_url=base_url,
+            timeout=get_timeout(),
+            http_client=get_http_client(),
+            http_async_client=None if loop is None else get_async_http_client(),
+            **options,
+        )
+    return cache[key]
+
+
+async def warmup_llm_pool(model: str, temperature: float = 0.0) -> int:
+    """Create an LLM client and open a keep-alive connection to its API.
+
+    The connection is opened with a request to the models endpoint of the
+    API through the shared pool; any response, even an error status, leaves
+    the connection open for the first chat.
+
+    Args:
+        model (str): The model of the client to create.
+        temperature (float): The temperature of the client to create.
+
+    Returns:
+        int: The HTTP status of the models endpoint.
+
+    Raises:
+        httpx.HTTPError: If the API cannot be reached.
+
+    """
+    client = get_llm(model, temperature)
+    response = await get_async_http_client().get(
+        f"{str(client.openai_api_base).rstrip('/')}/models",
+        headers={"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY', '')}"},
+    )
+    LOG.info(f"Opened LLM connection to {client.openai_api_base}: HTTP {response.status_code}")
+    return response.status_code
+
+
+async def close_llm_clients() -> None:
+    """Close the LLM connection pools and forget the cached clients."""
+    loop = asyncio.get_running_loop()
+    async_client = ASYNC_HTTP_CLIENT_CACHE.pop(loop, None)
+    if async_client is not None:
+        await async_client.aclose()
+    for client in HTTP_CLIENT_CACHE.values():
+        client.close()
+    HTTP_CLIENT_CACHE.clear()
+    ASYNC_LLM_CLIENT_CACHE.pop(loop, None)
+    LLM_CLIENT_CACHE.clear()
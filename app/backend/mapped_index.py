@@ -0,0 +1,175 @@
+import json
+import sqlite3
+import threading
+from collections.abc import Iterator, Mapping
+from typing import TYPE_CHECKING, Any
+
+import faiss
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from pathlib import Path
+
+    from langchain_core.embeddings import Embeddings
+
+VECTORS_FILE = "vectors.npy"
+CHUNKS_FILE = "chunks.sqlite"
+
+
+class ReadOnlyIndexError(TypeError):
+    """Raised when a memory-mapped index is asked to change; save a new index instead."""
+
+
+class MappedFlatIndex:
+    """Read-only exact L2 index over a memory-mapped matrix of vectors.
+
+    The vectors stay in the page cache, shared by every process that maps the
+    same file, instead of being copied into each process's heap. It offers
+    the part of the faiss.Index interface the LangChain FAISS store uses.
+    """
+
+    def __init__(self, vectors: np.ndarray) -> None:
+        self.vectors = vectors
+        self.ntotal, self.d = vectors.shape
+
+    def search(self, x: np.ndarray, k: int, params: Any = None) -> tuple[np.ndarray, np.ndarray]:  # noqa: ARG002 - faiss.Index signature
+        if self.ntotal == 0:
+            return np.full((len(x), k), np.inf, dtype=np.float32), np.full((len(x), k), -1, dtype=np.int64)
+        return faiss.knn(np.ascontiguousarray(x, dtype=np.float32), self.vectors, k)
+
+    def reconstruct(self, key: int) -> np.ndarray:
+        return np.array(self.vectors[key])
+
+    def reconstruct_n(self, start: int, count: int) -> np.ndarray:
+        return np.array(self.vectors[start : start + count])
+
+
+def connect_read_only(path: "Path") -> sqlite3.Connection:
+    """Open a SQLite file that is never written again, without any locking."""
+    return sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+
+
+class ChunkStore(Docstore):
+    """Read-only docstore of the chunks of a mapped index, kept in SQLite.
+
+    Chunks are read on demand, so only the ones retrieved are ever in the
+    heap. The file is opened when the store is created, so it stays readable
+    even if the index is replaced or evicted afterwards.
+    """
+
+    def __init__(self, path: "Path") -> None:
+        self._connection = connect_read_only(path)
+        self._lock = threading.Lock()
+
+    def search(self, search: str) -> Document | str:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT page_content, metadata FROM chunks WHERE docstore_id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def docstore_id(self, position: int) -> str:
+        with self._lock:
+            row = self._connection.execute("SELECT docstore_id FROM chunks WHERE position = ?", (position,)).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def add(self, texts: dict[str, Document]) -> None:  # noqa: ARG002 - Docstore signature
+        msg = "Mapped indices are read-only"
+        raise ReadOnlyIndexError(msg)
+
+    def delete(self, ids: list) -> None:  # noqa: ARG002 - Docstore signature
+        msg = "Mapped indices are read-only"
+        raise ReadOnlyIndexError(msg)
+
+
+class PositionMap(Mapping[int, str]):
+    """Lazy mapping from index positions to docstore IDs, read from a ChunkStore."""
+
+    def __init__(self, chunk_store: ChunkStore) -> None:
+        self.chunk_store = chunk_store
+
+    def __getitem__(self, position: int) -> str:
+        return self.chunk_store.docstore_id(int(position))
+
+    def __len__(self) -> int:
+        return len(self.chunk_store)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self)))
+
+
+def write_chunks(path: "Path", chunks: "Iterable[tuple[int, str, Document]]") -> None:
+    """Write the (position, docstore ID, chunk) rows of an index to a new SQLite file."""
+    connection = sqlite3.connect(path)
+    try:
+        with connection:
+            connection.execute(
+                "CREATE TABLE chunks (position INTEGER PRIMARY KEY, docstore_id TEXT UNIQUE, "
+                "page_content TEXT, metadata TEXT)"
+            )
+            connection.executemany(
+                "INSERT INTO chunks VALUES (?, ?, ?, ?)",
+                (
+                    (position, docstore_id, chunk.page_content, json.dumps(chunk.metadata))
+                    for position, docstore_id, chunk in chunks
+                ),
+            )
+    finally:
+        connection.close()
+
+
+def is_mapped(directory: "Path") -> bool:
+    return (directory / VECTORS_FILE).exists() and (directory / CHUNKS_FILE).exists()
+
+
+def save_mapped(vectorstore: FAISS, directory: "Path") -> None:
+    """Save a flat vector store in the memory-mappable layout.
+
+    Args:
+        vectorstore (FAISS): A vector store over a flat index.
+        directory (Path): An empty directory to write to.
+
+    """
+    count = vectorstore.index.ntotal
+    docstore_ids = vectorstore.index_to_docstore_id
+    np.save(directory / VECTORS_FILE, vectorstore.index.reconstruct_n(0, count).astype(np.float32, copy=False))
+    write_chunks(
+        directory / CHUNKS_FILE,
+        (
+            (position, docstore_ids[position], vectorstore.docstore.search(docstore_ids[position]))
+            for position in range(count)
+        ),
+    )
+
+
+def load_mapped(directory: "Path", embeddings: "Embeddings") -> FAISS:
+    """Open a vector store saved by save_mapped, read-only and memory-mapped.
+
+    Args:
+        directory (Path): The directory written by save_mapped.
+        embeddings (Embeddings): The embedding model queries are embedded with.
+
+    Returns:
+        FAISS: A vector store that searches the mapped vectors.
+
+    """
+    vectors = np.load(directory / VECTORS_FILE, mmap_mode="r")
+    chunk_store = ChunkStore(directory / CHUNKS_FILE)
+    return FAISS(
+        embedding_function=embeddings,
+        index=MappedFlatIndex(vectors),
+        docstore=chunk_store,
+        index_to_docstore_id=PositionMap(chunk_store),
+    )
@@ -0,0 +1,277 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any
+
+from langchain_core.callbacks import BaseCallbackHandler
+from starlette.datastructures import MutableHeaders
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from uuid import UUID
+
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LOG = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class Counter:
+    """A Prometheus counter with labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(tuple(labels[name] for name in self.labelnames), 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key, strict=True)))} {value!r}")
+        return lines
+
+
+class Histogram:
+    """A Prometheus histogram with labels and fixed buckets."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...],
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # Per label set: the count of each bucket (not cumulative), the sum and the count
+        self._values: dict[tuple[str, ...], tuple[list[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(tuple(labels[name] for name in self.labelnames))
+            return 0 if entry is None else entry[2]
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                labels = dict(zip(self.labelnames, key, strict=True))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts, strict=True):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': repr(bound)})} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {total!r}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds",
+    "Time spent in each stage of the RAG pipeline.",
+    ("stage",),
+)
+STAGE_ERRORS = Counter("rag_stage_errors_total", "Stage runs that raised an error.", ("stage",))
+LLM_TOKENS = Counter("rag_llm_tokens_total", "Tokens sent to and generated by the LLM.", ("model", "kind"))
+LLM_COST = Counter("rag_llm_cost_usd_total", "Estimated LLM cost in US dollars.", ("model",))
+REQUESTS = Counter("rag_http_requests_total", "HTTP requests handled.", ("method", "route", "status"))
+REQUEST_SECONDS = Histogram(
+    "rag_http_request_duration_seconds",
+    "Time from receiving an HTTP request to sending the last byte of its response.",
+    ("method", "route"),
+)
+METRICS: list[Counter | Histogram] = [STAGE_SECONDS, STAGE_ERRORS, LLM_TOKENS, LLM_COST, REQUESTS, REQUEST_SECONDS]
+
+
+class RequestTrace:
+    """The stage spans recorded while handling one request."""
+
+    def __init__(self) -> None:
+        self.spans: list[tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.spans.append((stage, seconds))
+
+    def totals(self) -> dict[str, float]:
+        totals: dict[str, float] = {}
+        with self._lock:
+            for stage, seconds in self.spans:
+                totals[stage] = totals.get(stage, 0.0) + seconds
+        return totals
+
+    def server_timing(self) -> str:
+        """Format the stage totals as a Server-Timing header value, in milliseconds."""
+        return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.totals().items())
+
+
+CURRENT_TRACE: ContextVar[RequestTrace | None] = ContextVar("CURRENT_TRACE", default=None)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Record the duration of a stage in its histogram and the current request's trace."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    trace = CURRENT_TRACE.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def span(stage: str) -> "Iterator[None]":
+    """Time a block of code as one run of a stage.
+
+    Args:
+        stage (str): The stage name, e.g. "history_read" or "index_load".
+
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def record_llm_usage(model: str, prompt_tokens: int, completion_tokens: int, cost: float) -> None:
+    """Count the tokens and cost of the LLM calls of one answer."""
+    LLM_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, model=model, kind="completion")
+    LLM_COST.inc(cost, model=model)
+
+
+class StageTimingHandler(BaseCallbackHandler):
+    """Callback handler timing every LLM call and retrieval of a chain run.
+
+    LLM calls are recorded as the "llm" stage and retrievals, including the
+    query embedding, as the "retrieve" stage.
+    """
+
+    run_inline = True
+
+    def __init__(self) -> None:
+        self._started: dict[UUID, tuple[str, float]] = {}
+
+    def _start(self, stage: str, run_id: "UUID") -> None:
+        self._started[run_id] = (stage, time.perf_counter())
+
+    def _end(self, run_id: "UUID", *, failed: bool = False) -> None:
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        stage, started_at = started
+        if failed:
+            STAGE_ERRORS.inc(stage=stage)
+        observe_stage(stage, time.perf_counter() - started_at)
+
+    def on_chat_model_start(self, serialized: dict[str, Any], messages: Any, *, run_id: "UUID", **_: Any) -> None:  # noqa: ARG002 - callback interface
+        self._start("llm", run_id)
+
+    def on_llm_start(self, serialized: dict[str, Any], prompts: list[str], *, run_id: "UUID", **_: Any) -> None:  # noqa: ARG002 - callback interface
+        self._start("llm", run_id)
+
+    def on_llm_end(self, response: Any, *, run_id: "UUID", **_: Any) -> None:  # noqa: ARG002 - callback interface
+        self._end(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: "UUID", **_: Any) -> None:  # noqa: ARG002 - callback interface
+        self._end(run_id, failed=True)
+
+    def on_retriever_start(self, serialized: dict[str, Any], query: str, *, run_id: "UUID", **_: Any) -> None:  # noqa: ARG002 - callback interface
+        self._start("retrieve", run_id)
+
+    def on_retriever_end(self, documents: Any, *, run_id: "UUID", **_: Any) -> None:  # noqa: ARG002 - callback interface
+        self._end(run_id)
+
+    def on_retriever_error(self, error: BaseException, *, run_id: "UUID", **_: Any) -> None:  # noqa: ARG002 - callback interface
+        self._end(run_id, failed=True)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request metrics and a trace of stage spans.
+
+    Every HTTP request gets a RequestTrace, so the stages it runs are also
+    summarised in its Server-Timing response header and in one log line.
+    Spans that end after the response headers are sent, e.g. while an
+    answer streams, are only in the log line.
+    """
+
+    def __init__(self, app: "ASGIApp") -> None:
+        self.app = app
+
+    async def __call__(self, scope: "Scope", receive: "Receive", send: "Send") -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        token = CURRENT_TRACE.set(trace)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: "Message") -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                server_timing = trace.server_timing()
+                if server_timing:
+                    MutableHeaders(scope=message).append("Server-Timing", server_timing)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            seconds = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUESTS.inc(method=scope["method"], route=route, status=str(status))
+            REQUEST_SECONDS.observe(seconds, method=scope["method"], route=route)
+            CURRENT_TRACE.reset(token)
+            spans = ", ".join(
+                f"{stage} {stage_seconds * 1000:.1f} ms" for stage, stage_seconds in trace.totals().items()
+            )
+            LOG.info(f"{scope['method']} {route} {status} in {seconds * 1000:.1f} ms ({spans or 'no stages'})")
+
+
+def render_metrics() -> str:
+    """Render every metric in the Prometheus text exposition format."""
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
@@ -1,9 +1,42 @@
-from pydantic import BaseModel
+from typing import Literal, Self
 
+from pydantic import BaseModel, Field, model_validator
 
-class ChatMessageSent(BaseModel):
-    """Model for chat message sent by the user."""
+
+class DocumentTarget(BaseModel):
+    """The documents a request asks about.
+
+    A request targets one document (data_source), several (document_ids),
+    every document with a tag, or any combination of them.
+    """
+
+    data_source: str | None = None
+    document_ids: list[str] | None = None
+    tag: str | None = None
+
+    @model_validator(mode="after")
+    def check_target(self) -> Self:
+        if not (self.data_source or self.document_ids or self.tag):
+            msg = "One of data_source, document_ids or tag is required"
+            raise ValueError(msg)
+        return self
+
+
+class ChatMessageSent(DocumentTarget):
+    """Model for chat message sent by the user.
+
+    chat_mode picks the chat engine: "condense" rewrites follow-ups with an
+    extra LLM call before retrieval, "single" answers in one LLM call.
+    """
 
     session_id: str | None = None
     user_input: str
-    data_source: str
+    bypass_cache: bool = False
+    chat_mode: Literal["condense", "single"] | None = None
+
+
+class ChatBatchSent(DocumentTarget):
+    """Model for a batch of independent questions about the same documents."""
+
+    questions: list[str] = Field(min_length=1)
+    bypass_cache: bool = False
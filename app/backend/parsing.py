@@ -0,0 +1,132 @@
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+from app.backend.concurrency import get_process_pool, get_worker_count
+from app.backend.config import get_config_variables
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from concurrent.futures import Future
+
+LOG = logging.getLogger(__name__)
+CONFIG = get_config_variables()
+
+
+def get_pdf_metadata(reader: PdfReader, local_file: str) -> dict[str, Any]:
+    """Get the document metadata PyPDFLoader puts on every page of a PDF.
+
+    Keys lose their leading slash and are lowercased, the creation and
+    modification dates become ISO 8601 and producer, creator and creationdate
+    default to the values PyPDFLoader uses.
+
+    Args:
+        reader (PdfReader): The opened PDF.
+        local_file (str): The absolute path of the PDF.
+
+    Returns:
+        dict[str, Any]: The metadata, with "source" and "total_pages".
+
+    """
+    raw = (
+        {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+        | dict(reader.metadata or {})
+        | {"source": local_file, "total_pages": len(reader.pages)}
+    )
+    metadata: dict[str, Any] = {}
+    for key, value in raw.items():
+        name = key.removeprefix("/").lower()
+        if type(value) not in {str, int}:
+            value = str(value)  # noqa: PLW2901 - same normalisation as PyPDFLoader
+        if name in {"creationdate", "moddate"}:
+            try:
+                metadata[name] = datetime.strptime(value.replace("'", ""), "D:%Y%m%d%H%M%S%z").isoformat("T")
+            except ValueError:
+                metadata[name] = value
+        else:
+            metadata[name] = value.strip() if isinstance(value, str) else value
+    return metadata
+
+
+def parse_pdf_range(local_file: str, start: int, stop: int) -> tuple[list[tuple[str, dict[str, Any]]], float]:
+    """Extract the text and metadata of a range of PDF pages.
+
+    Runs in a parser process, so it only returns plain strings and dicts to
+    keep the results cheap to send back. Text and metadata are the same as
+    PyPDFLoader gives the pages.
+
+    Args:
+        local_file (str): The absolute path of the PDF.
+        start (int): The first page, counted from 0.
+        stop (int): The page after the last one.
+
+    Returns:
+        tuple[list[tuple[str, dict]], float]: The text and metadata of each
+        page and the seconds spent.
+
+    """
+    started = time.perf_counter()
+    reader = PdfReader(local_file)
+    metadata = get_pdf_metadata(reader, local_file)
+    pages = [
+        (
+            reader.pages[page].extract_text(extraction_mode="plain").strip(),
+            {**metadata, "page": page, "page_label": reader.page_labels[page]},
+        )
+        for page in range(start, stop)
+    ]
+    return pages, time.perf_counter() - started
+
+
+def iter_pdf_pages_parallel(
+    local_file: str,
+    page_count: int,
+    timings: dict[str, float] | None = None,
+) -> "Iterator[Document]":
+    """Parse a PDF on the parser process pool, yielding its pages in order.
+
+    The PDF is cut into ranges of CONFIG.PARSE_PAGES_PER_TASK pages. At most
+    two ranges per worker are in flight, so parsed pages never pile up ahead
+    of the consumer.
+
+    Args:
+        local_file (str): The absolute path of the PDF.
+        page_count (int): The number of pages of the PDF.
+        timings (dict[str, float] | None): Receives the summed worker seconds
+            under "parse_workers".
+
+    Yields:
+        Document: One document per page, with the metadata of PyPDFLoader.
+
+    """
+    pool = get_process_pool("parse")
+    pages_per_task = max(1, CONFIG.PARSE_PAGES_PER_TASK)
+    ranges = deque((start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task))
+    in_flight: deque[Future[tuple[list[tuple[str, dict[str, Any]]], float]]] = deque()
+    max_in_flight = 2 * get_worker_count("parse")
+
+    def submit() -> None:
+        start, stop = ranges.popleft()
+        in_flight.append(pool.submit(parse_pdf_range, local_file, start, stop))
+
+    while ranges and len(in_flight) < max_in_flight:
+        submit()
+
+    try:
+        while in_flight:
+            pages, seconds = in_flight.popleft().result()
+            if ranges:
+                submit()
+            if timings is not None:
+                timings["parse_workers"] = timings.get("parse_workers", 0.0) + seconds
+            for text, metadata in pages:
+                yield Document(page_content=text, metadata=metadata)
+    finally:
+        # A consumer that stops early does not leave work queued on the pool
+        for future in in_flight:
+            future.cancel()
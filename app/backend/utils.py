@@ -1,39 +1,72 @@
+import hashlib
+import json
 import logging
-import tempfile
 import uuid
-from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
+import aiofiles
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
 from pymongo import errors as pymongo_errors
+from starlette.datastructures import Headers
 
-from app.backend.accessors import get_collection
+from app.backend.accessors import get_async_collection, get_collection
+from app.backend.concurrency import run_in_stage, stage_limit
 from app.backend.config import get_config_variables
+from app.backend.metrics import span
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from fastapi import UploadFile
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 LOG = logging.getLogger(__name__)
 
 CONFIG = get_config_variables()
 
+UPLOAD_PATHS = frozenset({"/uploadFile"})
+# Room for the multipart boundaries, part headers and form fields around the file
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+def _history_projection(max_turns: int | None) -> dict[str, Any]:
+    max_turns = CONFIG.HISTORY_MAX_TURNS if max_turns is None else max_turns
+    return {"_id": 0, "conversion": {"$slice": -2 * max_turns}}
+
+
+def _to_turns(data: dict[str, Any] | None) -> list[tuple[str, str]]:
+    history: list[tuple[str, str]] = []
+
+    if data:
+        conversion = data.get("conversion", [])
+
+        for x in range(0, len(conversion) - 1, 2):
+            history.extend([(conversion[x], conversion[x + 1])])
+
+    return history
+
 
-def load_memory_to_pass(session_id: str) -> list[tuple[str, str]]:
+def load_memory_to_pass(session_id: str, max_turns: int | None = None) -> list[tuple[str, str]]:
     """Load the memory history for a given session ID.
 
-    This function retrieves the conversation history from the MongoDB
-        collection and formats it for use in the chat.
+    This function retrieves the most recent turns of the conversation from the
+        MongoDB collection and formats them for use in the chat. Only the last
+        max_turns question/answer pairs are read, so the cost does not grow with
+        the length of the session.
 
     Args:
         session_id (str): The session ID to load memory for.
+        max_turns (int | None): The number of recent turns to load. Defaults to
+            CONFIG.HISTORY_MAX_TURNS.
 
     Returns:
         list: The loaded memory history.
 
     """
-    data = get_collection().find_one({"session_id": session_id})
-    history = []
-
-    if data:
-        data = data["conversion"]
-
-        for x in range(0, len(data), 2):
-            history.extend([(data[x], data[x + 1])])
+    with span("history_read"):
+        data = get_collection().find_one({"session_id": session_id}, _history_projection(max_turns))
+    history = _to_turns(data)
 
     LOG.info(history)
 
@@ -55,8 +88,10 @@ def get_session() -> str:
 def add_session_history(session_id: str, new_values: list[str]) -> bool:
     """Add a new session history entry.
 
-    This function adds a new entry to the chat history in the MongoDB
-        collection.
+    This function appends the new entries to the chat history in the MongoDB
+        collection with a single atomic $push, creating the session document on
+        its first turn. Concurrent turns of the same session never overwrite
+        each other.
 
     Args:
         session_id (str): The session ID for the chat.
@@ -66,23 +101,47 @@ def add_session_history(session_id: str, new_values: list[str]) -> bool:
         bool: True if the entry was added successfully, False otherwise.
 
     """
+    query, update = _history_append(session_id, new_values)
     try:
-        doc = get_collection().find_one({"session_id": session_id})
-
-        if doc:
-            conversion = doc["conversion"]
-            conversion.extend(new_values)
-            get_collection().update_one(
-                {"session_id": session_id},
-                {"$set": {"conversion": conversion}},
-            )
-        else:
-            get_collection().insert_one(
-                {
-                    "session_id": session_id,
-                    "conversion": new_values,
-                }
-            )
+        with span("history_write"):
+            try:
+                get_collection().update_one(query, update, upsert=True)
+            except pymongo_errors.DuplicateKeyError:
+                # A concurrent first turn created the session; append to it.
+                get_collection().update_one(query, update, upsert=True)
+    except pymongo_errors.PyMongoError as e:
+        message = str(e)
+        LOG.exception(f"Error adding session history: {message}")
+        return False
+    else:
+        return True
+
+
+async def aadd_session_history(session_id: str, new_values: list[str]) -> bool:
+    """Add a new session history entry without blocking the event loop.
+
+    Uses the asynchronous MongoDB client when CONFIG.MONGO_ASYNC is set, otherwise
+        runs add_session_history on the I/O executor.
+
+    Args:
+        session_id (str): The session ID for the chat.
+        new_values (list): The new values to be added to the conversation history.
+
+    Returns:
+        bool: True if the entry was added successfully, False otherwise.
+
+    """
+    if not CONFIG.MONGO_ASYNC:
+        return await run_in_stage("history", add_session_history, session_id, new_values)
+
+    query, update = _history_append(session_id, new_values)
+    try:
+        async with stage_limit("history"):
+            with span("history_write"):
+                try:
+                    await get_async_collection().update_one(query, update, upsert=True)
+                except pymongo_errors.DuplicateKeyError:
+                    await get_async_collection().update_one(query, update, upsert=True)
     except pymongo_errors.PyMongoError as e:
         message = str(e)
         LOG.exception(f"Error adding session history: {message}")
@@ -91,29 +150,119 @@ def add_session_history(session_id: str, new_values: list[str]) -> bool:
         return True
 
 
-def get_temp_file_path(filename: str | None) -> Path:
-    """Validate filename and prepare a temporary file path.
+def _history_append(session_id: str, new_values: list[str]) -> tuple[dict[str, Any], dict[str, Any]]:
+    return {"session_id": session_id}, {"$push": {"conversion": {"$each": new_values}}}
+
+
+def format_sse_event(event: str, data: dict[str, Any]) -> str:
+    """Format one Server-Sent Events message.
 
     Args:
-        filename: The original filename from the upload
+        event (str): The event name, e.g. "token" or "end".
+        data (dict): The JSON payload of the event.
 
     Returns:
-        Path: Path object pointing to the temporary file location
+        str: The encoded event, terminated by a blank line.
+
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds CONFIG.MAX_UPLOAD_BYTES."""
+
+
+async def save_upload(data_file: "UploadFile", destination: "Path") -> tuple["Path", str, int]:
+    """Stream an upload to a partial file next to its destination.
+
+    The file is copied in CONFIG.UPLOAD_CHUNK_SIZE chunks while its SHA-256
+    hash is computed, so it is never held in memory as a whole. The caller
+    moves the partial file into place (or discards it) once it knows the hash.
+
+    Args:
+        data_file (UploadFile): The uploaded file.
+        destination (Path): The final path of the file.
+
+    Returns:
+        tuple[Path, str, int]: The partial file, the content hash and the size
+        in bytes.
 
     Raises:
-        FileNotFoundError: If the filename is None
+        UploadTooLargeError: If the file is larger than CONFIG.MAX_UPLOAD_BYTES.
+            The partial file is removed.
 
     """
-    if filename is None:
-        msg = "Uploaded file must have a filename."
-        raise FileNotFoundError(msg)
+    if data_file.size is not None:
+        _check_upload_size(data_file.size)
+
+    partial_file = destination.with_name(f".{destination.name}.{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        async with aiofiles.open(partial_file, "wb") as out_file:
+            while chunk := await data_file.read(CONFIG.UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                _check_upload_size(size)
+                digest.update(chunk)
+                await out_file.write(chunk)
+    except BaseException:
+        partial_file.unlink(missing_ok=True)
+        raise
+
+    return partial_file, digest.hexdigest(), size
+
 
-    # Create a safe filename without potentially problematic characters
-    safe_filename = Path(filename).name
+def _check_upload_size(size: int) -> None:
+    if size > CONFIG.MAX_UPLOAD_BYTES:
+        raise UploadTooLargeError(_upload_too_large_message())
 
-    # Create path in secure temporary directory
-    tmp_path = Path(tempfile.gettempdir()) / safe_filename
 
-    LOG.info(f"Using temporary file path: {tmp_path}")
+def _upload_too_large_message() -> str:
+    return f"File exceeds the maximum upload size of {CONFIG.MAX_UPLOAD_BYTES} bytes."
 
-    return tmp_path
+
+class UploadLimitMiddleware:
+    """ASGI middleware refusing oversized upload requests before their body is parsed.
+
+    The multipart parser spools a whole upload to a temporary file before the
+    endpoint runs. So a request to one of UPLOAD_PATHS whose Content-Length
+    is over CONFIG.MAX_UPLOAD_BYTES plus UPLOAD_FORM_OVERHEAD_BYTES gets a
+    413 before any of its body is read. A body without a length, e.g. a
+    chunked one, is counted as it streams in and fails with 413 once it
+    passes the same limit. save_upload still checks the exact file size.
+    """
+
+    def __init__(self, app: "ASGIApp") -> None:
+        self.app = app
+
+    async def __call__(self, scope: "Scope", receive: "Receive", send: "Send") -> None:
+        if scope["type"] != "http" or scope["path"] not in UPLOAD_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        limit = CONFIG.MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD_BYTES
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > limit:
+            LOG.info(f"Rejected upload of {content_length} bytes before reading it")
+            response = JSONResponse(
+                {"detail": _upload_too_large_message()}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_with_limit() -> "Message":
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised while the body is parsed, so FastAPI answers with it
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=_upload_too_large_message()
+                    )
+            return message
+
+        await self.app(scope, receive_with_limit, send)
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+
+from starlette.concurrency import run_in_threadpool
+
+from app.backend.accessors import ensure_indexes, get_async_client
+from app.backend.chat import DEFAULT_MODEL
+from app.backend.config import get_config_variables
+from app.backend.embeddings import warmup_embeddings
+from app.backend.history import load_token_counter
+from app.backend.llm import warmup_llm_pool
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+LOG = logging.getLogger(__name__)
+CONFIG = get_config_variables()
+
+# "pending" until warmup finishes, then "ready" or "failed"
+WARMUP_STATE: dict[str, Any] = {"status": "pending", "stages": {}}
+
+
+async def warmup_mongo() -> None:
+    """Create the history indexes, opening the MongoDB connection pools."""
+    await run_in_threadpool(ensure_indexes)
+    if CONFIG.MONGO_ASYNC:
+        await get_async_client().admin.command("ping")
+
+
+async def _run_stage(name: str, warm: "Callable[[], Awaitable[Any]]", *, required: bool) -> bool:
+    start = time.perf_counter()
+    try:
+        await warm()
+    except Exception as e:
+        error = str(e)
+        WARMUP_STATE["stages"][name] = {"seconds": round(time.perf_counter() - start, 3), "error": error}
+        if required:
+            LOG.exception(f"Warmup of {name} failed: {error}")
+        else:
+            LOG.warning(f"Warmup of {name} failed, it will connect on first use: {error}")
+        return not required
+
+    WARMUP_STATE["stages"][name] = {"seconds": round(time.perf_counter() - start, 3)}
+    LOG.info(f"Warmed up {name} in {WARMUP_STATE['stages'][name]['seconds']}s")
+    return True
+
+
+async def run_warmup() -> dict[str, Any]:
+    """Warm the shared resources of the worker before it takes traffic.
+
+    Opens the MongoDB pools, loads the embedding model (CONFIG.EMBEDDING_WARMUP)
+    and the history tokenizer and creates the default LLM client with an open
+    connection to its API (CONFIG.LLM_WARMUP), concurrently. MongoDB and the
+    embedding model are required for the worker to be ready; the LLM
+    connection and the tokenizer are best effort, since without the tokenizer
+    history tokens are estimated from the text length.
+
+    Returns:
+        dict[str, Any]: The warmup status, "ready" or "failed", and the
+        seconds (or error) of each stage.
+
+    """
+    stages = [_run_stage("mongo", warmup_mongo, required=True)]
+    if CONFIG.EMBEDDING_WARMUP:
+        stages.append(_run_stage("embeddings", lambda: run_in_threadpool(warmup_embeddings), required=True))
+    stages.append(_run_stage("tokenizer", lambda: run_in_threadpool(load_token_counter), required=False))
+    if CONFIG.LLM_WARMUP:
+        stages.append(_run_stage("llm", lambda: warmup_llm_pool(DEFAULT_MODEL), required=False))
+
+    results = await asyncio.gather(*stages)
+    WARMUP_STATE["status"] = "ready" if all(results) else "failed"
+    LOG.info(f"Warmup {WARMUP_STATE['status']}: {WARMUP_STATE['stages']}")
+    return WARMUP_STATE
+
+
+def get_warmup_state() -> dict[str, Any]:
+    """Report the warmup status of the worker and the time of each stage."""
+    return {"status": WARMUP_STATE["status"], "stages": dict(WARMUP_STATE["stages"])}
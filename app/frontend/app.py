@@ -1,12 +1,17 @@
+import json
 import logging
 import tempfile
 import time
 from http import HTTPStatus
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import requests
 import streamlit as st
 
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
 # Base URL of the backend API server
 BACKEND_URL = "http://localhost:8000"
 
@@ -14,21 +19,30 @@ BACKEND_URL = "http://localhost:8000"
 LOG = logging.getLogger(__name__)
 
 
-def chat(user_input: str, data: str, session_id: str | None = None) -> tuple[str, str] | None:
-    """Send a user input to a chat API and returns the response.
+def chat_stream(
+    user_input: str,
+    data: str,
+    session_id: str | None = None,
+    result: dict[str, str] | None = None,
+) -> "Iterator[str]":
+    """Send a user input to the streaming chat API and yield the answer tokens.
 
     Args:
         user_input (str): The user's input.
         data (str): The data source.
         session_id (str, optional): Session identifier. Defaults to None.
+        result (dict, optional): Filled with the full "answer" and the updated
+            "session_id" once the stream ends.
 
-    Returns:
-        tuple[str, str] | None: A tuple containing the response answer and
-            the updated session_id, or None if the request failed.
+    Yields:
+        str: The answer tokens as the backend produces them.
+
+    Raises:
+        RuntimeError: If the request fails or the backend reports an error.
 
     """
-    # API endpoint for chat
-    url = BACKEND_URL + "/chat"
+    # API endpoint for streaming chat
+    url = BACKEND_URL + "/chat/stream"
 
     # Log inputs for debugging
     LOG.info(f"User input: {user_input}")
@@ -45,46 +59,44 @@ def chat(user_input: str, data: str, session_id: str | None = None) -> tuple[str
 
     # Set headers for the API request
     headers = {
-        "accept": "application/json",
+        "accept": "text/event-stream",
         "Content-Type": "application/json",
     }
 
-    try:
-        # Make a POST request to the chat API
-        response = requests.post(
-            url,
-            headers=headers,
-            json=payload,  # Use json parameter for automatic serialization
-            timeout=30,
-        )
-
+    with requests.post(url, headers=headers, json=payload, stream=True, timeout=30) as response:
         LOG.info(f"Response status: {response.status_code}")
-        LOG.info(f"Request payload: {payload}")
-
-        # Check if the request was successful (status code 200)
-        if response.status_code == HTTPStatus.OK:
-            result = response.json()
-            LOG.info(f"Success response: {result}")
-            # Return the response answer and updated session_id
-            return result["response"]["answer"], result["session_id"]
-
-    except Exception as e:
-        message = str(e)
-        LOG.exception(f"Request failed: {message}")
-        return None
-    else:
-        LOG.error(f"Error response: {response.status_code} - {response.text}")
-        return None
-
-
-def upload_file(file_path: str) -> str | None:
+        if response.status_code != HTTPStatus.OK:
+            LOG.error(f"Error response: {response.status_code} - {response.text}")
+            msg = f"Chat request failed with status code {response.status_code}"
+            raise RuntimeError(msg)
+
+        # Server-Sent Events: "event: <name>" and "data: <json>" lines per event
+        event = ""
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line.removeprefix("event: ")
+            elif line.startswith("data: "):
+                body = json.loads(line.removeprefix("data: "))
+                if event == "token":
+                    yield body["token"]
+                elif event == "end":
+                    LOG.info(f"Success response: {body}")
+                    if result is not None:
+                        result["answer"] = body["response"]["answer"]
+                        result["session_id"] = body["session_id"]
+                elif event == "error":
+                    raise RuntimeError(body["detail"])
+
+
+def upload_file(file_path: str) -> dict[str, str] | None:
     """Upload a file to a specified API endpoint.
 
     Args:
         file_path (str): The path to the file to be uploaded.
 
     Returns:
-        str | None: The file path returned by the API, or None if the upload failed.
+        dict[str, str] | None: The upload metadata returned by the API (including
+            "file_path" and "document_id"), or None if the upload failed.
 
     """
     LOG.info(f"path: {file_path}")
@@ -124,13 +136,48 @@ def upload_file(file_path: str) -> str | None:
     if response.status_code == HTTPStatus.OK:
         # LOG.info the API response for debugging
         LOG.info(f"response: {response.json()}")
-        # Return the file path returned by the API, explicitly cast to string
-        return str(response.json()["file_path"])
+        # Return the upload metadata returned by the API
+        return dict(response.json())
 
     LOG.error(f"File upload failed with status code: {response.status_code}")
     return None
 
 
+def wait_until_ready(document_id: str, timeout: float = 300.0) -> bool:
+    """Poll the ingestion status of a document until it can be queried.
+
+    Large documents become queryable on their first pages while the rest is
+    still being indexed.
+
+    Args:
+        document_id (str): The document ID returned by the upload.
+        timeout (float): The maximum number of seconds to wait.
+
+    Returns:
+        bool: True if the document is ready to chat with, False otherwise.
+
+    """
+    url = BACKEND_URL + f"/documents/{document_id}/status"
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        response = requests.get(url, timeout=10)
+        if response.status_code != HTTPStatus.OK:
+            LOG.error(f"Status check failed with status code: {response.status_code}")
+            return False
+
+        job_status = response.json()["status"]
+        if job_status == "ready" or response.json().get("queryable"):
+            return True
+        if job_status == "failed":
+            LOG.error(f"Ingestion failed: {response.json()['error']}")
+            return False
+        time.sleep(0.5)
+
+    LOG.error(f"Document {document_id} was not ready after {timeout} seconds")
+    return False
+
+
 # Set page configuration for the Streamlit app
 st.set_page_config(page_title="Semantic Document Chat", page_icon="🧠", layout="wide")
 
@@ -156,14 +203,20 @@ if data_file is not None:
         f.write(data_file.getbuffer())
 
     # Upload the file to a specified API endpoint
-    s3_upload_url = upload_file(file_path=file_path)
+    upload = upload_file(file_path=file_path)
 
-    if s3_upload_url is not None:
-        s3_upload_url = s3_upload_url.split("/")[-1]
+    if upload is not None:
+        s3_upload_url = upload["document_id"]
     else:
         st.error("Failed to upload file. Please try again.")
         st.stop()  # Stop execution if upload failed
 
+    # Wait for the backend to finish indexing the document
+    with st.spinner("Indexing document..."):
+        if not wait_until_ready(upload["document_id"]):
+            st.error("Failed to index file. Please try again.")
+            st.stop()
+
     # Display chat messages from history on app rerun
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
@@ -183,34 +236,22 @@ if data_file is not None:
 
         # Display assistant response in chat message container
         with st.chat_message("assistant"):
-            if st.session_state.sessionid is None:
-                # If no existing session ID, start a new session
-                result = chat(prompt, data=s3_upload_url, session_id=None)
-                if result is None:
-                    st.error("Failed to get response from the chat service. Please try again.")
-                    st.stop()
-                assistant_response, session_id = result
-                st.session_state.sessionid = session_id
-            else:
-                # If existing session ID, continue the session
-                result = chat(prompt, session_id=st.session_state.sessionid, data=s3_upload_url)
-                if result is None:
-                    st.error("Failed to get response from the chat service. Please try again.")
-                    st.stop()
-                assistant_response, session_id = result
-
-            message_placeholder = st.empty()
-            full_response = ""
-
-            # Simulate stream of response with milliseconds delay
-            for chunk in assistant_response.split():
-                full_response += chunk + " "
-                time.sleep(0.05)
-
-                # Add a blinking cursor to simulate typing
-                message_placeholder.markdown(full_response + "▌")
-
-            message_placeholder.markdown(full_response)
+            result: dict[str, str] = {}
+            try:
+                # Render tokens as the backend streams them
+                full_response = str(
+                    st.write_stream(
+                        chat_stream(prompt, data=s3_upload_url, session_id=st.session_state.sessionid, result=result)
+                    )
+                )
+            except (requests.RequestException, RuntimeError) as e:
+                message = str(e)
+                LOG.exception(f"Request failed: {message}")
+                st.error("Failed to get response from the chat service. Please try again.")
+                st.stop()
+
+            # Keep the session ID assigned by the backend for the next turns
+            st.session_state.sessionid = result.get("session_id", st.session_state.sessionid)
 
         # Add assistant response to chat history
         st.session_state.messages.append({"role": "assistant", "content": full_response})
@@ -0,0 +1,11 @@
+import os
+
+# The backend modules read their configuration on import, so the benchmark
+# suite can run without a .env file.
+for _name, _value in {
+    "OPENAI_API_KEY": "benchmark-key",
+    "OPENAI_API_BASE": "http://localhost:9/v1",
+    "MONGO_URL": "mongodb://localhost:27017",
+    "MONGO_DB_NAME": "benchmark-db",
+}.items():
+    os.environ.setdefault(_name, _value)
@@ -0,0 +1,109 @@
+"""Compare the recall and latency of the FAISS index types.
+
+Run ``python -m tests.benchmarks.ann_recall --vectors 100000 --queries 1000``
+to index clustered random vectors with each index type and report its
+recall@k against the exact flat index, its build and query time and its size.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import faiss
+import numpy as np
+from app.backend.ann_index import INDEX_TYPES, build_index, get_index_type, get_search_parameters
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+
+def compare_index_types(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int = 10,
+    index_types: tuple[str, ...] = INDEX_TYPES,
+) -> list[dict[str, Any]]:
+    """Measure recall and latency of each index type against the flat baseline.
+
+    Args:
+        vectors (np.ndarray): The float32 vectors to index.
+        queries (np.ndarray): The float32 query vectors.
+        k (int): The number of neighbours per query.
+        index_types (tuple[str, ...]): The index types to compare.
+
+    Returns:
+        list[dict]: Per index type: whether it fell back to flat, the build
+        seconds, recall@k against flat, the mean query milliseconds and the
+        index size in bytes.
+
+    """
+    ids = np.arange(len(vectors), dtype=np.int64)
+    baseline: np.ndarray | None = None
+    report = []
+    for index_type in ("flat", *(t for t in index_types if t != "flat")):
+        started = time.perf_counter()
+        index = build_index(vectors, ids, index_type)
+        build_seconds = time.perf_counter() - started
+
+        params = get_search_parameters(index)
+        started = time.perf_counter()
+        _, found = index.search(queries, k, params=params)
+        query_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+        if baseline is None:
+            baseline = found
+        recall = np.mean([len(set(row) & set(expected)) / k for row, expected in zip(found, baseline, strict=True)])
+        report.append(
+            {
+                "index_type": index_type,
+                "built_as": get_index_type(index),
+                "build_seconds": round(build_seconds, 3),
+                "recall_at_k": round(float(recall), 4),
+                "query_ms": round(query_ms, 4),
+                "bytes": int(faiss.serialize_index(index).nbytes),
+            }
+        )
+    return report
+
+
+def clustered_vectors(count: int, queries: int, dim: int) -> tuple[np.ndarray, np.ndarray]:
+    """Make clustered random vectors, which are closer to real embeddings than uniform noise.
+
+    Args:
+        count (int): The number of vectors to index.
+        queries (int): The number of query vectors, near some of the indexed ones.
+        dim (int): The dimension of the vectors.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The float32 vectors and queries.
+
+    """
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(256, dim))
+    vectors = centers[rng.integers(256, size=count)] + rng.normal(scale=0.3, size=(count, dim))
+    nearby = vectors[rng.choice(count, size=queries, replace=False)] + rng.normal(scale=0.1, size=(queries, dim))
+    return vectors.astype(np.float32), nearby.astype(np.float32)
+
+
+def main(argv: "Sequence[str] | None" = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100_000, help="vectors to index")
+    parser.add_argument("--queries", type=int, default=1_000, help="query vectors")
+    parser.add_argument("--dim", type=int, default=384, help="dimension of the vectors")
+    parser.add_argument("-k", type=int, default=10, help="neighbours per query")
+    parser.add_argument("--output", type=Path, help="write the report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    vectors, queries = clustered_vectors(args.vectors, args.queries, args.dim)
+    text = json.dumps(compare_index_types(vectors, queries, args.k), indent=2) + "\n"
+    if args.output is None:
+        sys.stdout.write(text)
+    else:
+        args.output.write_text(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Compare the LLM round trips and tokens of the chat modes.
+
+Run ``python -m tests.benchmarks.chat_modes --turns 6`` to hold the same
+conversation about a synthetic document once per chat mode, against a local
+stub OpenAI-compatible server, and report the LLM requests, tokens and
+latency of each mode and what the single-call mode saves.
+"""
+
+import argparse
+import json
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from app.backend.chat import CHAT_MODES, CONDENSE_MODE, SINGLE_CALL_MODE
+from app.backend.endpoints import routes
+from app.backend.ingest import get_job_status
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from tests.benchmarks.fixtures import benchmark_environment, write_pdf
+from tests.benchmarks.load import QUESTIONS, percentile
+from tests.benchmarks.stub_llm import create_stub_llm, serve_in_thread
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+TOKEN_KINDS = ("prompt_tokens", "completion_tokens")
+
+
+def run_conversation(
+    client: TestClient, document_id: str, chat_mode: str, turns: int, stats: dict[str, int]
+) -> dict[str, Any]:
+    """Chat about a document for some turns in one chat mode.
+
+    Args:
+        client (TestClient): The client of the backend routes.
+        document_id (str): The document to chat about.
+        chat_mode (str): The chat mode of every request.
+        turns (int): The number of questions.
+        stats (dict[str, int]): The request and token counts of the stub LLM.
+
+    Returns:
+        dict[str, Any]: The LLM requests and tokens of the conversation and
+        the latency percentiles of its /chat requests in milliseconds.
+
+    """
+    before = dict(stats)
+    latencies = []
+    for turn in range(turns):
+        payload = {
+            "session_id": f"chat-modes-{chat_mode}",
+            "user_input": QUESTIONS[turn % len(QUESTIONS)],
+            "data_source": document_id,
+            "bypass_cache": True,
+            "chat_mode": chat_mode,
+        }
+        started = time.perf_counter()
+        client.post("/chat", json=payload).raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "llm_requests": stats["requests"] - before["requests"],
+        **{kind: stats[kind] - before[kind] for kind in TOKEN_KINDS},
+        "total_tokens": sum(stats[kind] - before[kind] for kind in TOKEN_KINDS),
+        "latency_ms": {"p50": round(percentile(latencies, 50), 3), "max": round(max(latencies), 3)},
+    }
+
+
+def compare_chat_modes(
+    turns: int = 6,
+    pages: int = 8,
+    first_token_ms: float = 200.0,
+    tokens_per_second: float = 50.0,
+    answer_tokens: int = 64,
+) -> dict[str, Any]:
+    """Hold the same conversation in every chat mode and compare the LLM usage.
+
+    Args:
+        turns (int): The questions per conversation.
+        pages (int): The pages of the synthetic PDF.
+        first_token_ms (float): The stub LLM latency to the first token.
+        tokens_per_second (float): The stub LLM throughput.
+        answer_tokens (int): The tokens per stub LLM answer.
+
+    Returns:
+        dict[str, Any]: The usage of each mode and the fraction of LLM
+        requests, tokens and latency the single-call mode saves.
+
+    """
+    stub = create_stub_llm(first_token_ms, tokens_per_second, answer_tokens)
+    with (
+        tempfile.TemporaryDirectory() as directory,
+        serve_in_thread(stub) as llm_url,
+        pytest.MonkeyPatch.context() as patch,
+    ):
+        root = Path(directory)
+        patch.setenv("OPENAI_API_BASE", f"{llm_url}/v1")
+        patch.setenv("OPENAI_API_KEY", "chat-modes")
+        with (
+            benchmark_environment(root / "backend", stub_llm=False),
+            TestClient(FastAPI(routes=routes.routes)) as client,
+        ):
+            with write_pdf(root / "chat-modes.pdf", pages).open("rb") as file:
+                upload = client.post("/uploadFile", files={"data_file": file})
+            upload.raise_for_status()
+            document_id = upload.json()["document_id"]
+            job_status = get_job_status(document_id)
+            if job_status is None or job_status["status"] != "ready":
+                msg = f"Ingestion did not finish: {job_status}"
+                raise RuntimeError(msg)
+
+            modes = {
+                chat_mode: run_conversation(client, document_id, chat_mode, turns, stub.state.stats)
+                for chat_mode in CHAT_MODES
+            }
+
+    condense, single = modes[CONDENSE_MODE], modes[SINGLE_CALL_MODE]
+    return {
+        "settings": {
+            "turns": turns,
+            "pages": pages,
+            "first_token_ms": first_token_ms,
+            "tokens_per_second": tokens_per_second,
+            "answer_tokens": answer_tokens,
+        },
+        "modes": modes,
+        "single_call_savings": {
+            "llm_requests": round(1 - single["llm_requests"] / condense["llm_requests"], 4),
+            "total_tokens": round(1 - single["total_tokens"] / condense["total_tokens"], 4),
+            "latency_p50": round(1 - single["latency_ms"]["p50"] / condense["latency_ms"]["p50"], 4),
+        },
+    }
+
+
+def main(argv: "Sequence[str] | None" = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=6, help="questions per conversation")
+    parser.add_argument("--pages", type=int, default=8, help="pages of the synthetic PDF")
+    parser.add_argument("--first-token-ms", type=float, default=200.0, help="stub LLM latency to the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="stub LLM throughput")
+    parser.add_argument("--answer-tokens", type=int, default=64, help="tokens per stub LLM answer")
+    parser.add_argument("--output", type=Path, help="write the report here instead of stdout")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    report = compare_chat_modes(args.turns, args.pages, args.first_token_ms, args.tokens_per_second, args.answer_tokens)
+    text = json.dumps(report, indent=2) + "\n"
+    if args.output is None:
+        sys.stdout.write(text)
+    else:
+        args.output.write_text(text)
+
+
+if __name__ == "__main__":
+    main()
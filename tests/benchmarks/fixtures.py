@@ -0,0 +1,210 @@
+import random
+import weakref
+import zipfile
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any
+from xml.sax.saxutils import escape
+
+import langchain_huggingface
+import langchain_openai
+import mongomock
+import pytest
+from app.backend import (
+    accessors,
+    answer_cache,
+    batching,
+    chat,
+    corpus,
+    document_store,
+    embedding_store,
+    embeddings,
+    history,
+    index_store,
+    ingest,
+    llm,
+)
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+EMBEDDING_SIZE = 384
+STUB_ANSWER = "The document describes the benchmark corpus."
+WORDS = [
+    "index",
+    "vector",
+    "chunk",
+    "page",
+    "model",
+    "query",
+    "answer",
+    "retrieval",
+    "embedding",
+    "corpus",
+    "document",
+    "section",
+    "latency",
+    "throughput",
+    "cache",
+    "memory",
+    "worker",
+    "session",
+    "history",
+    "token",
+    "prompt",
+    "context",
+    "summary",
+]
+LINES_PER_PAGE = 40
+WORDS_PER_LINE = 12
+
+
+def synthetic_lines(seed: int, count: int) -> list[str]:
+    """Generate reproducible lines of filler text."""
+    rng = random.Random(seed)  # noqa: S311 - filler text, not security
+    return [" ".join(rng.choices(WORDS, k=WORDS_PER_LINE)) for _ in range(count)]
+
+
+def write_pdf(path: "Path", pages: int, seed: int = 0) -> "Path":
+    """Write a text PDF of some pages, readable by pypdf.
+
+    Args:
+        path (Path): The file to write.
+        pages (int): The number of pages.
+        seed (int): Varies the text, and so the content hash of the file.
+
+    Returns:
+        Path: The written file.
+
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # the page tree, once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_numbers = []
+    for page in range(pages):
+        lines = synthetic_lines(seed * 100_003 + page, LINES_PER_PAGE)
+        text = " T* ".join(f"({line}) Tj" for line in lines)
+        stream = f"BT /F1 10 Tf 14 TL 40 800 Td {text} ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects))
+        )
+        page_numbers.append(len(objects))
+    kids = " ".join(f"{number} 0 R" for number in page_numbers)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode()
+
+    content = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(content))
+        content += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(content)
+    content += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    content += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    content += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(bytes(content))
+    return path
+
+
+def write_docx(path: "Path", paragraphs: int, seed: int = 0) -> "Path":
+    """Write a minimal DOCX file of some paragraphs, readable by docx2txt.
+
+    Args:
+        path (Path): The file to write.
+        paragraphs (int): The number of paragraphs.
+        seed (int): Varies the text, and so the content hash of the file.
+
+    Returns:
+        Path: The written file.
+
+    """
+    body = "".join(f"<w:p><w:r><w:t>{escape(line)}</w:t></w:r></w:p>" for line in synthetic_lines(seed, paragraphs))
+    main = "application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(
+            "[Content_Types].xml",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            f'<Override PartName="/word/document.xml" ContentType="{main}"/></Types>',
+        )
+        archive.writestr(
+            "_rels/.rels",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="word/document.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+            "</Relationships>",
+        )
+        archive.writestr(
+            "word/document.xml",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f"<w:body>{body}</w:body></w:document>",
+        )
+    return path
+
+
+def stub_chat_model(**_: Any) -> FakeListChatModel:
+    """Stand in for ChatOpenAI with a model that answers instantly."""
+    return FakeListChatModel(responses=[STUB_ANSWER])
+
+
+@contextmanager
+def benchmark_environment(root: "Path", *, stub_llm: bool = True) -> "Iterator[None]":
+    """Isolate the backend for benchmarking, as the unit test fixtures do.
+
+    Stores live under root, chat history in mongomock, embeddings come from a
+    deterministic fake model and the LLM is a stub. The answer cache and the
+    chunk embedding store are off, so every repeat does the same work.
+
+    Args:
+        root (Path): An empty directory for the stores.
+        stub_llm (bool): Replace ChatOpenAI in-process. Without it the LLM
+            is whatever OPENAI_API_BASE points at, e.g. the stub_llm server.
+
+    Yields:
+        None
+
+    """
+    with pytest.MonkeyPatch.context() as patch:
+        mongo_client = mongomock.MongoClient()
+        patch.setattr(accessors, "get_client", lambda: mongo_client)
+        patch.setattr(accessors, "COLLECTION_CACHE", {})
+        patch.setattr(accessors.CONFIG, "MONGO_ASYNC", False)
+
+        store = index_store.IndexStore(root / "indices")
+        patch.setattr(index_store, "INDEX_STORE_CACHE", {"default": store})
+        patch.setattr(corpus.CONFIG, "INDEX_CACHE_DIR", str(root / "indices"))
+        patch.setattr(corpus, "CORPUS_INDEX_CACHE", {})
+        patch.setattr(
+            document_store,
+            "DOCUMENT_STORE_CACHE",
+            {"default": document_store.DocumentStore(root / "documents", 10 * 1024 * 1024 * 1024, store)},
+        )
+        patch.setattr(ingest, "INGEST_JOBS", {})
+
+        patch.setattr(embeddings, "EMBEDDINGS_CACHE", {})
+        patch.setattr(embeddings, "EMBEDDINGS_LOAD_STATS", {})
+        patch.setattr(batching, "BATCHED_EMBEDDINGS_CACHE", {})
+        patch.setattr(
+            langchain_huggingface, "HuggingFaceEmbeddings", lambda **_: DeterministicFakeEmbedding(size=EMBEDDING_SIZE)
+        )
+        patch.setattr(embedding_store.CONFIG, "EMBEDDING_CACHE_ENABLED", False)
+
+        patch.setattr(history, "TOKEN_COUNTER_CACHE", {history.CONFIG.HISTORY_TOKENIZER: history.estimate_tokens})
+
+        patch.setattr(answer_cache, "ANSWER_CACHE", {})
+        patch.setattr(chat.CONFIG, "ANSWER_CACHE_ENABLED", False)
+        patch.setattr(llm, "HTTP_CLIENT_CACHE", {})
+        patch.setattr(llm, "LLM_CLIENT_CACHE", {})
+        patch.setattr(llm, "ASYNC_HTTP_CLIENT_CACHE", weakref.WeakKeyDictionary())
+        patch.setattr(llm, "ASYNC_LLM_CLIENT_CACHE", weakref.WeakKeyDictionary())
+        if stub_llm:
+            patch.setattr(langchain_openai, "ChatOpenAI", stub_chat_model)
+        yield
@@ -0,0 +1,120 @@
+"""Measure how long importing the backend takes and what it imports.
+
+Run ``python -m tests.benchmarks.import_time --repeats 5`` to import the
+backend in fresh interpreters and report the median import time, the
+slowest packages and which of the slow, lazily imported dependencies were
+imported anyway.
+"""
+
+import argparse
+import json
+import logging
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+# Only needed once a request uses them, so importing the backend must not import them
+LAZY_MODULES = (
+    "openai",
+    "langchain_openai",
+    "langchain.chains",
+    "langchain.text_splitter",
+    "langchain_text_splitters",
+    "langchain_community.callbacks",
+    "langchain_community.document_loaders",
+    "langchain_huggingface",
+    "sentence_transformers",
+    "transformers",
+    "torch",
+)
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(?P<self>\d+) \|\s+\d+ \| *(?P<module>\S+)")
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "loaded": [name for name in {lazy!r} if name in sys.modules]}}))
+"""
+
+
+def import_once(module: str) -> dict[str, Any]:
+    """Import a module in a fresh interpreter.
+
+    Args:
+        module (str): The module to import.
+
+    Returns:
+        dict[str, Any]: The import seconds, the lazy modules that got imported
+        and the microseconds spent importing each top-level package, from
+        ``python -X importtime``.
+
+    """
+    completed = subprocess.run(  # noqa: S603 - runs this interpreter on a fixed probe
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, lazy=LAZY_MODULES)],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=Path(__file__).parents[2],
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    packages_us: dict[str, int] = {}
+    for match in map(IMPORT_TIME_LINE.match, completed.stderr.splitlines()):
+        if match is not None:
+            package = match["module"].split(".")[0]
+            packages_us[package] = packages_us.get(package, 0) + int(match["self"])
+    result["packages_us"] = packages_us
+    return result
+
+
+def measure_import_time(module: str = "app.backend", repeats: int = 5, top: int = 10) -> dict[str, Any]:
+    """Import a module repeatedly in fresh interpreters and summarise the cost.
+
+    Args:
+        module (str): The module to import.
+        repeats (int): The number of fresh interpreters.
+        top (int): The number of slowest packages to report.
+
+    Returns:
+        dict[str, Any]: The median and max import time in milliseconds, the
+        packages that took longest to import in the first run and the lazy
+        modules that were imported.
+
+    """
+    runs = [import_once(module) for _ in range(repeats)]
+    timings_ms = [run["seconds"] * 1000 for run in runs]
+    slowest = sorted(runs[0]["packages_us"].items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "module": module,
+        "repeats": repeats,
+        "median_ms": round(statistics.median(timings_ms), 3),
+        "max_ms": round(max(timings_ms), 3),
+        "slowest_packages_ms": {name: round(us / 1000, 3) for name, us in slowest},
+        "lazy_modules_loaded": sorted({name for run in runs for name in run["loaded"]}),
+    }
+
+
+def main(argv: "Sequence[str] | None" = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.backend", help="the module to import")
+    parser.add_argument("--repeats", type=int, default=5, help="fresh interpreters to import it in")
+    parser.add_argument("--top", type=int, default=10, help="slowest packages to report")
+    parser.add_argument("--output", type=Path, help="write the report here instead of stdout")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    report = measure_import_time(args.module, args.repeats, args.top)
+    text = json.dumps(report, indent=2) + "\n"
+    if args.output is None:
+        sys.stdout.write(text)
+    else:
+        args.output.write_text(text)
+
+
+if __name__ == "__main__":
+    main()
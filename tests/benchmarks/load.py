@@ -0,0 +1,300 @@
+"""Concurrent load generator for the backend, against a local stub LLM.
+
+Run ``python -m tests.benchmarks.load --sessions 32 --turns 4`` to start the
+backend app in a subprocess, point it at a stub OpenAI-compatible server and
+simulate concurrent sessions that upload a document and chat about it. No
+network or external service is needed: history lives in mongomock and the
+embeddings come from a deterministic fake model.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import httpx
+import uvicorn
+
+from tests.benchmarks.fixtures import benchmark_environment, write_docx, write_pdf
+from tests.benchmarks.stub_llm import create_stub_llm, serve_in_thread
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
+
+QUESTIONS = (
+    "What is the document about?",
+    "Which sections discuss retrieval latency?",
+    "Summarise what it says about the cache.",
+    "How does that relate to the worker memory?",
+)
+PERCENTILES = (50, 95, 99)
+
+
+@dataclass
+class Sample:
+    """The outcome of one request."""
+
+    endpoint: str
+    started: float
+    latency: float
+    ttfb: float
+    ok: bool
+
+
+@dataclass
+class Recorder:
+    """Sends requests and records their latency and time to first byte."""
+
+    client: httpx.AsyncClient
+    samples: list[Sample] = field(default_factory=list)
+
+    async def request(self, endpoint: str, method: str, url: str, **kwargs: Any) -> tuple[int | None, bytes]:
+        """Send a request, reading the whole response.
+
+        Args:
+            endpoint (str): The name the sample is reported under.
+            method (str): The HTTP method.
+            url (str): The path, relative to the client's base URL.
+            **kwargs: Passed on to httpx.
+
+        Returns:
+            tuple[int | None, bytes]: The status code, or None if the request
+            failed, and the response body.
+
+        """
+        started = time.perf_counter()
+        ttfb = None
+        chunks = []
+        status_code = None
+        try:
+            async with self.client.stream(method, url, **kwargs) as response:
+                status_code = response.status_code
+                async for chunk in response.aiter_bytes():
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - started
+                    chunks.append(chunk)
+        except httpx.HTTPError:
+            status_code = None
+        latency = time.perf_counter() - started
+        body = b"".join(chunks)
+        ok = status_code is not None and status_code < httpx.codes.BAD_REQUEST and b"event: error" not in body
+        self.samples.append(Sample(endpoint, started, latency, latency if ttfb is None else ttfb, ok))
+        return status_code, body
+
+
+def percentile(values: list[float], rank: float) -> float:
+    """Get the nearest-rank percentile of some values."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(rank / 100 * len(ordered)) - 1)]
+
+
+def summarise(samples: list[Sample], duration: float) -> dict[str, Any]:
+    """Summarise the requests to one endpoint.
+
+    Args:
+        samples (list[Sample]): The requests.
+        duration (float): The seconds the whole run took.
+
+    Returns:
+        dict[str, Any]: Requests, errors, error rate, throughput and the
+        percentiles of latency and time to first byte in milliseconds.
+
+    """
+    errors = sum(not sample.ok for sample in samples)
+    latencies = [sample.latency * 1000 for sample in samples]
+    ttfbs = [sample.ttfb * 1000 for sample in samples]
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4),
+        "throughput_rps": round(len(samples) / duration, 3),
+        "latency_ms": {f"p{rank}": round(percentile(latencies, rank), 3) for rank in PERCENTILES}
+        | {"max": round(max(latencies), 3)},
+        "ttfb_ms": {f"p{rank}": round(percentile(ttfbs, rank), 3) for rank in PERCENTILES},
+    }
+
+
+def write_documents(directory: Path, count: int, pages: int) -> list[Path]:
+    """Write the synthetic documents the sessions upload, alternating PDF and DOCX."""
+    return [
+        write_pdf(directory / f"load-{index}.pdf", pages, seed=index)
+        if index % 2 == 0
+        else write_docx(directory / f"load-{index}.docx", pages * 10, seed=index)
+        for index in range(count)
+    ]
+
+
+async def wait_until_ready(recorder: Recorder, document_id: str, max_wait: float, interval: float) -> bool:
+    """Poll the ingestion status of a document until it can be queried."""
+    started = time.perf_counter()
+    ready = False
+    while time.perf_counter() - started < max_wait:
+        status_code, body = await recorder.request("status", "GET", f"/documents/{document_id}/status")
+        job = json.loads(body) if status_code == httpx.codes.OK else {}
+        if job.get("status") == "failed":
+            break
+        if job.get("status") == "ready":
+            ready = True
+            break
+        await asyncio.sleep(interval)
+    latency = time.perf_counter() - started
+    recorder.samples.append(Sample("ingest", started, latency, latency, ready))
+    return ready
+
+
+async def run_session(recorder: Recorder, index: int, document: tuple[str, bytes], args: argparse.Namespace) -> None:
+    """Upload a document, wait until it is indexed and chat about it for some turns."""
+    await asyncio.sleep(index * args.ramp_up / max(args.sessions, 1))
+    status_code, body = await recorder.request("upload", "POST", "/uploadFile", files={"data_file": document})
+    if status_code != httpx.codes.OK:
+        return
+    document_id = json.loads(body)["document_id"]
+    if not await wait_until_ready(recorder, document_id, args.ingest_timeout, args.poll_interval):
+        return
+
+    endpoint = "/chat/stream" if args.stream else "/chat"
+    for turn in range(args.turns):
+        payload = {
+            "session_id": f"load-session-{index}",
+            "user_input": QUESTIONS[turn % len(QUESTIONS)],
+            "data_source": document_id,
+            "bypass_cache": True,
+        }
+        await recorder.request(endpoint.lstrip("/"), "POST", endpoint, json=payload)
+        await asyncio.sleep(args.think_time)
+
+
+async def generate_load(base_url: str, documents: list[tuple[str, bytes]], args: argparse.Namespace) -> dict[str, Any]:
+    """Run every session concurrently and report on the requests they sent."""
+    limits = httpx.Limits(max_connections=args.sessions, max_keepalive_connections=args.sessions)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        recorder = Recorder(client)
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(run_session(recorder, index, documents[index % len(documents)], args) for index in range(args.sessions))
+        )
+        duration = time.perf_counter() - started
+
+    endpoints = sorted({sample.endpoint for sample in recorder.samples})
+    requests = [sample for sample in recorder.samples if sample.endpoint != "ingest"]
+    return {
+        "duration_s": round(duration, 3),
+        "requests": len(requests),
+        "errors": sum(not sample.ok for sample in requests),
+        "error_rate": round(sum(not sample.ok for sample in requests) / max(len(requests), 1), 4),
+        "throughput_rps": round(len(requests) / duration, 3),
+        "endpoints": {
+            endpoint: summarise([sample for sample in recorder.samples if sample.endpoint == endpoint], duration)
+            for endpoint in endpoints
+        },
+    }
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def start_backend(llm_url: str, root: Path, startup_timeout: float = 120.0) -> "Iterator[str]":
+    """Start the backend app in a subprocess, using the LLM at llm_url.
+
+    Args:
+        llm_url (str): The base URL of the OpenAI-compatible server.
+        root (Path): An empty directory for the backend's stores.
+        startup_timeout (float): The seconds to wait for it to serve.
+
+    Yields:
+        str: The base URL of the backend.
+
+    """
+    port = free_port()
+    env = {**os.environ, "OPENAI_API_BASE": f"{llm_url}/v1", "OPENAI_API_KEY": "load-test"}
+    command = [sys.executable, "-m", "tests.benchmarks.load", "backend", "--port", str(port), "--root", str(root)]
+    process = subprocess.Popen(command, env=env)  # noqa: S603 - our own module
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        started = time.perf_counter()
+        while True:
+            if process.poll() is not None:
+                msg = f"The backend exited with {process.returncode}"
+                raise RuntimeError(msg)
+            try:
+                if httpx.get(f"{base_url}/documentStats", timeout=1).status_code == httpx.codes.OK:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.perf_counter() - started > startup_timeout:
+                msg = f"The backend did not start within {startup_timeout}s"
+                raise RuntimeError(msg)
+            time.sleep(0.1)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def serve_backend(port: int, root: Path) -> None:
+    """Serve chat_app with the benchmark fakes, except for the LLM."""
+    from app.backend import chat_app  # noqa: PLC0415 - only the backend process needs the app
+
+    with benchmark_environment(root, stub_llm=False):
+        uvicorn.run(chat_app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def main(argv: "Sequence[str] | None" = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command")
+    backend = subparsers.add_parser("backend", help="serve the backend for a load run (started by the run)")
+    backend.add_argument("--port", type=int, required=True)
+    backend.add_argument("--root", type=Path, required=True)
+
+    parser.add_argument("--sessions", type=int, default=16, help="concurrent sessions")
+    parser.add_argument("--turns", type=int, default=3, help="chat turns per session")
+    parser.add_argument("--documents", type=int, default=4, help="distinct documents shared by the sessions")
+    parser.add_argument("--pages", type=int, default=8, help="pages per PDF (DOCX files get 10x paragraphs)")
+    parser.add_argument("--stream", action="store_true", help="chat on /chat/stream instead of /chat")
+    parser.add_argument("--ramp-up", type=float, default=1.0, help="seconds over which the sessions start")
+    parser.add_argument("--think-time", type=float, default=0.0, help="seconds between turns")
+    parser.add_argument("--first-token-ms", type=float, default=200.0, help="stub LLM latency to the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="stub LLM throughput")
+    parser.add_argument("--answer-tokens", type=int, default=64, help="tokens per stub LLM answer")
+    parser.add_argument("--poll-interval", type=float, default=0.1)
+    parser.add_argument("--ingest-timeout", type=float, default=120.0)
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--output", type=Path, help="write the report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.command == "backend":
+        serve_backend(args.port, args.root)
+        return 0
+
+    stub = create_stub_llm(args.first_token_ms, args.tokens_per_second, args.answer_tokens)
+    with tempfile.TemporaryDirectory() as directory, serve_in_thread(stub) as llm_url:
+        root = Path(directory)
+        documents = [(path.name, path.read_bytes()) for path in write_documents(root, args.documents, args.pages)]
+        with start_backend(llm_url, root / "backend") as base_url:
+            report = asyncio.run(generate_load(base_url, documents, args))
+
+    settings = {name: value for name, value in vars(args).items() if name not in {"command", "output"}}
+    text = json.dumps({"settings": settings, **report}, indent=2) + "\n"
+    if args.output is None:
+        sys.stdout.write(text)
+    else:
+        args.output.write_text(text)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,139 @@
+"""A local OpenAI-compatible chat completions server with simulated latency.
+
+Run ``python -m tests.benchmarks.stub_llm --port 8100`` and point
+OPENAI_API_BASE at ``http://127.0.0.1:8100/v1`` to use it from the backend.
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Iterator, Sequence
+
+ANSWER_WORDS = ("The", "document", "explains", "how", "retrieval", "finds", "the", "relevant", "chunks.")
+
+
+def create_stub_llm(first_token_ms: float = 200.0, tokens_per_second: float = 50.0, answer_tokens: int = 64) -> FastAPI:
+    """Create an app answering /v1/chat/completions like the OpenAI API.
+
+    Every answer has answer_tokens words. The first one is sent after
+    first_token_ms and the rest at tokens_per_second, streamed or not. The
+    requests and tokens served are counted in app.state.stats.
+
+    Args:
+        first_token_ms (float): The latency before the first token.
+        tokens_per_second (float): The generation throughput after it.
+        answer_tokens (int): The number of tokens per answer.
+
+    Returns:
+        FastAPI: The stub server app.
+
+    """
+    app = FastAPI()
+    app.state.stats = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    tokens = [f"{ANSWER_WORDS[index % len(ANSWER_WORDS)]} " for index in range(answer_tokens)]
+
+    def completion(model: str, **fields: Any) -> dict[str, Any]:
+        return {"id": "chatcmpl-stub", "created": int(time.time()), "model": model, **fields}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request) -> Any:
+        body = await request.json()
+        model = body.get("model", "stub")
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in body.get("messages", []))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": answer_tokens,
+            "total_tokens": prompt_tokens + answer_tokens,
+        }
+        app.state.stats["requests"] += 1
+        app.state.stats["prompt_tokens"] += prompt_tokens
+        app.state.stats["completion_tokens"] += answer_tokens
+
+        if not body.get("stream"):
+            await asyncio.sleep(first_token_ms / 1000 + max(answer_tokens - 1, 0) / tokens_per_second)
+            message = {"role": "assistant", "content": "".join(tokens)}
+            return JSONResponse(
+                completion(
+                    model,
+                    object="chat.completion",
+                    choices=[{"index": 0, "message": message, "finish_reason": "stop"}],
+                    usage=usage,
+                )
+            )
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        async def events() -> "AsyncIterator[str]":
+            await asyncio.sleep(first_token_ms / 1000)
+            for index, token in enumerate(tokens):
+                if index:
+                    await asyncio.sleep(1 / tokens_per_second)
+                delta = {"role": "assistant", "content": token} if index == 0 else {"content": token}
+                choice = {"index": 0, "delta": delta, "finish_reason": None}
+                yield f"data: {json.dumps(completion(model, object='chat.completion.chunk', choices=[choice]))}\n\n"
+            choice = {"index": 0, "delta": {}, "finish_reason": "stop"}
+            yield f"data: {json.dumps(completion(model, object='chat.completion.chunk', choices=[choice]))}\n\n"
+            if include_usage:
+                chunk = completion(model, object="chat.completion.chunk", choices=[], usage=usage)
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+@contextmanager
+def serve_in_thread(app: FastAPI) -> "Iterator[str]":
+    """Serve an app on a free local port from a background thread.
+
+    Args:
+        app (FastAPI): The app to serve.
+
+    Yields:
+        str: The base URL of the server.
+
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            msg = "The server failed to start"
+            raise RuntimeError(msg)
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+        sock.close()
+
+
+def main(argv: "Sequence[str] | None" = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--first-token-ms", type=float, default=200.0)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--answer-tokens", type=int, default=64)
+    args = parser.parse_args(argv)
+    app = create_stub_llm(args.first_token_ms, args.tokens_per_second, args.answer_tokens)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""Stage-level benchmarks of the RAG pipeline, with deterministic fakes.
+
+Run ``python -m tests.benchmarks.suite`` to time every stage on synthetic
+PDF and DOCX files of several sizes, write the results as JSON and compare
+them against the stored baseline.
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from app.backend import chat, history, utils
+from app.backend.embeddings import get_embeddings
+from app.backend.endpoints import routes
+from app.backend.ingest import get_job_status
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from tests.benchmarks.fixtures import benchmark_environment, write_docx, write_pdf
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
+LOG = logging.getLogger(__name__)
+
+BASELINE_FILE = Path(__file__).with_name("baseline.json")
+CASES: dict[str, tuple[str, int]] = {
+    "pdf-small": ("pdf", 4),
+    "pdf-medium": ("pdf", 32),
+    "pdf-large": ("pdf", 128),
+    "docx-small": ("docx", 40),
+    "docx-medium": ("docx", 320),
+    "docx-large": ("docx", 1280),
+}
+STAGES = (
+    "load",
+    "split",
+    "embed",
+    "index",
+    "retrieve",
+    "history",
+    "get_response",
+    "upload_endpoint",
+    "chat_endpoint",
+)
+QUERY = "What does the document say about retrieval latency?"
+
+
+@dataclass
+class Regression:
+    """A stage whose median got slower than the baseline allows."""
+
+    case: str
+    stage: str
+    baseline_ms: float
+    current_ms: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current_ms / self.baseline_ms if self.baseline_ms else math.inf
+
+
+def write_case(directory: Path, case: str, seed: int) -> Path:
+    """Write the synthetic file of a benchmark case."""
+    kind, size = CASES[case]
+    path = directory / f"{case}-{seed}.{kind}"
+    return write_pdf(path, size, seed) if kind == "pdf" else write_docx(path, size, seed)
+
+
+def elapsed(timings: dict[str, float], stage: str, function: "Callable[[], Any]") -> Any:
+    started = time.perf_counter()
+    result = function()
+    timings[stage] = time.perf_counter() - started
+    return result
+
+
+def time_stages(path: Path, client: TestClient) -> dict[str, float]:
+    """Time every stage once on a file whose content was not seen before.
+
+    Load, split, embed and index are the timings the ingestion pipeline
+    records itself. Retrieval and get_response run on the warm index of the
+    uploaded document, and the history stage is one read plus one append.
+
+    Args:
+        path (Path): The file to benchmark with.
+        client (TestClient): A client of the backend routes.
+
+    Returns:
+        dict[str, float]: The seconds spent per stage.
+
+    """
+    progress = None
+    for _, progress in chat.iter_vectorstore_build(str(path), get_embeddings()):  # noqa: B007 - the last one has the totals
+        pass
+    if progress is None:
+        msg = f"No text could be extracted from {path.name}"
+        raise ValueError(msg)
+    timings = {
+        "load": progress.timings.get("parse", 0.0),
+        "split": progress.timings.get("split", 0.0),
+        "embed": progress.timings.get("embed", 0.0),
+        "index": progress.timings.get("index", 0.0),
+    }
+
+    with path.open("rb") as file:
+        upload = elapsed(timings, "upload_endpoint", lambda: client.post("/uploadFile", files={"data_file": file}))
+    upload.raise_for_status()
+    document_id = upload.json()["document_id"]
+    job_status = get_job_status(document_id)
+    if job_status is None or job_status["status"] != "ready":
+        msg = f"Ingestion of {path.name} did not finish: {job_status}"
+        raise RuntimeError(msg)
+
+    retriever = chat.get_retriever(chat.resolve_documents(document_id))
+    elapsed(timings, "retrieve", lambda: retriever.invoke(QUERY))
+
+    session_id = str(uuid.uuid4())
+    utils.add_session_history(session_id, ["Earlier question?", "Earlier answer."])
+    started = time.perf_counter()
+    history.load_history_window(session_id)
+    utils.add_session_history(session_id, [QUERY, "An answer."])
+    timings["history"] = time.perf_counter() - started
+
+    elapsed(timings, "get_response", lambda: chat.get_response(document_id, session_id, QUERY))
+    response = elapsed(
+        timings,
+        "chat_endpoint",
+        lambda: client.post("/chat", json={"session_id": session_id, "user_input": QUERY, "data_source": document_id}),
+    )
+    response.raise_for_status()
+    return timings
+
+
+def summarise(samples: list[float]) -> dict[str, float]:
+    """Summarise the seconds of several repeats in milliseconds."""
+    ordered = sorted(samples)
+    return {
+        "min_ms": round(ordered[0] * 1000, 3),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)] * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def run_suite(cases: "Sequence[str]", repeats: int) -> dict[str, Any]:
+    """Benchmark every stage of some cases.
+
+    Each repeat uses a file with new content, so ingestion is never served
+    from the index store. Before the timed repeats, one untimed run warms up
+    imports, executors and the parser pool.
+
+    Args:
+        cases (Sequence[str]): Names from CASES.
+        repeats (int): The number of timed repeats per case.
+
+    Returns:
+        dict[str, Any]: The environment, the repeats and, per case and stage,
+        the min, median, p95 and mean milliseconds.
+
+    """
+    results: dict[str, dict[str, dict[str, float]]] = {}
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        with benchmark_environment(root), TestClient(FastAPI(routes=routes.routes)) as client:
+            for case in cases:
+                time_stages(write_case(root, case, seed=-1), client)
+                samples: dict[str, list[float]] = {stage: [] for stage in STAGES}
+                for seed in range(repeats):
+                    for stage, seconds in time_stages(write_case(root, case, seed), client).items():
+                        samples[stage].append(seconds)
+                results[case] = {stage: summarise(samples[stage]) for stage in STAGES}
+                LOG.info(f"Benchmarked {case}")
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "repeats": repeats,
+        "results": results,
+    }
+
+
+def compare_to_baseline(
+    current: dict[str, Any],
+    baseline: dict[str, Any],
+    tolerance: float,
+    min_delta_ms: float = 1.0,
+) -> list[Regression]:
+    """Find the stages whose median is slower than in the baseline.
+
+    Args:
+        current (dict[str, Any]): Results of run_suite.
+        baseline (dict[str, Any]): Stored results of run_suite.
+        tolerance (float): The allowed relative slowdown, e.g. 0.25 for 25%.
+        min_delta_ms (float): Slowdowns smaller than this are timer noise.
+
+    Returns:
+        list[Regression]: The stages over the tolerance. Cases and stages
+        missing from either side are not compared.
+
+    """
+    regressions = []
+    for case, stages in current["results"].items():
+        for stage, summary in stages.items():
+            reference = baseline.get("results", {}).get(case, {}).get(stage)
+            if reference is None:
+                continue
+            baseline_ms, current_ms = reference["median_ms"], summary["median_ms"]
+            if current_ms > baseline_ms * (1 + tolerance) and current_ms - baseline_ms > min_delta_ms:
+                regressions.append(Regression(case, stage, baseline_ms, current_ms))
+    return regressions
+
+
+def main(argv: "Sequence[str] | None" = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="write the results here instead of stdout")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown of a median")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the baseline")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    results = run_suite(args.cases, args.repeats)
+    text = json.dumps(results, indent=2) + "\n"
+    if args.output is None:
+        sys.stdout.write(text)
+    else:
+        args.output.write_text(text)
+
+    if args.update_baseline:
+        args.baseline.write_text(text)
+        return 0
+    if not args.baseline.exists():
+        sys.stderr.write(f"No baseline at {args.baseline}; run with --update-baseline to store one\n")
+        return 0
+
+    regressions = compare_to_baseline(results, json.loads(args.baseline.read_text()), args.tolerance)
+    for regression in regressions:
+        sys.stderr.write(
+            f"{regression.case} {regression.stage}: {regression.current_ms:.1f} ms, "
+            f"{regression.ratio:.2f}x the baseline {regression.baseline_ms:.1f} ms\n"
+        )
+    if regressions:
+        json.dump([asdict(regression) for regression in regressions], sys.stderr, indent=2)
+        sys.stderr.write("\n")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
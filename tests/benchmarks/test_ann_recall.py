@@ -0,0 +1,21 @@
+from typing import TYPE_CHECKING
+
+from app.backend import ann_index
+
+from tests.benchmarks.ann_recall import clustered_vectors, compare_index_types
+
+if TYPE_CHECKING:
+    import pytest
+
+
+def test_approximate_indices_keep_recall_against_flat(monkeypatch: "pytest.MonkeyPatch") -> None:
+    monkeypatch.setattr(ann_index.CONFIG, "FAISS_FLAT_MAX_VECTORS", 100)
+    monkeypatch.setattr(ann_index.CONFIG, "FAISS_IVF_NLIST", 16)
+    monkeypatch.setattr(ann_index.CONFIG, "FAISS_IVF_NPROBE", 16)
+    vectors, queries = clustered_vectors(2000, 50, 16)
+
+    report = compare_index_types(vectors, queries, k=5, index_types=("hnsw", "ivfsq8"))
+
+    assert [row["built_as"] for row in report] == ["flat", "hnsw", "ivfsq8"]
+    assert all(row["recall_at_k"] >= 0.9 for row in report)  # noqa: PLR2004
+    assert report[2]["bytes"] < report[0]["bytes"]
@@ -0,0 +1,12 @@
+from tests.benchmarks.chat_modes import compare_chat_modes
+
+TURNS = 3
+
+
+def test_single_call_mode_saves_the_condense_round_trips() -> None:
+    report = compare_chat_modes(turns=TURNS, pages=2, first_token_ms=1, tokens_per_second=1000, answer_tokens=8)
+
+    # Every follow-up costs the condense mode one more LLM call
+    assert report["modes"]["condense"]["llm_requests"] == 2 * TURNS - 1
+    assert report["modes"]["single"]["llm_requests"] == TURNS
+    assert report["single_call_savings"]["total_tokens"] > 0
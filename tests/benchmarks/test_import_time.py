@@ -0,0 +1,9 @@
+from tests.benchmarks.import_time import measure_import_time
+
+
+def test_backend_import_leaves_heavy_dependencies_to_first_use() -> None:
+    report = measure_import_time(repeats=1)
+
+    assert report["lazy_modules_loaded"] == []
+    assert report["median_ms"] > 0
+    assert "fastapi" in report["slowest_packages_ms"]
@@ -0,0 +1,56 @@
+import json
+from typing import TYPE_CHECKING
+
+from langchain_openai import ChatOpenAI
+
+from tests.benchmarks.load import Sample, main, summarise
+from tests.benchmarks.stub_llm import create_stub_llm, serve_in_thread
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_stub_llm_answers_like_openai() -> None:
+    with serve_in_thread(create_stub_llm(first_token_ms=1, tokens_per_second=1000, answer_tokens=5)) as url:
+        llm = ChatOpenAI(model="stub", base_url=f"{url}/v1", api_key="test-key", stream_usage=True)
+        answer = llm.invoke("What is it?")
+        chunks = list(llm.stream("What is it?"))
+
+    assert answer.content == "The document explains how retrieval "
+    assert answer.usage_metadata["output_tokens"] == 5  # noqa: PLR2004
+    assert "".join(chunk.content for chunk in chunks) == answer.content
+    assert sum(chunk.usage_metadata["output_tokens"] for chunk in chunks if chunk.usage_metadata) == 5  # noqa: PLR2004
+
+
+def test_summary_reports_percentiles_and_error_rate() -> None:
+    samples = [Sample("chat", 0.0, index / 100, index / 200, ok=index != 1) for index in range(1, 101)]
+
+    summary = summarise(samples, duration=10.0)
+
+    assert summary["errors"] == 1
+    assert summary["throughput_rps"] == 10.0  # noqa: PLR2004
+    assert summary["latency_ms"] == {"p50": 500.0, "p95": 950.0, "p99": 990.0, "max": 1000.0}
+    assert summary["ttfb_ms"]["p50"] == 250.0  # noqa: PLR2004
+
+
+def test_load_run_reports_every_endpoint(tmp_path: "Path") -> None:
+    output = tmp_path / "load.json"
+
+    main(
+        [
+            "--sessions=2",
+            "--turns=2",
+            "--documents=2",
+            "--pages=2",
+            "--stream",
+            "--ramp-up=0",
+            "--first-token-ms=1",
+            "--tokens-per-second=1000",
+            f"--output={output}",
+        ]
+    )
+    report = json.loads(output.read_text())
+
+    assert set(report["endpoints"]) == {"upload", "status", "ingest", "chat/stream"}
+    assert report["endpoints"]["upload"]["requests"] == 2  # noqa: PLR2004
+    assert report["endpoints"]["chat/stream"]["requests"] == 4  # noqa: PLR2004
@@ -0,0 +1,27 @@
+import json
+
+from tests.benchmarks.suite import BASELINE_FILE, CASES, STAGES, compare_to_baseline, run_suite
+
+
+def test_suite_times_every_stage() -> None:
+    results = run_suite(["pdf-small", "docx-small"], repeats=1)
+
+    assert set(results["results"]) == {"pdf-small", "docx-small"}
+    for stages in results["results"].values():
+        assert set(stages) == set(STAGES)
+        assert all(summary["median_ms"] > 0 for summary in stages.values())
+
+
+def test_baseline_covers_every_case() -> None:
+    baseline = json.loads(BASELINE_FILE.read_text())
+
+    assert set(baseline["results"]) == set(CASES)
+
+
+def test_only_slowdowns_over_the_tolerance_are_regressions() -> None:
+    def results(index_ms: float, embed_ms: float) -> dict:
+        return {"results": {"pdf-small": {"index": {"median_ms": index_ms}, "embed": {"median_ms": embed_ms}}}}
+
+    regressions = compare_to_baseline(results(20.0, 10.4), results(10.0, 10.0), tolerance=0.25)
+
+    assert [(regression.stage, regression.ratio) for regression in regressions] == [("index", 2.0)]
@@ -1,12 +1,29 @@
 # tests/conftest.py
 
+import weakref
+
+import langchain_huggingface
 import mongomock
 import pytest
-from app.backend import accessors
+from app.backend import (
+    accessors,
+    answer_cache,
+    batching,
+    corpus,
+    document_store,
+    embedding_store,
+    embeddings,
+    history,
+    index_store,
+    ingest,
+    llm,
+    warmup,
+)
 from app.backend.config import get_config_variables
 from app.backend.endpoints import routes
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
+from langchain_core.embeddings import DeterministicFakeEmbedding
 
 
 @pytest.fixture(autouse=True)
@@ -23,6 +40,73 @@ def mock_mongo(monkeypatch):
     mock_client = mongomock.MongoClient()
     monkeypatch.setattr(accessors, "get_client", lambda: mock_client)
     monkeypatch.setitem(accessors.MONGO_CLIENT_CACHE, "default", mock_client)
+    monkeypatch.setattr(accessors, "COLLECTION_CACHE", {})
+
+
+@pytest.fixture(autouse=True)
+def isolated_index_store(monkeypatch, tmp_path):
+    store = index_store.IndexStore(tmp_path / "indices")
+    monkeypatch.setitem(index_store.INDEX_STORE_CACHE, "default", store)
+    return store
+
+
+@pytest.fixture(autouse=True)
+def isolated_corpus(monkeypatch, tmp_path):
+    monkeypatch.setattr(corpus.CONFIG, "INDEX_CACHE_DIR", str(tmp_path / "indices"))
+    monkeypatch.setattr(corpus, "CORPUS_INDEX_CACHE", {})
+
+
+@pytest.fixture(autouse=True)
+def isolated_embedding_store(monkeypatch, tmp_path):
+    monkeypatch.setattr(embedding_store.CONFIG, "EMBEDDING_CACHE_DIR", str(tmp_path / "embeddings"))
+    monkeypatch.setattr(embedding_store, "EMBEDDING_STORE_CACHE", {})
+
+
+@pytest.fixture(autouse=True)
+def isolated_document_store(monkeypatch, tmp_path, isolated_index_store):
+    store = document_store.DocumentStore(tmp_path / "documents", 10 * 1024 * 1024, isolated_index_store)
+    monkeypatch.setitem(document_store.DOCUMENT_STORE_CACHE, "default", store)
+    return store
+
+
+@pytest.fixture(autouse=True)
+def isolated_ingest_jobs(monkeypatch):
+    monkeypatch.setattr(ingest, "INGEST_JOBS", {})
+
+
+@pytest.fixture(autouse=True)
+def fake_embeddings(monkeypatch):
+    monkeypatch.setattr(embeddings, "EMBEDDINGS_CACHE", {})
+    monkeypatch.setattr(embeddings, "EMBEDDINGS_LOAD_STATS", {})
+    monkeypatch.setattr(batching, "BATCHED_EMBEDDINGS_CACHE", {})
+    monkeypatch.setattr(
+        langchain_huggingface, "HuggingFaceEmbeddings", lambda **_: DeterministicFakeEmbedding(size=384)
+    )
+
+
+@pytest.fixture(autouse=True)
+def word_token_counter(monkeypatch):
+    monkeypatch.setattr(
+        history, "TOKEN_COUNTER_CACHE", {history.CONFIG.HISTORY_TOKENIZER: lambda text: len(text.split())}
+    )
+
+
+@pytest.fixture(autouse=True)
+def isolated_answer_cache(monkeypatch):
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE", {})
+
+
+@pytest.fixture(autouse=True)
+def isolated_llm_clients(monkeypatch):
+    monkeypatch.setattr(llm, "HTTP_CLIENT_CACHE", {})
+    monkeypatch.setattr(llm, "LLM_CLIENT_CACHE", {})
+    monkeypatch.setattr(llm, "ASYNC_HTTP_CLIENT_CACHE", weakref.WeakKeyDictionary())
+    monkeypatch.setattr(llm, "ASYNC_LLM_CLIENT_CACHE", weakref.WeakKeyDictionary())
+
+
+@pytest.fixture(autouse=True)
+def isolated_warmup_state(monkeypatch):
+    monkeypatch.setattr(warmup, "WARMUP_STATE", {"status": "pending", "stages": {}})
 
 
 @pytest.fixture
@@ -1,13 +1,24 @@
+import asyncio
+import hashlib
 import io
+import json
 import logging
 from http import HTTPStatus
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import pytest
+from app.backend import endpoints
 from app.backend.endpoints import routes
+from app.backend.utils import UploadLimitMiddleware, load_memory_to_pass
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Iterator
+
+    from app.backend.document_store import DocumentStore
+
 LOG = logging.getLogger(__name__)
 
 
@@ -21,16 +32,21 @@ def create_test_app() -> TestClient:
 def test_post_chat(monkeypatch):
     client = create_test_app()
 
-    def mock_get_response(
+    async def mock_aget_response(
         file_name: str,  # noqa: ARG001
         session_id: str,  # noqa: ARG001
         query: str,  # noqa: ARG001
         model: str = "test",  # noqa: ARG001
         temperature: float = 0.0,  # noqa: ARG001
+        *,
+        document_ids: list[str] | None = None,  # noqa: ARG001
+        tag: str | None = None,  # noqa: ARG001
+        bypass_cache: bool = False,  # noqa: ARG001
+        chat_mode: str | None = None,  # noqa: ARG001
     ) -> dict[str, str | int]:
         return {"answer": "Mocked response", "total_tokens_used": 42}
 
-    monkeypatch.setattr("app.backend.endpoints.get_response", mock_get_response)
+    monkeypatch.setattr("app.backend.endpoints.aget_response", mock_aget_response)
 
     payload = {
         "session_id": "test-session",
@@ -47,6 +63,50 @@ def test_post_chat(monkeypatch):
     assert data["session_id"] == "test-session"
 
 
+def test_post_chat_stream(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = create_test_app()
+
+    async def mock_astream_response(
+        file_name: str,  # noqa: ARG001
+        session_id: str,  # noqa: ARG001
+        query: str,  # noqa: ARG001
+        *,
+        document_ids: list[str] | None = None,  # noqa: ARG001
+        tag: str | None = None,  # noqa: ARG001
+        bypass_cache: bool = False,  # noqa: ARG001
+        chat_mode: str | None = None,  # noqa: ARG001
+    ) -> "AsyncIterator[dict[str, str | int]]":
+        for token in ["Mocked", " streamed", " response"]:
+            yield {"token": token}
+        yield {"answer": "Mocked streamed response", "total_tokens_used": 42}
+
+    monkeypatch.setattr("app.backend.endpoints.astream_response", mock_astream_response)
+
+    payload = {
+        "session_id": "stream-session",
+        "user_input": "What is this?",
+        "data_source": "sample.pdf",
+    }
+
+    with client.stream("POST", "/chat/stream", json=payload) as response:
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [
+            (block.split("\n")[0].removeprefix("event: "), json.loads(block.split("\n")[1].removeprefix("data: ")))
+            for block in response.read().decode().strip().split("\n\n")
+        ]
+
+    assert [data["token"] for name, data in events if name == "token"] == ["Mocked", " streamed", " response"]
+    assert events[-1] == (
+        "end",
+        {
+            "response": {"answer": "Mocked streamed response", "total_tokens_used": 42},
+            "session_id": "stream-session",
+        },
+    )
+    assert load_memory_to_pass("stream-session") == [("What is this?", "Mocked streamed response")]
+
+
 def test_upload_docx_file_e2e() -> None:
     app = FastAPI()
     app.include_router(routes)
@@ -72,3 +132,138 @@ def test_upload_docx_file_e2e() -> None:
     assert "file_path" in data
     assert data["filename"].endswith(".docx")
     assert data["file_path"].endswith(".docx")
+
+
+def test_upload_indexes_document_in_background() -> None:
+    client = create_test_app()
+
+    with Path("tests/testdata/sample.docx").open("rb") as f:
+        file = ("sample.docx", io.BytesIO(f.read()), "application/octet-stream")
+
+    response = client.post("/uploadFile", files={"data_file": file})
+
+    assert response.status_code == HTTPStatus.OK
+    document_id = response.json()["document_id"]
+    assert response.json()["status"] == "pending"
+
+    # TestClient runs background tasks before returning the response.
+    status_response = client.get(f"/documents/{document_id}/status")
+    assert status_response.status_code == HTTPStatus.OK
+    assert status_response.json()["status"] == "ready"
+
+
+def test_document_status_unknown_document() -> None:
+    client = create_test_app()
+
+    response = client.get(f"/documents/{'0' * 64}/status")
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_status_and_stats_endpoints_run_off_the_event_loop(monkeypatch: pytest.MonkeyPatch) -> None:
+    def blocking(*_: object) -> dict[str, int]:
+        # Only worker threads have no running event loop
+        with pytest.raises(RuntimeError):
+            asyncio.get_running_loop()
+        return {"calls": 1}
+
+    monkeypatch.setattr(endpoints, "get_job_status", blocking)
+    monkeypatch.setattr(endpoints, "_collect_index_stats", blocking)
+    monkeypatch.setattr(endpoints, "_collect_embedding_stats", blocking)
+    client = create_test_app()
+
+    for path in (f"/documents/{'0' * 64}/status", "/indexStats", "/embeddingStats", "/documentStats"):
+        response = client.get(path)
+        assert response.status_code == HTTPStatus.OK, path
+
+
+def test_upload_streams_large_files_in_chunks(
+    monkeypatch: pytest.MonkeyPatch, isolated_document_store: "DocumentStore"
+) -> None:
+    monkeypatch.setattr("app.backend.utils.CONFIG.UPLOAD_CHUNK_SIZE", 1024)
+    monkeypatch.setattr("app.backend.endpoints.run_ingestion", lambda _: None)
+    client = create_test_app()
+    content = bytes(range(256)) * 64
+
+    response = client.post("/uploadFile", files={"data_file": ("big.pdf", io.BytesIO(content), "application/pdf")})
+
+    assert response.status_code == HTTPStatus.OK
+    assert Path(response.json()["file_path"]).read_bytes() == content
+    assert response.json()["document_id"] == hashlib.sha256(content).hexdigest()
+    assert list(isolated_document_store.incoming_dir.iterdir()) == []
+
+
+def test_upload_rejects_files_over_the_size_limit(
+    monkeypatch: pytest.MonkeyPatch, isolated_document_store: "DocumentStore"
+) -> None:
+    monkeypatch.setattr("app.backend.utils.CONFIG.MAX_UPLOAD_BYTES", 100)
+    client = create_test_app()
+
+    response = client.post("/uploadFile", files={"data_file": ("big.pdf", io.BytesIO(b"x" * 101), "application/pdf")})
+
+    assert response.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+    assert list(isolated_document_store.incoming_dir.iterdir()) == []
+    assert isolated_document_store.stats()["documents"] == 0
+
+
+def test_upload_with_an_oversized_content_length_is_rejected_before_parsing(
+    monkeypatch: pytest.MonkeyPatch, isolated_document_store: "DocumentStore"
+) -> None:
+    monkeypatch.setattr("app.backend.utils.CONFIG.MAX_UPLOAD_BYTES", 100)
+    parsed: list[bool] = []
+    monkeypatch.setattr("starlette.formparsers.MultiPartParser.parse", lambda *_: parsed.append(True))
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware)
+    app.include_router(routes)
+    content = b"x" * (200 * 1024)
+
+    response = TestClient(app).post(
+        "/uploadFile", files={"data_file": ("big.pdf", io.BytesIO(content), "application/pdf")}
+    )
+
+    assert response.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+    assert "maximum upload size" in response.json()["detail"]
+    assert parsed == []
+    assert isolated_document_store.stats()["documents"] == 0
+
+
+def test_upload_without_a_content_length_is_counted_as_it_streams(
+    monkeypatch: pytest.MonkeyPatch, isolated_document_store: "DocumentStore"
+) -> None:
+    monkeypatch.setattr("app.backend.utils.CONFIG.MAX_UPLOAD_BYTES", 100)
+    saved: list[bool] = []
+    monkeypatch.setattr("app.backend.endpoints.save_upload", lambda *_: saved.append(True))
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware)
+    app.include_router(routes)
+    head = b'--limit\r\nContent-Disposition: form-data; name="data_file"; filename="big.pdf"\r\n\r\n'
+
+    def body() -> "Iterator[bytes]":
+        yield head
+        for _ in range(100):
+            yield b"x" * 4096
+        yield b"\r\n--limit--\r\n"
+
+    response = TestClient(app).post(
+        "/uploadFile", content=body(), headers={"Content-Type": "multipart/form-data; boundary=limit"}
+    )
+
+    assert response.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+    assert saved == []
+    assert list(isolated_document_store.incoming_dir.iterdir()) == []
+    assert isolated_document_store.stats()["documents"] == 0
+
+
+def test_reupload_of_same_content_returns_existing_document(isolated_document_store: "DocumentStore") -> None:
+    client = create_test_app()
+    content = Path("tests/testdata/sample.docx").read_bytes()
+
+    first = client.post("/uploadFile", files={"data_file": ("first.docx", io.BytesIO(content), "text/plain")})
+    second = client.post("/uploadFile", files={"data_file": ("second.docx", io.BytesIO(content), "text/plain")})
+
+    assert second.status_code == HTTPStatus.OK
+    assert second.json()["deduplicated"] is True
+    assert second.json()["document_id"] == first.json()["document_id"]
+    assert second.json()["file_path"] == first.json()["file_path"]
+    assert second.json()["filename"] == "first.docx"
+    assert isolated_document_store.stats()["documents"] == 1
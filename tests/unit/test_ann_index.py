@@ -0,0 +1,77 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pytest
+from app.backend import ann_index, corpus
+from app.backend.ann_index import build_index, get_index_type
+from app.backend.corpus import CorpusIndex
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+DIM = 16
+RNG = np.random.default_rng(0)
+
+
+def clustered_vectors(count: int) -> np.ndarray:
+    centers = RNG.normal(size=(32, DIM))
+    return (centers[RNG.integers(32, size=count)] + RNG.normal(scale=0.2, size=(count, DIM))).astype(np.float32)
+
+
+def test_small_indices_fall_back_to_flat(monkeypatch: "pytest.MonkeyPatch") -> None:
+    monkeypatch.setattr(ann_index.CONFIG, "FAISS_FLAT_MAX_VECTORS", 1000)
+    vectors = clustered_vectors(500)
+
+    index = build_index(vectors, np.arange(500, dtype=np.int64), "hnsw")
+
+    assert get_index_type(index) == "flat"
+
+
+def test_corpus_switches_to_hnsw_and_orphans_removed_vectors(
+    monkeypatch: "pytest.MonkeyPatch", tmp_path: "Path"
+) -> None:
+    monkeypatch.setattr(corpus.CONFIG, "FAISS_INDEX_TYPE", "hnsw")
+    monkeypatch.setattr(corpus.CONFIG, "FAISS_FLAT_MAX_VECTORS", 10)
+    monkeypatch.setattr(ann_index.CONFIG, "FAISS_FLAT_MAX_VECTORS", 10)
+    embeddings = DeterministicFakeEmbedding(size=DIM)
+    store = CorpusIndex(tmp_path / "corpus")
+    for name in ("a", "b"):
+        pages = [Document(page_content=f"{name} page {page}", metadata={"page": page}) for page in range(8)]
+        store.add_document(name * 64, FAISS.from_documents(pages, embeddings))
+    store.compact()
+
+    store.remove_document("a" * 64)
+    store.compact()
+    found = store.search(embeddings.embed_query("a page 0"), ["a" * 64, "b" * 64], k=3)
+
+    assert store.stats()["index_type"] == "hnsw"
+    assert store.stats()["orphaned_vectors"] == 8  # noqa: PLR2004
+    assert {chunk.metadata["document_id"] for chunk in found} == {"b" * 64}
+    assert CorpusIndex(tmp_path / "corpus").stats() == store.stats()
+
+
+@pytest.mark.parametrize(("index_type", "exact_ratio"), [("ivfsq8", 0.05), ("ivfsq8", 0.0), ("hnsw", 0.0)])
+def test_small_document_is_found_in_a_large_approximate_corpus(
+    monkeypatch: "pytest.MonkeyPatch", tmp_path: "Path", index_type: str, exact_ratio: float
+) -> None:
+    monkeypatch.setattr(corpus.CONFIG, "FAISS_INDEX_TYPE", index_type)
+    monkeypatch.setattr(corpus.CONFIG, "FAISS_FLAT_MAX_VECTORS", 100)
+    monkeypatch.setattr(corpus.CONFIG, "FAISS_IVF_NLIST", 64)
+    monkeypatch.setattr(corpus.CONFIG, "FAISS_IVF_NPROBE", 1)
+    monkeypatch.setattr(corpus.CONFIG, "FAISS_HNSW_EF_SEARCH", 4)
+    monkeypatch.setattr(corpus.CONFIG, "FAISS_EXACT_SEARCH_RATIO", exact_ratio)
+    embeddings = DeterministicFakeEmbedding(size=DIM)
+    store = CorpusIndex(tmp_path / "corpus")
+    large = [Document(page_content=f"large page {page}") for page in range(3000)]
+    store.add_document("a" * 64, FAISS.from_documents(large, embeddings))
+    small = [Document(page_content=f"small page {page}") for page in range(3)]
+    store.add_document("b" * 64, FAISS.from_documents(small, embeddings))
+    store.compact()
+
+    found = store.search(embeddings.embed_query("large page 7"), ["b" * 64], k=3)
+
+    assert store.stats()["index_type"] == index_type
+    assert sorted(chunk.page_content for chunk in found) == [document.page_content for document in small]
@@ -0,0 +1,84 @@
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from unittest.mock import patch
+
+import pytest
+from app.backend.answer_cache import AnswerCache, make_cache_scope
+from app.backend.chat import aget_response
+from langchain_core.language_models import FakeListChatModel
+
+if TYPE_CHECKING:
+    from app.backend.document_store import DocumentStore
+
+SAVED_TOKENS = 120
+
+
+def test_exact_and_semantic_hits() -> None:
+    cache = AnswerCache(max_entries=8, ttl_seconds=60, similarity_threshold=0.9)
+    scope = make_cache_scope("doc", "model", 0.0, [], history_turns=1, chat_mode="condense")
+    cache.put(scope, "What is the refund policy?", [1.0, 0.0], "30 days.", SAVED_TOKENS)
+
+    exact = cache.get(scope, "  what is the REFUND policy? ")
+    semantic = cache.get(scope, "How do refunds work?", [0.95, 0.05])
+    unrelated = cache.get(scope, "Who is the CEO?", [0.0, 1.0])
+
+    assert exact is not None
+    assert exact.match == "exact"
+    assert semantic is not None
+    assert semantic.match == "semantic"
+    assert unrelated is None
+    assert cache.stats()["saved_tokens"] == 2 * SAVED_TOKENS
+
+
+def test_scope_separates_documents_modes_and_history() -> None:
+    cache = AnswerCache(max_entries=8, ttl_seconds=60, similarity_threshold=0.9)
+    scope = make_cache_scope("doc", "model", 0.0, [("q", "a")], history_turns=1, chat_mode="condense")
+    cache.put(scope, "Tell me more", [1.0, 0.0], "More.", 10)
+
+    for other_scope in (
+        make_cache_scope("other-doc", "model", 0.0, [("q", "a")], 1, chat_mode="condense"),
+        make_cache_scope("doc", "model", 0.0, [("x", "y")], 1, chat_mode="condense"),
+        make_cache_scope("doc", "model", 0.7, [("q", "a")], 1, chat_mode="condense"),
+        make_cache_scope("doc", "model", 0.0, [("q", "a")], 1, chat_mode="single"),
+    ):
+        assert cache.get(other_scope, "Tell me more") is None
+
+
+def test_ttl_and_lru_eviction() -> None:
+    cache = AnswerCache(max_entries=2, ttl_seconds=60, similarity_threshold=0.9)
+    cache.put("scope", "first", [1.0, 0.0], "1", 1)
+    cache.put("scope", "second", [0.0, 1.0], "2", 1)
+    cache.get("scope", "first")
+    cache.put("scope", "third", [1.0, 1.0], "3", 1)
+
+    assert cache.get("scope", "second") is None
+    assert cache.get("scope", "first") is not None
+
+    expired = AnswerCache(max_entries=2, ttl_seconds=0, similarity_threshold=0.9)
+    expired.put("scope", "first", [1.0, 0.0], "1", 1)
+    assert expired.get("scope", "first") is None
+
+
+@pytest.mark.asyncio
+async def test_aget_response_reuses_cached_answer(isolated_document_store: "DocumentStore") -> None:
+    isolated_document_store.import_file(Path("tests/testdata/sample.docx"))
+    llm_calls: list[int] = []
+
+    class CountingModel(FakeListChatModel):
+        def _call(self, *args: Any, **kwargs: Any) -> str:
+            llm_calls.append(1)
+            return super()._call(*args, **kwargs)
+
+    with patch("langchain_openai.ChatOpenAI", side_effect=lambda **_: CountingModel(responses=["Cached answer"])):
+        first = await aget_response(file_name="sample.docx", session_id="s1", query="What is this?")
+        second = await aget_response(file_name="sample.docx", session_id="s2", query="what is this?")
+        bypassed = await aget_response(
+            file_name="sample.docx", session_id="s3", query="What is this?", bypass_cache=True
+        )
+
+    assert first["cache"]["hit"] is False
+    assert second["cache"]["hit"] is True
+    assert second["answer"] == first["answer"] == "Cached answer"
+    assert second["total_tokens_used"] == 0
+    assert bypassed["cache"]["hit"] is False
+    assert len(llm_calls) == 2  # noqa: PLR2004
@@ -0,0 +1,46 @@
+import threading
+
+from app.backend.batching import BatchedEmbeddings, EmbeddingBatcher
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+CONCURRENT_QUERIES = 8
+
+
+class RecordingEmbedding(DeterministicFakeEmbedding):
+    calls: list[int]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(len(texts))
+        return super().embed_documents(texts)
+
+
+def test_concurrent_queries_are_encoded_in_one_batch() -> None:
+    model = RecordingEmbedding(size=8, calls=[])
+    batcher = EmbeddingBatcher(model, max_batch_size=CONCURRENT_QUERIES, max_wait_ms=1000)
+    embeddings = BatchedEmbeddings(model, batcher)
+    barrier = threading.Barrier(CONCURRENT_QUERIES)
+    results: dict[int, list[float]] = {}
+
+    def ask(i: int) -> None:
+        barrier.wait()
+        results[i] = embeddings.embed_query(f"question {i}")
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(CONCURRENT_QUERIES)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert model.calls == [CONCURRENT_QUERIES]
+    assert all(results[i] == model.embed_query(f"question {i}") for i in range(CONCURRENT_QUERIES))
+    assert batcher.stats()["batch_size_histogram"] == {str(CONCURRENT_QUERIES): 1}
+
+
+def test_batch_window_flushes_a_single_query() -> None:
+    model = RecordingEmbedding(size=8, calls=[])
+    batcher = EmbeddingBatcher(model, max_batch_size=32, max_wait_ms=1)
+
+    vector = BatchedEmbeddings(model, batcher).embed_query("alone")
+
+    assert vector == model.embed_query("alone")
+    assert batcher.stats()["batches"] == 1
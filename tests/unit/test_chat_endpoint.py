@@ -1,15 +1,26 @@
+import asyncio
 import io
-import tempfile
 from http import HTTPStatus
 from pathlib import Path
+from typing import TYPE_CHECKING
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
-from app.backend.chat import get_response
+from app.backend import concurrency, endpoints
+from app.backend.accessors import get_collection
+from app.backend.chat import astream_response, get_response, make_retrieval_query
+from app.backend.concurrency import stage_limit
+from app.backend.document_store import DocumentRecord, DocumentStore
 from app.backend.endpoints import routes
+from app.backend.history import HistoryWindow
+from app.backend.utils import add_session_history
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from langchain_core.documents import Document
+from langchain_core.language_models import FakeListChatModel
+
+if TYPE_CHECKING:
+    from langchain_core.messages import AIMessage
 
 
 def create_test_app() -> TestClient:
@@ -18,17 +29,21 @@ def create_test_app() -> TestClient:
     return TestClient(app)
 
 
-@patch("app.backend.endpoints.get_temp_file_path")
+@patch.object(DocumentStore, "add")
 @patch("aiofiles.open")
 @pytest.mark.asyncio
 async def test_upload_file_local_with_async_mock(
     mock_aio_open: AsyncMock,
-    mock_get_temp_path: MagicMock,
+    mock_add: MagicMock,
+    tmp_path: Path,
 ) -> None:
     client = create_test_app()
 
-    mock_path: Path = Path(tempfile.mkstemp(suffix=".pdf")[1])
-    mock_get_temp_path.return_value = mock_path
+    stored_path = tmp_path / "stored.pdf"
+    mock_add.side_effect = lambda _partial, document_id, name, size, _tags=None: (
+        DocumentRecord(document_id, name, ".pdf", size, None, 0.0, 0.0, str(stored_path)),
+        True,
+    )
 
     # Async mock for aiofiles.open
     mock_file = AsyncMock()
@@ -47,24 +62,27 @@ async def test_upload_file_local_with_async_mock(
 
     assert response.status_code == HTTPStatus.OK
     data = response.json()
-    assert data["filename"].endswith(".pdf")
-    assert str(mock_path.absolute()) in data["file_path"]
+    assert data["filename"] == "sample.pdf"
+    assert data["file_path"] == str(stored_path)
+    mock_file.write.assert_awaited_with(file_content)
+    mock_add.assert_called_once()
 
 
 @patch("app.backend.chat.get_openai_callback")
-@patch("app.backend.chat.ConversationalRetrievalChain.from_llm")
-@patch("app.backend.chat.HuggingFaceEmbeddings")
-@patch("app.backend.chat.PyPDFLoader")
+@patch("langchain.chains.ConversationalRetrievalChain.from_llm")
+@patch("langchain_huggingface.HuggingFaceEmbeddings")
+@patch("langchain_community.document_loaders.PyPDFLoader")
 def test_get_response_returns_answer(
     pdf_loader_mock: MagicMock,
     embed_mock: MagicMock,
     chain_mock: MagicMock,
     cb_mock: MagicMock,
+    isolated_document_store: DocumentStore,
 ) -> None:
     # Mock document loader
-    pdf_loader_mock.return_value.load.return_value = [
-        Document(page_content="This is test content", metadata={"source": "sample"})
-    ]
+    pdf_loader_mock.return_value.lazy_load.return_value = iter(
+        [Document(page_content="This is test content", metadata={"source": "sample"})]
+    )
 
     # Mock embeddings
     embed_mock.return_value.embed_documents.return_value = [[0.1] * 384]
@@ -81,6 +99,10 @@ def test_get_response_returns_answer(
     cb_context.__enter__.return_value.total_cost = 0.001
     cb_mock.return_value = cb_context
 
+    local_file = isolated_document_store.root / "sample.pdf"
+    local_file.write_bytes(b"dummy PDF content")
+    isolated_document_store.import_file(local_file)
+
     response: dict = get_response(
         file_name="sample.pdf",
         session_id="abc123",
@@ -98,3 +120,126 @@ def test_get_response_returns_answer(
     assert isinstance(response, dict)
     assert response["answer"] == expected_response["answer"]
     assert response["total_tokens_used"] == expected_response["total_tokens_used"]
+
+
+@pytest.mark.asyncio
+async def test_astream_response_yields_answer_tokens(isolated_document_store: DocumentStore) -> None:
+    document = isolated_document_store.import_file(Path("tests/testdata/sample.docx"))
+
+    def fake_llm(**kwargs: object) -> FakeListChatModel:
+        return FakeListChatModel(responses=["Streamed answer"], tags=kwargs.get("tags"))
+
+    with patch("langchain_openai.ChatOpenAI", side_effect=fake_llm):
+        items = [
+            item
+            async for item in astream_response(
+                file_name=document.document_id,
+                session_id="abc123",
+                query="What is this?",
+            )
+        ]
+
+    tokens = [item["token"] for item in items if "token" in item]
+    assert len(tokens) > 1
+    assert "".join(tokens) == "Streamed answer"
+    assert items[-1]["answer"] == "Streamed answer"
+
+
+@pytest.mark.asyncio
+async def test_astream_response_frees_the_llm_slot_before_the_client_reads(
+    isolated_document_store: DocumentStore, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    document = isolated_document_store.import_file(Path("tests/testdata/sample.docx"))
+    monkeypatch.setattr(concurrency.CONFIG, "LLM_CONCURRENCY", 1)
+
+    def fake_llm(**kwargs: object) -> FakeListChatModel:
+        return FakeListChatModel(responses=["Streamed answer"], tags=kwargs.get("tags"))
+
+    with patch("langchain_openai.ChatOpenAI", side_effect=fake_llm):
+        stream = astream_response(file_name=document.document_id, session_id="slow-client", query="What is this?")
+        first = await anext(stream)
+        # The client has read one token; another request still gets the only slot
+        async with asyncio.timeout(5), stage_limit("llm"):
+            pass
+        rest = [item async for item in stream]
+
+    assert first["token"] + "".join(item["token"] for item in rest if "token" in item) == "Streamed answer"
+
+
+def test_chat_with_a_summarised_history_returns_json(isolated_document_store: DocumentStore) -> None:
+    document = isolated_document_store.import_file(Path("tests/testdata/sample.docx"))
+    add_session_history("summarised", ["Earlier question?", "Earlier answer."])
+    get_collection().update_one(
+        {"session_id": "summarised"}, {"$set": {"summary": "They asked about the sample.", "summarized_turns": 0}}
+    )
+
+    with patch("langchain_openai.ChatOpenAI", side_effect=lambda **_: FakeListChatModel(responses=["Answer"])):
+        response = create_test_app().post(
+            "/chat",
+            json={"session_id": "summarised", "user_input": "And then?", "data_source": document.document_id},
+        )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["response"]["chat_history"] == [["Earlier question?", "Earlier answer."]]
+
+
+@pytest.mark.asyncio
+async def test_single_call_mode_answers_follow_ups_in_one_llm_call(isolated_document_store: DocumentStore) -> None:
+    document = isolated_document_store.import_file(Path("tests/testdata/sample.docx"))
+    add_session_history("follow-up", ["What is the sample about?", "It is about testing."])
+    llms: list[FakeListChatModel] = []
+
+    def fake_llm(**kwargs: object) -> FakeListChatModel:
+        llms.append(FakeListChatModel(responses=["Single answer"], tags=kwargs.get("tags")))
+        return llms[-1]
+
+    with patch("langchain_openai.ChatOpenAI", side_effect=fake_llm):
+        items = [
+            item
+            async for item in astream_response(
+                file_name=document.document_id,
+                session_id="follow-up",
+                query="And what else?",
+                chat_mode="single",
+            )
+        ]
+
+    assert len(llms) == 1
+    assert "".join(item["token"] for item in items if "token" in item) == "Single answer"
+    assert items[-1]["chat_mode"] == "single"
+
+
+def test_retrieval_query_prepends_the_last_question() -> None:
+    window = HistoryWindow(turns=[("First?", "One."), ("What is the cache?", "An LRU.")])
+
+    assert make_retrieval_query("How big is it?", window) == "What is the cache?\nHow big is it?"
+
+
+def test_chat_batch_answers_every_question_in_order(
+    isolated_document_store: DocumentStore, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    document = isolated_document_store.import_file(Path("tests/testdata/sample.docx"))
+    monkeypatch.setattr(endpoints.CONFIG, "BATCH_MAX_QUESTIONS", 3)
+
+    class EchoModel(FakeListChatModel):
+        async def ainvoke(self, messages: list, *args: object, **kwargs: object) -> "AIMessage":  # type: ignore[override]
+            question = messages[-1].content
+            if question == "Fail?":
+                raise RuntimeError(question)
+            return await super().ainvoke(messages, *args, **kwargs)
+
+    questions = ["First?", "Fail?", "Third?"]
+    with patch("langchain_openai.ChatOpenAI", side_effect=lambda **_: EchoModel(responses=["An answer"])):
+        client = create_test_app()
+        response = client.post("/chat/batch", json={"questions": questions, "data_source": document.document_id})
+        too_many = client.post("/chat/batch", json={"questions": questions * 2, "data_source": document.document_id})
+
+    answers = response.json()["answers"]
+    assert response.status_code == HTTPStatus.OK
+    assert [answer["question"] for answer in answers] == questions
+    assert [answer.get("answer") for answer in answers] == ["An answer", None, "An answer"]
+    assert answers[1]["error"] == "Internal Server Error"
+    # A miss reports the cache statistics, like a miss of /chat does
+    assert answers[0]["cache"]["hit"] is False
+    assert "hit_rate" in answers[0]["cache"]
+    assert too_many.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
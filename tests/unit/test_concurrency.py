@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from app.backend import concurrency
+
+STAGE_LIMIT = 2
+
+
+@pytest.mark.asyncio
+async def test_run_in_stage_bounds_in_flight_calls(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(concurrency.CONFIG, "INDEX_CONCURRENCY", STAGE_LIMIT)
+    monkeypatch.setattr(concurrency.CONFIG, "CPU_EXECUTOR_WORKERS", 4)
+    monkeypatch.setattr(concurrency, "EXECUTOR_CACHE", {})
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+
+    def blocking_work() -> threading.Thread:
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.02)
+        with lock:
+            in_flight -= 1
+        return threading.current_thread()
+
+    threads = await asyncio.gather(*(concurrency.run_in_stage("index", blocking_work) for _ in range(8)))
+
+    assert peak == STAGE_LIMIT
+    assert threading.main_thread() not in threads
+
+
+@pytest.mark.asyncio
+async def test_ingestion_does_not_hold_query_index_slots(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(concurrency.CONFIG, "INDEX_CONCURRENCY", 1)
+    monkeypatch.setattr(concurrency.CONFIG, "INGEST_CONCURRENCY", STAGE_LIMIT)
+    monkeypatch.setattr(concurrency, "EXECUTOR_CACHE", {})
+    release = threading.Event()
+
+    ingestions = [asyncio.ensure_future(concurrency.run_in_stage("ingest", release.wait, 5)) for _ in range(4)]
+    await asyncio.sleep(0.05)
+    try:
+        # Every ingestion slot is busy, yet a query-time index call runs at once
+        thread = await asyncio.wait_for(concurrency.run_in_stage("index", threading.current_thread), timeout=1)
+    finally:
+        release.set()
+        await asyncio.gather(*ingestions)
+
+    assert thread.name.startswith("cpu")
+
+
+def test_concurrent_first_requests_share_one_executor(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(concurrency, "EXECUTOR_CACHE", {})
+    created: list[object] = []
+
+    def slow_executor(**kwargs: object) -> object:
+        time.sleep(0.05)
+        created.append(kwargs)
+        return object()
+
+    monkeypatch.setattr(concurrency, "ThreadPoolExecutor", slow_executor)
+    threads = [threading.Thread(target=concurrency.get_executor, args=("io",)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1
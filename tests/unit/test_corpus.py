@@ -0,0 +1,146 @@
+from typing import TYPE_CHECKING
+
+from app.backend import corpus as corpus_module
+from app.backend.chat import get_corpus, get_retriever, resolve_documents
+from app.backend.corpus import CorpusIndex, remove_from_corpora
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    import pytest
+    from app.backend.document_store import DocumentStore
+
+EMBEDDINGS = DeterministicFakeEmbedding(size=384)
+
+
+def document_index(name: str, pages: int) -> FAISS:
+    return FAISS.from_documents(
+        [
+            Document(page_content=f"{name} page {page}", metadata={"source": name, "page": page})
+            for page in range(pages)
+        ],
+        EMBEDDINGS,
+    )
+
+
+def search(corpus: CorpusIndex, query: str, document_ids: list[str], k: int = 10) -> list[Document]:
+    return corpus.search(EMBEDDINGS.embed_query(query), document_ids, k)
+
+
+def test_search_is_filtered_by_document_id(tmp_path: "Path") -> None:
+    corpus = CorpusIndex(tmp_path / "corpus")
+    corpus.add_document("a" * 64, document_index("a.pdf", 3))
+    corpus.add_document("b" * 64, document_index("b.pdf", 2))
+
+    # "a.pdf page 0" is an exact match in document a, but only b is searched
+    found = search(corpus, "a.pdf page 0", ["b" * 64])
+
+    assert {chunk.metadata["source"] for chunk in found} == {"b.pdf"}
+    assert {chunk.metadata["document_id"] for chunk in found} == {"b" * 64}
+    assert search(corpus, "a.pdf page 0", ["a" * 64, "b" * 64], k=1)[0].page_content == "a.pdf page 0"
+
+
+def test_search_many_matches_one_search_per_query(tmp_path: "Path") -> None:
+    corpus = CorpusIndex(tmp_path / "corpus")
+    corpus.add_document("a" * 64, document_index("a.pdf", 3))
+    corpus.add_document("b" * 64, document_index("b.pdf", 2))
+    queries = ["a.pdf page 2", "b.pdf page 1", "a.pdf page 0"]
+
+    found = corpus.search_many([EMBEDDINGS.embed_query(query) for query in queries], ["a" * 64, "b" * 64], k=2)
+
+    assert found == [search(corpus, query, ["a" * 64, "b" * 64], k=2) for query in queries]
+    assert [chunks[0].page_content for chunks in found] == queries
+
+
+def test_documents_are_removed_incrementally_and_persisted(tmp_path: "Path") -> None:
+    corpus = CorpusIndex(tmp_path / "corpus")
+    corpus.add_document("a" * 64, document_index("a.pdf", 3))
+    corpus.add_document("b" * 64, document_index("b.pdf", 2))
+
+    corpus.remove_document("a" * 64)
+    reloaded = CorpusIndex(tmp_path / "corpus")
+
+    assert reloaded.stats() == {
+        "documents": 1,
+        "chunks": 2,
+        "index_type": "flat",
+        "orphaned_vectors": 0,
+        "segments": 2,
+        "tombstones": 3,
+    }
+    assert not reloaded.contains("a" * 64)
+    assert search(reloaded, "a.pdf page 0", ["a" * 64]) == []
+    assert len(search(reloaded, "b.pdf page 0", ["b" * 64])) == 2  # noqa: PLR2004
+
+
+def test_changes_are_delta_segments_until_compacted(tmp_path: "Path") -> None:
+    corpus = CorpusIndex(tmp_path / "corpus")
+    corpus.add_document("a" * 64, document_index("a.pdf", 3))
+    corpus.add_document("b" * 64, document_index("b.pdf", 2))
+    corpus.remove_document("a" * 64)
+    before = search(corpus, "b.pdf page 1", ["b" * 64])
+
+    assert sorted(path.name for path in (tmp_path / "corpus").iterdir() if path.is_dir()) == ["seg-1", "seg-2"]
+    assert corpus.compact()
+    assert not corpus.compact()
+    assert corpus.stats()["segments"] == corpus.stats()["tombstones"] == 0
+    assert search(corpus, "b.pdf page 1", ["b" * 64]) == before
+
+    # A new document is one more segment; the compacted base is not rewritten
+    base = (tmp_path / "corpus" / "gen-1" / "vectors.npy").stat().st_mtime_ns
+    corpus.add_document("c" * 64, document_index("c.pdf", 2))
+
+    assert (tmp_path / "corpus" / "gen-1" / "vectors.npy").stat().st_mtime_ns == base
+    assert search(corpus, "c.pdf page 1", ["b" * 64, "c" * 64], k=1)[0].page_content == "c.pdf page 1"
+    assert len(search(corpus, "b.pdf page 0", ["b" * 64, "c" * 64])) == 4  # noqa: PLR2004
+
+
+def test_compaction_runs_in_the_background(monkeypatch: "pytest.MonkeyPatch", tmp_path: "Path") -> None:
+    monkeypatch.setattr(corpus_module.CONFIG, "CORPUS_MAX_SEGMENTS", 2)
+    corpus = CorpusIndex(tmp_path / "corpus")
+    corpus.add_document("a" * 64, document_index("a.pdf", 3))
+
+    assert corpus._compaction is None  # noqa: SLF001
+
+    corpus.add_document("b" * 64, document_index("b.pdf", 2))
+
+    assert corpus._compaction.result(timeout=10)  # noqa: SLF001
+    assert corpus.stats()["segments"] == 0
+    assert corpus.stats()["chunks"] == 5  # noqa: PLR2004
+    assert search(corpus, "a.pdf page 2", ["a" * 64], k=1)[0].page_content == "a.pdf page 2"
+
+
+def test_removal_reaches_corpora_this_process_never_loaded(tmp_path: "Path") -> None:
+    # Written by another worker, or under earlier pipeline settings
+    elsewhere = CorpusIndex(tmp_path / "indices" / "corpus" / "other-settings")
+    elsewhere.add_document("a" * 64, document_index("a.pdf", 2))
+    elsewhere.add_document("b" * 64, document_index("b.pdf", 2))
+
+    remove_from_corpora("a" * 64)
+
+    reopened = CorpusIndex(tmp_path / "indices" / "corpus" / "other-settings")
+    assert not reopened.contains("a" * 64)
+    assert reopened.contains("b" * 64)
+    assert search(reopened, "a.pdf page 0", ["a" * 64]) == []
+
+
+def test_tag_targets_every_tagged_document(isolated_document_store: "DocumentStore", tmp_path: "Path") -> None:
+    for name in ("first.docx", "second.docx"):
+        local_file = tmp_path / name
+        local_file.write_bytes(name.encode())
+        staged = isolated_document_store.incoming_dir / name
+        staged.write_bytes(local_file.read_bytes())
+        isolated_document_store.add(staged, name.split(".")[0] * 8, name, 11, ["handbook"])
+    for document in isolated_document_store.find_by_tag("handbook"):
+        get_corpus().add_document(document.document_id, document_index(document.original_name, 1))
+
+    documents = resolve_documents(tag="handbook")
+    retriever = get_retriever(documents)
+
+    assert [document.original_name for document in documents] == ["first.docx", "second.docx"]
+    assert {chunk.metadata["source"] for chunk in retriever.invoke("page 0")} <= {"first.docx", "second.docx"}
+    isolated_document_store.delete(documents[0].document_id)
+    assert not get_corpus().contains(documents[0].document_id)
@@ -0,0 +1,122 @@
+from typing import TYPE_CHECKING
+
+import pytest
+from app.backend.document_store import DocumentStore
+from app.backend.index_store import IndexStore, make_index_key
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def write_file(path: "Path", content: bytes) -> "Path":
+    path.write_bytes(content)
+    return path
+
+
+def test_same_name_uploads_do_not_collide(tmp_path: "Path") -> None:
+    store = DocumentStore(tmp_path / "documents", 1024 * 1024, IndexStore(tmp_path / "indices"))
+
+    first = store.import_file(write_file(tmp_path / "a.pdf", b"first version"), original_name="report.pdf")
+    second = store.import_file(write_file(tmp_path / "b.pdf", b"second version"), original_name="report.pdf")
+    again = store.import_file(write_file(tmp_path / "c.pdf", b"first version"), original_name="copy.pdf")
+
+    assert first.document_id != second.document_id
+    assert again.document_id == first.document_id
+    assert store.stats()["documents"] == 2  # noqa: PLR2004
+    assert store.resolve(first.document_id).path == first.path
+    assert store.resolve(f"/tmp/{first.document_id}.pdf").document_id == first.document_id  # noqa: S108
+    # A name resolves to the most recently used document of that name
+    assert store.resolve("report.pdf").document_id == first.document_id
+    with pytest.raises(FileNotFoundError):
+        store.resolve("missing.pdf")
+
+
+def test_quota_evicts_least_recently_used_documents_and_indices(tmp_path: "Path") -> None:
+    index_store = IndexStore(tmp_path / "indices")
+    store = DocumentStore(tmp_path / "documents", 250, index_store)
+
+    old = store.import_file(write_file(tmp_path / "old.docx", b"o" * 100))
+    used = store.import_file(write_file(tmp_path / "used.docx", b"u" * 100))
+    (index_store.root / f"{old.document_id}-fingerprint").mkdir()
+    (index_store.root / f"{old.document_id}-fingerprint" / "index.faiss").write_bytes(b"i" * 10)
+    store.resolve(old.document_id)
+    store.resolve(used.document_id)
+
+    new = store.import_file(write_file(tmp_path / "new.docx", b"n" * 100))
+
+    assert store.get(old.document_id) is None
+    assert index_store.document_paths(old.document_id) == []
+    assert store.get(used.document_id) is not None
+    assert store.get(new.document_id) is not None
+    assert store.stats()["evictions"] == 1
+
+
+def test_store_reloads_metadata(tmp_path: "Path") -> None:
+    index_store = IndexStore(tmp_path / "indices")
+    record = DocumentStore(tmp_path / "documents", 1024, index_store).import_file(
+        write_file(tmp_path / "sample.docx", b"content")
+    )
+
+    reopened = DocumentStore(tmp_path / "documents", 1024, index_store)
+
+    assert reopened.resolve("sample.docx").path == record.path
+
+
+def test_index_bytes_are_tracked_without_walking_the_indices(monkeypatch: pytest.MonkeyPatch, tmp_path: "Path") -> None:
+    index_store = IndexStore(tmp_path / "indices")
+    store = DocumentStore(tmp_path / "documents", 1024 * 1024, index_store)
+    record = store.import_file(write_file(tmp_path / "sample.docx", b"content"))
+    index_key = make_index_key(record.document_id, "model", 100, 10)
+
+    index_store.save(index_key, FAISS.from_texts(["a", "b"], DeterministicFakeEmbedding(size=8)))
+    index_bytes = index_store.document_bytes(record.document_id)
+    monkeypatch.setattr(index_store, "document_bytes", lambda _: pytest.fail("walked the index directories"))
+
+    assert index_bytes > 0
+    assert store.get(record.document_id).index_bytes == index_bytes
+    assert store.total_bytes() == record.size + index_bytes
+    assert store.enforce_quota() == []
+    monkeypatch.undo()
+    assert DocumentStore(tmp_path / "documents", 1024 * 1024, index_store).total_bytes() == store.total_bytes()
+
+    index_store.delete_document(record.document_id)
+
+    assert store.total_bytes() == record.size
+
+
+def test_workers_sharing_a_store_see_each_others_documents(tmp_path: "Path") -> None:
+    index_store = IndexStore(tmp_path / "indices")
+    first_worker = DocumentStore(tmp_path / "documents", 250, index_store)
+    second_worker = DocumentStore(tmp_path / "documents", 250, index_store)
+
+    old = first_worker.import_file(write_file(tmp_path / "old.docx", b"o" * 100))
+    used = second_worker.import_file(write_file(tmp_path / "used.docx", b"u" * 100))
+    assert first_worker.get(used.document_id) is not None
+    assert second_worker.resolve("old.docx").document_id == old.document_id
+    first_worker.resolve(used.document_id)
+    first_worker.flush_accesses()
+
+    # The quota counts the documents and flushed accesses of both workers
+    new = second_worker.import_file(write_file(tmp_path / "new.docx", b"n" * 100))
+
+    assert first_worker.get(old.document_id) is None
+    assert second_worker.get(old.document_id) is None
+    assert first_worker.get(new.document_id) is not None
+    assert first_worker.stats()["documents"] == second_worker.stats()["documents"] == 2  # noqa: PLR2004
+
+
+def test_accesses_are_written_lazily(monkeypatch: pytest.MonkeyPatch, tmp_path: "Path") -> None:
+    store = DocumentStore(tmp_path / "documents", 1024, IndexStore(tmp_path / "indices"))
+    record = store.import_file(write_file(tmp_path / "sample.docx", b"content"))
+    stored_access = record.last_access
+
+    monkeypatch.setattr(store, "_write_meta", lambda _: pytest.fail("wrote metadata on access"))
+    for _ in range(3):
+        store.resolve(record.document_id)
+    monkeypatch.undo()
+    store.flush_accesses()
+
+    reopened = DocumentStore(tmp_path / "documents", 1024, store.index_store)
+    assert reopened.get(record.document_id).last_access > stored_access
@@ -0,0 +1,67 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+from app.backend.embedding_store import EmbeddingStore, embed_documents_cached, get_embedding_store, hash_chunk
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+DIMENSIONS = 8
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    embedded: list[str] = []  # noqa: RUF012
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+def test_reingesting_an_edited_document_embeds_only_changed_chunks() -> None:
+    embeddings = CountingEmbeddings(size=DIMENSIONS, embedded=[])
+    original = [f"chunk {index}" for index in range(20)]
+    edited = [*original[:10], "chunk 10 (edited)", *original[11:]]
+
+    first = embed_documents_cached(embeddings, original)
+    embeddings.embedded.clear()
+    second = embed_documents_cached(embeddings, edited)
+
+    assert embeddings.embedded == ["chunk 10 (edited)"]
+    np.testing.assert_allclose(second[:10], first[:10])
+    np.testing.assert_allclose(second, embeddings.embed_documents(edited), rtol=1e-3, atol=1e-6)
+    assert get_embedding_store().stats()["hits"] == 19  # noqa: PLR2004
+
+
+def test_oldest_segments_are_evicted_but_reused_vectors_survive(tmp_path: "Path") -> None:
+    row_bytes = DIMENSIONS * 4
+    store = EmbeddingStore(tmp_path, max_bytes=4 * row_bytes, segment_bytes=2 * row_bytes, dtype="float32")
+    vectors = {hash_chunk(str(index)): np.full(DIMENSIONS, index, dtype=np.float32) for index in range(6)}
+    keys = list(vectors)
+
+    store.put_many({key: vectors[key] for key in keys[:2]})
+    store.put_many({key: vectors[key] for key in keys[2:4]})
+    assert set(store.get_many([keys[0]])) == {keys[0]}
+    store.put_many({key: vectors[key] for key in keys[4:]})
+
+    found = store.get_many(keys)
+    assert set(found) == {keys[0], *keys[4:]}
+    np.testing.assert_array_equal(found[keys[0]], vectors[keys[0]])
+    assert store.total_bytes() <= store.max_bytes
+    assert store.stats()["evictions"] == 2  # noqa: PLR2004
+
+
+def test_rows_of_a_crashed_append_are_overwritten(tmp_path: "Path") -> None:
+    store = EmbeddingStore(tmp_path, max_bytes=1 << 20, segment_bytes=1 << 16, dtype="float32")
+    first, second = hash_chunk("first"), hash_chunk("second")
+    store.put_many({first: np.full(DIMENSIONS, 1, dtype=np.float32)})
+    # A writer died after appending one and a half rows but before recording them
+    with store.segment_path(1).open("ab") as file:
+        file.write(np.full(DIMENSIONS + DIMENSIONS // 2, 9, dtype=np.float32).tobytes())
+
+    store.put_many({second: np.full(DIMENSIONS, 2, dtype=np.float32)})
+
+    found = store.get_many([first, second])
+    np.testing.assert_array_equal(found[first], np.full(DIMENSIONS, 1))
+    np.testing.assert_array_equal(found[second], np.full(DIMENSIONS, 2))
+    assert store.segment_path(1).stat().st_size == 2 * DIMENSIONS * 4
@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+from unittest.mock import MagicMock, patch
+
+from app.backend import embeddings
+
+if TYPE_CHECKING:
+    import pytest
+
+MAX_SEQ_LENGTH = 256
+
+
+def test_get_embeddings_loads_each_model_once() -> None:
+    with patch("langchain_huggingface.HuggingFaceEmbeddings") as model_mock, ThreadPoolExecutor(max_workers=8) as pool:
+        loaded = list(pool.map(lambda _: embeddings.get_embeddings("test-model"), range(16)))
+
+    model_mock.assert_called_once_with(model_name="test-model")
+    assert all(model is loaded[0] for model in loaded)
+    assert embeddings.get_embedding_stats()["models"]["test-model"]["load_seconds"] >= 0
+
+
+def test_get_embeddings_applies_max_seq_length(monkeypatch: "pytest.MonkeyPatch") -> None:
+    monkeypatch.setattr(embeddings.CONFIG, "EMBEDDING_MAX_SEQ_LENGTH", MAX_SEQ_LENGTH)
+    client = MagicMock()
+
+    with patch("langchain_huggingface.HuggingFaceEmbeddings") as model_mock:
+        model_mock.return_value._client = client  # noqa: SLF001
+        embeddings.get_embeddings("short-model")
+
+    assert client.max_seq_length == MAX_SEQ_LENGTH
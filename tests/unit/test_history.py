@@ -0,0 +1,89 @@
+from typing import Any
+
+import langchain_openai
+import pytest
+from app.backend import history
+from app.backend.accessors import get_collection
+from app.backend.utils import add_session_history
+from langchain_core.messages import AIMessage, SystemMessage
+
+TURN_TOKENS = 5  # words of "Human: qN\nAssistant: aN aN"
+TOKEN_BUDGET = 4 * TURN_TOKENS
+TURNS = 12
+
+
+def turn(index: int) -> tuple[str, str]:
+    return f"q{index}", f"a{index} a{index}"
+
+
+def test_window_keeps_the_most_recent_turns_within_the_budget() -> None:
+    turns = [turn(index) for index in range(6)]
+
+    window = history.select_window(turns, first_turn=10, token_budget=2 * TURN_TOKENS + 1)
+
+    assert window.turns == turns[-2:]
+    assert window.pending == turns[:-2]
+    assert window.pending_start == 10  # noqa: PLR2004
+    assert window.tokens == 2 * TURN_TOKENS
+
+
+def test_window_skips_summarized_turns_and_counts_the_summary() -> None:
+    turns = [turn(index) for index in range(6)]
+
+    window = history.select_window(turns, first_turn=0, summary="s", summarized_turns=4, token_budget=100)
+
+    assert window.turns == turns[4:]
+    assert window.pending == []
+    assert isinstance(window.chat_history[0], SystemMessage)
+    assert window.chat_history[1:] == turns[4:]
+
+
+@pytest.mark.asyncio
+async def test_history_tokens_level_off_as_the_session_grows(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(history.CONFIG, "HISTORY_TOKEN_BUDGET", TOKEN_BUDGET)
+    prompts: list[str] = []
+
+    class SummaryModel:
+        def __init__(self, **_: Any) -> None:
+            pass
+
+        async def ainvoke(self, messages: list[Any]) -> AIMessage:
+            prompts.append(messages[0].content)
+            return AIMessage(content=f"summary {len(prompts)}")
+
+    monkeypatch.setattr(langchain_openai, "ChatOpenAI", SummaryModel)
+
+    tokens = []
+    for index in range(TURNS):
+        add_session_history("long", list(turn(index)))
+        await history.acompact_history("long")
+        tokens.append(history.load_history_window("long").tokens)
+
+    window = history.load_history_window("long")
+    assert max(tokens) <= TOKEN_BUDGET
+    assert window.summary == f"summary {len(prompts)}"
+    assert window.summarized_turns + len(window.turns) == TURNS
+    # Each summary call only sees the turns that were not summarised yet
+    assert "q0\n" in prompts[0]
+    assert all("q0\n" not in prompt for prompt in prompts[1:])
+    assert f"summary {len(prompts) - 1}" in prompts[-1]
+
+
+def test_stale_compaction_does_not_overwrite_a_newer_summary() -> None:
+    for index in range(3):
+        add_session_history("raced", list(turn(index)))
+    window = history.load_history_window("raced", token_budget=TURN_TOKENS)
+
+    assert history._store_summary("raced", window, "first")  # noqa: SLF001
+    assert not history._store_summary("raced", window, "second")  # noqa: SLF001
+    assert history.load_history_window("raced").summary == "first"
+
+
+def test_first_compaction_matches_a_stored_zero() -> None:
+    for index in range(3):
+        add_session_history("zero", list(turn(index)))
+    get_collection().update_one({"session_id": "zero"}, {"$set": {"summarized_turns": 0}})
+    window = history.load_history_window("zero", token_budget=TURN_TOKENS)
+
+    assert history._store_summary("zero", window, "first")  # noqa: SLF001
+    assert history.load_history_window("zero").summary == "first"
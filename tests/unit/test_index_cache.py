@@ -0,0 +1,78 @@
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from app.backend.index_cache import IndexCache, estimate_bytes
+from app.backend.index_store import IndexStore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    import pytest
+
+EMBEDDINGS = DeterministicFakeEmbedding(size=8)
+
+
+def document_index(pages: int) -> FAISS:
+    return FAISS.from_documents([Document(page_content=f"page {page}") for page in range(pages)], EMBEDDINGS)
+
+
+def test_eviction_is_driven_by_bytes() -> None:
+    small, large = document_index(2), document_index(10)
+    cache = IndexCache(max_bytes=estimate_bytes(large) + estimate_bytes(small))
+
+    cache.put("small", small)
+    cache.put("large", large)
+    cache.put("other-small", document_index(2))
+
+    assert cache.get("small") is None
+    assert cache.get("large") is large
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_concurrent_misses_load_once() -> None:
+    cache = IndexCache(max_bytes=1024 * 1024)
+    loads: list[int] = []
+
+    def load() -> FAISS:
+        loads.append(1)
+        time.sleep(0.05)
+        return document_index(2)
+
+    results: list[FAISS | None] = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("key", load))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert len({id(result) for result in results}) == 1
+    assert cache.stats()["loads"] == 1
+    assert cache.stats()["hits"] == 7  # noqa: PLR2004
+
+
+def test_get_or_build_serves_hot_indices_without_disk(monkeypatch: "pytest.MonkeyPatch", tmp_path: "Path") -> None:
+    store = IndexStore(tmp_path / "indices")
+    index_key = f"{'a' * 64}-fingerprint"
+    store.save(index_key, document_index(3))
+    disk_loads: list[str] = []
+    load = store.load
+
+    def counting_load(index_key: str, embeddings: DeterministicFakeEmbedding) -> FAISS | None:
+        disk_loads.append(index_key)
+        return load(index_key, embeddings)
+
+    monkeypatch.setattr(store, "load", counting_load)
+
+    first = store.get_or_build(index_key, EMBEDDINGS, document_index)
+    second = store.get_or_build(index_key, DeterministicFakeEmbedding(size=8), document_index)
+    store.delete_document("a" * 64)
+
+    assert disk_loads == [index_key]
+    assert first.index is second.index
+    assert store.cache_stats()["entries"] == 0
@@ -0,0 +1,48 @@
+from typing import TYPE_CHECKING
+
+from app.backend.index_store import IndexStore, compute_file_hash, make_index_key
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def build_store(embeddings: DeterministicFakeEmbedding) -> FAISS:
+    return FAISS.from_documents(
+        [Document(page_content="chunk one", metadata={"source": "sample.pdf", "page": 0})],
+        embeddings,
+    )
+
+
+def test_get_or_build_counts_hits_and_misses(tmp_path: "Path") -> None:
+    store = IndexStore(tmp_path / "indices")
+    embeddings = DeterministicFakeEmbedding(size=8)
+    builds: list[int] = []
+
+    def build() -> FAISS:
+        builds.append(1)
+        return build_store(embeddings)
+
+    first = store.get_or_build("key", embeddings, build)
+    second = store.get_or_build("key", embeddings, build)
+
+    assert len(builds) == 1
+    assert store.stats() == {"hits": 1, "misses": 1, "partial_hits": 0}
+    assert first.docstore.search(first.index_to_docstore_id[0]) == second.docstore.search(
+        second.index_to_docstore_id[0]
+    )
+    assert second.similarity_search("chunk one", k=1)[0].metadata == {"source": "sample.pdf", "page": 0}
+
+
+def test_index_key_changes_with_file_content(tmp_path: "Path") -> None:
+    document = tmp_path / "report.pdf"
+    document.write_bytes(b"version one")
+    first_key = make_index_key(compute_file_hash(document), "model", 1000, 0)
+
+    document.write_bytes(b"version two")
+    second_key = make_index_key(compute_file_hash(document), "model", 1000, 0)
+
+    assert first_key != second_key
+    assert first_key != make_index_key(compute_file_hash(document), "other-model", 1000, 0)
@@ -0,0 +1,81 @@
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from app.backend import chat, ingest
+from app.backend.chat import IngestProgress, get_corpus, get_index_key, get_vectorstore, iter_chunk_batches
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    import pytest
+    from app.backend.document_store import DocumentStore
+    from app.backend.index_store import IndexStore
+
+PAGES = 8
+PARTIAL_PAGES = 2
+
+
+def fake_pages(count: int) -> "Iterator[Document]":
+    for page in range(count):
+        yield Document(page_content=f"page {page} " * 150, metadata={"source": "big.pdf", "page": page})
+
+
+def test_chunk_batches_are_bounded_and_count_pages() -> None:
+    batches = list(iter_chunk_batches(fake_pages(PAGES), batch_size=3))
+
+    assert all(len(batch) <= 3 for batch, _ in batches)  # noqa: PLR2004
+    assert [pages for _, pages in batches] == sorted(pages for _, pages in batches)
+    assert batches[-1][1] == PAGES
+    assert {chunk.metadata["page"] for batch, _ in batches for chunk in batch} == set(range(PAGES))
+
+
+def test_first_pages_are_queryable_while_indexing(
+    monkeypatch: "pytest.MonkeyPatch", isolated_index_store: "IndexStore"
+) -> None:
+    monkeypatch.setattr(chat.CONFIG, "INGEST_BATCH_SIZE", 2)
+    monkeypatch.setattr(chat.CONFIG, "INGEST_PARTIAL_PAGES", PARTIAL_PAGES)
+    monkeypatch.setattr(chat, "iter_pages", lambda *_: fake_pages(PAGES))
+    embeddings = DeterministicFakeEmbedding(size=8)
+    index_key = get_index_key("a" * 64)
+    progress: list[IngestProgress] = []
+    partial_sizes: list[int] = []
+
+    def on_progress(update: IngestProgress) -> None:
+        progress.append(update)
+        partial = isolated_index_store.load_partial(index_key, embeddings)
+        if partial is not None:
+            partial_sizes.append(partial.index.ntotal)
+
+    vectorstore = get_vectorstore(Path("big.pdf"), embeddings, content_hash="a" * 64, on_progress=on_progress)
+
+    assert progress[-1] == IngestProgress(pages=PAGES, chunks=vectorstore.index.ntotal)
+    assert partial_sizes
+    assert partial_sizes[0] < vectorstore.index.ntotal
+    assert not isolated_index_store.partial_path(index_key).exists()
+    assert isolated_index_store.load_partial(index_key, embeddings) is None
+
+
+def test_index_of_a_document_deleted_during_ingestion_is_dropped(
+    monkeypatch: "pytest.MonkeyPatch",
+    isolated_document_store: "DocumentStore",
+    isolated_index_store: "IndexStore",
+) -> None:
+    document = isolated_document_store.import_file(Path("tests/testdata/sample.docx"))
+    ingest.create_job(document.document_id, document.path)
+
+    def index_then_lose_the_document(*_: object, **__: object) -> FAISS:
+        vectorstore = FAISS.from_documents(list(fake_pages(2)), DeterministicFakeEmbedding(size=8))
+        isolated_index_store.save(get_index_key(document.document_id), vectorstore)
+        isolated_document_store.delete(document.document_id)
+        return vectorstore
+
+    monkeypatch.setattr(ingest, "get_vectorstore", index_then_lose_the_document)
+
+    ingest.run_ingestion(document.document_id)
+
+    assert ingest.INGEST_JOBS[document.document_id].status == ingest.JobStatus.FAILED
+    assert isolated_index_store.document_paths(document.document_id) == []
+    assert not get_corpus().contains(document.document_id)
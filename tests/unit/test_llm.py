@@ -0,0 +1,64 @@
+import asyncio
+import importlib.util
+
+import httpx
+import pytest
+from app.backend import llm
+
+
+def test_llm_clients_are_reused_and_share_one_connection_pool() -> None:
+    first = llm.get_llm("model", 0.0)
+    again = llm.get_llm("model", 0.0)
+    warmer = llm.get_llm("model", 0.7)
+    elsewhere = llm.get_llm("model", 0.0, base_url="http://other.base")
+
+    assert first is again
+    assert warmer is not first
+    assert elsewhere is not first
+    assert elsewhere.openai_api_base == "http://other.base"
+    pool = llm.get_http_client()
+    assert first.root_client._client is warmer.root_client._client is pool  # noqa: SLF001
+
+
+@pytest.mark.asyncio
+async def test_async_clients_share_the_loop_pool_until_shutdown() -> None:
+    streaming = llm.get_llm("model", 0.0, streaming=True, tags=["answer"])
+    pool = llm.get_async_http_client()
+
+    assert llm.get_llm("model", 0.0, streaming=True, tags=["answer"]) is streaming
+    assert llm.get_llm("model", 0.0) is not streaming
+    assert streaming.root_async_client._client is pool  # noqa: SLF001
+
+    await llm.close_llm_clients()
+
+    assert pool.is_closed
+    assert llm.get_llm("model", 0.0, streaming=True, tags=["answer"]) is not streaming
+
+
+def test_pool_limits_and_timeouts_come_from_the_config(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(llm.CONFIG, "LLM_POOL_MAX_KEEPALIVE", 7)
+    monkeypatch.setattr(llm.CONFIG, "LLM_CONNECT_TIMEOUT_SECONDS", 1.5)
+    monkeypatch.setattr(llm.CONFIG, "LLM_HTTP2", True)
+
+    client = llm.get_llm("model", 0.0)
+
+    assert llm.get_pool_limits().max_keepalive_connections == 7  # noqa: PLR2004
+    assert client.request_timeout.connect == 1.5  # noqa: PLR2004
+    assert llm.get_http2_enabled() == (importlib.util.find_spec("h2") is not None)
+
+
+@pytest.mark.asyncio
+async def test_warmup_opens_a_connection_through_the_shared_pool() -> None:
+    requests: list[httpx.Request] = []
+
+    def api(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"data": []})
+
+    pool = httpx.AsyncClient(transport=httpx.MockTransport(api))
+    llm.ASYNC_HTTP_CLIENT_CACHE[asyncio.get_running_loop()] = pool
+
+    assert await llm.warmup_llm_pool("model") == 200  # noqa: PLR2004
+    assert str(requests[0].url) == "http://fake.base/models"
+    assert llm.get_llm("model", 0.0).root_async_client._client is pool  # noqa: SLF001
+    await llm.close_llm_clients()
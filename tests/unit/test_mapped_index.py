@@ -0,0 +1,70 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pytest
+from app.backend.corpus import CorpusIndex
+from app.backend.index_store import IndexStore
+from app.backend.mapped_index import MappedFlatIndex, ReadOnlyIndexError
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+EMBEDDINGS = DeterministicFakeEmbedding(size=8)
+
+
+def document_index(name: str, pages: int) -> FAISS:
+    return FAISS.from_documents(
+        [
+            Document(page_content=f"{name} page {page}", metadata={"source": name, "page": page})
+            for page in range(pages)
+        ],
+        EMBEDDINGS,
+    )
+
+
+def test_stored_indices_are_memory_mapped(tmp_path: "Path") -> None:
+    store = IndexStore(tmp_path / "indices")
+    built = document_index("a.pdf", 5)
+    store.save("key", built)
+
+    loaded = store.load("key", EMBEDDINGS)
+
+    assert isinstance(loaded.index, MappedFlatIndex)
+    assert isinstance(loaded.index.vectors, np.memmap)
+    for query in ("a.pdf page 0", "a.pdf page 3"):
+        assert [doc.metadata for doc in loaded.similarity_search(query, k=2)] == [
+            doc.metadata for doc in built.similarity_search(query, k=2)
+        ]
+
+
+def test_workers_sharing_a_corpus_see_each_others_changes(tmp_path: "Path") -> None:
+    first_worker = CorpusIndex(tmp_path / "corpus")
+    second_worker = CorpusIndex(tmp_path / "corpus")
+    query = EMBEDDINGS.embed_query("b.pdf page 1")
+
+    first_worker.add_document("a" * 64, document_index("a.pdf", 3))
+    second_worker.add_document("b" * 64, document_index("b.pdf", 3))
+
+    assert first_worker.search(query, ["b" * 64], k=1)[0].page_content == "b.pdf page 1"
+    assert second_worker.contains("a" * 64)
+
+    second_worker.remove_document("a" * 64)
+
+    assert first_worker.search(query, ["a" * 64], k=1) == []
+    assert first_worker.stats() == second_worker.stats()
+    assert first_worker.stats()["chunks"] == 3  # noqa: PLR2004
+
+
+def test_mapped_chunks_are_read_only(tmp_path: "Path") -> None:
+    store = IndexStore(tmp_path / "indices")
+    store.save("key", document_index("a.pdf", 2))
+    loaded = store.load("key", EMBEDDINGS)
+
+    with pytest.raises(ReadOnlyIndexError, match="read-only"):
+        loaded.docstore.add({"new": Document(page_content="new")})
+    with pytest.raises(ReadOnlyIndexError, match="read-only"):
+        loaded.docstore.delete([loaded.index_to_docstore_id[0]])
+    assert loaded.docstore.search(loaded.index_to_docstore_id[0]).page_content == "a.pdf page 0"
@@ -0,0 +1,81 @@
+import pytest
+from app.backend import concurrency, metrics
+from app.backend.endpoints import routes
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    histogram = metrics.Histogram("test_seconds", "A test histogram.", ("stage",), buckets=(0.1, 1.0))
+
+    histogram.observe(0.05, stage="load")
+    histogram.observe(0.5, stage="load")
+    histogram.observe(5.0, stage="load")
+
+    assert histogram.render() == [
+        "# HELP test_seconds A test histogram.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{stage="load",le="0.1"} 1',
+        'test_seconds_bucket{stage="load",le="1.0"} 2',
+        'test_seconds_bucket{stage="load",le="+Inf"} 3',
+        'test_seconds_sum{stage="load"} 5.55',
+        'test_seconds_count{stage="load"} 3',
+    ]
+
+
+def test_counter_escapes_label_values() -> None:
+    counter = metrics.Counter("test_total", "A test counter.", ("model",))
+
+    counter.inc(2, model='gpt "4"')
+    counter.inc(model='gpt "4"')
+
+    assert counter.render()[-1] == 'test_total{model="gpt \\"4\\""} 3.0'
+
+
+@pytest.mark.asyncio
+async def test_span_in_executor_reaches_request_trace() -> None:
+    trace = metrics.RequestTrace()
+    token = metrics.CURRENT_TRACE.set(trace)
+    try:
+
+        def load() -> None:
+            with metrics.span("index_load"):
+                pass
+
+        await concurrency.run_in_stage("index", load)
+    finally:
+        metrics.CURRENT_TRACE.reset(token)
+
+    assert list(trace.totals()) == ["index_load"]
+
+
+def test_span_counts_errors() -> None:
+    errors = metrics.STAGE_ERRORS.value(stage="test_failing")
+
+    msg = "boom"
+    with pytest.raises(ValueError, match=msg), metrics.span("test_failing"):
+        raise ValueError(msg)
+
+    assert metrics.STAGE_ERRORS.value(stage="test_failing") == errors + 1
+    assert metrics.STAGE_SECONDS.count(stage="test_failing") >= 1
+
+
+def test_middleware_adds_server_timing_and_exposes_metrics() -> None:
+    app = FastAPI()
+
+    @app.get("/traced")
+    async def traced() -> dict[str, str]:
+        metrics.observe_stage("history_read", 0.002)
+        return {}
+
+    app.include_router(routes)
+    app.add_middleware(metrics.MetricsMiddleware)
+    client = TestClient(app)
+
+    response = client.get("/traced")
+    exposition = client.get("/metrics")
+
+    assert response.headers["Server-Timing"] == "history_read;dur=2.0"
+    assert exposition.headers["Content-Type"] == metrics.CONTENT_TYPE
+    assert 'rag_http_requests_total{method="GET",route="/traced",status="200"}' in exposition.text
+    assert 'rag_stage_duration_seconds_count{stage="history_read"}' in exposition.text
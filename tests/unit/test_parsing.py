@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from app.backend import parsing
+from langchain_community.document_loaders import PyPDFLoader
+from pypdf import PdfReader, PdfWriter
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+PAGES = 10
+
+
+def fake_parse_pdf_range(local_file: str, start: int, stop: int) -> tuple[list[tuple[str, dict[str, Any]]], float]:
+    # Later ranges finish first, so the merge has to restore the page order
+    time.sleep(0.01 * (PAGES - start) / PAGES)
+    return [(f"{local_file} page {page}", {"source": local_file, "page": page}) for page in range(start, stop)], 0.5
+
+
+def test_parallel_pages_are_merged_in_page_order(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(parsing.CONFIG, "PARSE_PAGES_PER_TASK", 3)
+    monkeypatch.setattr(parsing.CONFIG, "PARSE_WORKERS", 4)
+    monkeypatch.setattr(parsing, "parse_pdf_range", fake_parse_pdf_range)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        monkeypatch.setattr(parsing, "get_process_pool", lambda _: pool)
+        timings: dict[str, float] = {}
+
+        pages = list(parsing.iter_pdf_pages_parallel("big.pdf", PAGES, timings))
+
+    assert [page.metadata for page in pages] == [{"source": "big.pdf", "page": page} for page in range(PAGES)]
+    assert [page.page_content for page in pages] == [f"big.pdf page {page}" for page in range(PAGES)]
+    assert timings["parse_workers"] == pytest.approx(0.5 * 4)
+
+
+def test_parallel_pages_match_pypdf_loader(monkeypatch: pytest.MonkeyPatch, tmp_path: "Path") -> None:
+    writer = PdfWriter()
+    for _ in range(5):
+        writer.add_page(PdfReader("tests/testdata/sample.pdf").pages[0])
+    writer.add_metadata({"/Title": " Quarterly report ", "/CreationDate": "D:20250101120000+01'00'"})
+    local_file = str(tmp_path / "report.pdf")
+    writer.write(local_file)
+    monkeypatch.setattr(parsing.CONFIG, "PARSE_PAGES_PER_TASK", 2)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        monkeypatch.setattr(parsing, "get_process_pool", lambda _: pool)
+
+        parallel = list(parsing.iter_pdf_pages_parallel(local_file, 5))
+
+    serial = list(PyPDFLoader(local_file).lazy_load())
+    assert [page.page_content for page in parallel] == [page.page_content for page in serial]
+    assert [page.metadata for page in parallel] == [page.metadata for page in serial]
+    assert serial[4].metadata["title"] == "Quarterly report"
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pymongo
+import pytest
+from app.backend.accessors import ensure_indexes, get_collection
+from app.backend.utils import add_session_history, load_memory_to_pass
+
+TURNS = 10
+MAX_TURNS = 3
+
+
+def test_add_session_history_appends_turns() -> None:
+    assert add_session_history("session", ["q1", "a1"])
+    assert add_session_history("session", ["q2", "a2"])
+
+    assert load_memory_to_pass("session") == [("q1", "a1"), ("q2", "a2")]
+    assert get_collection().count_documents({"session_id": "session"}) == 1
+
+
+def test_load_memory_to_pass_reads_only_recent_turns() -> None:
+    for turn in range(TURNS):
+        add_session_history("long-session", [f"q{turn}", f"a{turn}"])
+
+    history = load_memory_to_pass("long-session", max_turns=MAX_TURNS)
+
+    assert history == [(f"q{turn}", f"a{turn}") for turn in range(TURNS - MAX_TURNS, TURNS)]
+
+
+def test_concurrent_turns_are_not_lost() -> None:
+    ensure_indexes()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda turn: add_session_history("busy", [f"q{turn}", f"a{turn}"]), range(TURNS)))
+
+    assert len(load_memory_to_pass("busy", max_turns=TURNS)) == TURNS
+
+
+def test_ensure_indexes_makes_session_id_unique() -> None:
+    ensure_indexes()
+    add_session_history("unique", ["q", "a"])
+
+    with pytest.raises(pymongo.errors.DuplicateKeyError):
+        get_collection().insert_one({"session_id": "unique", "conversion": []})
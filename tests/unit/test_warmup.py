@@ -0,0 +1,40 @@
+import asyncio
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+import pytest
+from app.backend import embeddings, warmup
+
+if TYPE_CHECKING:
+    from fastapi.testclient import TestClient
+
+
+def test_readyz_waits_for_warmup(client: "TestClient", monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(warmup.CONFIG, "LLM_WARMUP", False)
+
+    assert client.get("/healthz").json() == {"status": "ok"}
+    assert client.get("/readyz").status_code == HTTPStatus.SERVICE_UNAVAILABLE
+
+    asyncio.run(warmup.run_warmup())
+    ready = client.get("/readyz")
+
+    assert ready.status_code == HTTPStatus.OK
+    assert set(ready.json()["stages"]) == {"mongo", "embeddings", "tokenizer"}
+    assert embeddings.EMBEDDINGS_CACHE
+
+
+@pytest.mark.asyncio
+async def test_failed_warmup_keeps_the_worker_unready(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(warmup.CONFIG, "EMBEDDING_WARMUP", False)
+    monkeypatch.setattr(warmup.CONFIG, "LLM_WARMUP", False)
+
+    def unreachable() -> None:
+        msg = "Mongo is down"
+        raise ConnectionError(msg)
+
+    monkeypatch.setattr(warmup, "ensure_indexes", unreachable)
+
+    state = await warmup.run_warmup()
+
+    assert state["status"] == "failed"
+    assert state["stages"]["mongo"]["error"] == "Mongo is down"